@@ -3,35 +3,165 @@ import json
 import requests
 import base64
 import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import metrics
+from extraction_cache import cache
+from image_prep import prepare_for_ocr
 
 API_KEY = os.getenv("GOOGLE_API_KEY")
+# Point at a local stub server in tests, e.g. GEMINI_API_BASE=http://127.0.0.1:8765/v1beta
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta")
+
+# ⏱️ Per-model request timeout (seconds)
+MODEL_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "30"))
+# 🏁 Hedging: if the current model hasn't answered after this many seconds,
+# race the next one as well. GEMINI_HEDGING=0 keeps the strict one-by-one order.
+HEDGING = os.getenv("GEMINI_HEDGING", "1") == "1"
+HEDGE_DELAY = float(os.getenv("GEMINI_HEDGE_DELAY", "4"))
+# 🔌 Circuit breaker: skip a model for a while after repeated failures
+BREAKER_FAILURES = int(os.getenv("GEMINI_BREAKER_FAILURES", "3"))
+BREAKER_COOLDOWN = float(os.getenv("GEMINI_BREAKER_COOLDOWN", "60"))
+
+# ✅ PRIORITY LIST: If #1 is busy, we use #2, etc.
+# We derived this list from your successful logs!
+MODELS = [
+    "gemini-2.5-flash",       # First choice (Fastest)
+    "gemini-2.0-flash",       # Backup 1
+    "gemini-2.0-flash-lite",  # Backup 2 (Super light)
+    "gemini-2.5-pro",         # Backup 3 (Slower but powerful)
+    "gemini-1.5-flash"        # Old reliable (just in case)
+]
+
+_session = requests.Session()
+_pool = ThreadPoolExecutor(max_workers=2 * len(MODELS), thread_name_prefix="gemini")
+
+
+# ==========================================
+# 📊 PER-MODEL HEALTH & LATENCY
+# ==========================================
+class ModelStats:
+    def __init__(self):
+        self.calls = self.successes = self.failures = 0
+        self.consecutive_failures = 0
+        self.latency_ewma = None  # seconds, successful calls only
+        self.open_until = 0.0
+
+    def as_dict(self):
+        return {"calls": self.calls, "successes": self.successes, "failures": self.failures,
+                "latency_ewma": round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+                "breaker_open": self.open_until > time.monotonic()}
+
+_stats = {name: ModelStats() for name in MODELS}
+_stats_lock = threading.Lock()
+
+def _record(model_name, ok, elapsed):
+    metrics.AI_MODEL.observe(elapsed, model_name, "ok" if ok else "error")
+    with _stats_lock:
+        s = _stats[model_name]
+        s.calls += 1
+        if ok:
+            s.successes += 1; s.consecutive_failures = 0
+            s.latency_ewma = elapsed if s.latency_ewma is None else 0.8 * s.latency_ewma + 0.2 * elapsed
+        else:
+            s.failures += 1; s.consecutive_failures += 1
+            if s.consecutive_failures >= BREAKER_FAILURES:
+                s.open_until = time.monotonic() + BREAKER_COOLDOWN
+                print(f"🔌 {model_name} failed {s.consecutive_failures}x, skipping it for {BREAKER_COOLDOWN:.0f}s")
+
+def model_order():
+    """Healthy models, fastest observed first. Untried models keep their priority slot."""
+    now = time.monotonic()
+    with _stats_lock:
+        healthy = [m for m in MODELS if _stats[m].open_until <= now]
+        known = sorted((m for m in healthy if _stats[m].latency_ewma is not None), key=lambda m: _stats[m].latency_ewma)
+    # If every breaker is open, try everything rather than fail outright
+    if not healthy: return list(MODELS)
+    unknown = [m for m in healthy if m not in known]
+    return known + unknown
+
+def model_stats():
+    with _stats_lock:
+        return {name: s.as_dict() for name, s in _stats.items()}
+
 
+# ==========================================
+# 🤖 SINGLE MODEL CALL
+# ==========================================
+def _ask_model(model_name, payload, cancelled):
+    """Returns the medicine list, or None if this model gave no usable answer."""
+    if cancelled.is_set(): return None
+    print(f"👉 Attempting with: {model_name}...")
+    url = f"{GEMINI_API_BASE}/models/{model_name}:generateContent?key={API_KEY}"
+    start = time.monotonic()
+    try:
+        response = _session.post(url, headers={'Content-Type': 'application/json'}, json=payload, timeout=(5, MODEL_TIMEOUT))
+    except Exception as e:
+        _record(model_name, False, time.monotonic() - start)
+        print(f"⚠️ Crash with {model_name}: {e}")
+        return None
+    elapsed = time.monotonic() - start
+
+    # 🛑 If Busy (503) or Rate Limited (429), let the next model take over
+    if response.status_code in [503, 429]:
+        _record(model_name, False, elapsed)
+        print(f"⚠️ {model_name} is overloaded/busy. Switching to next model...")
+        return None
+
+    # 🛑 If other error (404, 400), print and try next just in case
+    if response.status_code != 200:
+        _record(model_name, False, elapsed)
+        print(f"⚠️ {model_name} returned Error {response.status_code}: {response.text}")
+        return None
+
+    # A 200 with no candidates (e.g. blocked by safety filters) is still a failed call
+    try:
+        raw_text = response.json()['candidates'][0]['content']['parts'][0]['text']
+    except (ValueError, KeyError, IndexError, TypeError):
+        _record(model_name, False, elapsed)
+        print(f"⚠️ {model_name} replied without candidates")
+        return None
+    # ✅ SUCCESS! We got a 200 OK response with an answer
+    _record(model_name, True, elapsed)
+    if cancelled.is_set(): return None  # someone else already won
+    print(f"✅ Success with {model_name} in {elapsed:.1f}s! Response: {raw_text}")
+
+    # Extract JSON
+    match = re.search(r'\[.*\]', raw_text, re.DOTALL)
+    if not match: return None  # AI replied but no JSON found
+    try: medicines = json.loads(match.group())
+    except ValueError: return None
+    return medicines if isinstance(medicines, list) else None
+
+
+# ==========================================
+# 🔍 MAIN ENTRY POINT
+# ==========================================
 def analyze_prescription(image_bytes):
     if not API_KEY:
         print("❌ CRITICAL: No API Key found.")
         return []
 
-    # ✅ PRIORITY LIST: If #1 is busy, we use #2, etc.
-    # We derived this list from your successful logs!
-    models_to_try = [
-        "gemini-2.5-flash",       # First choice (Fastest)
-        "gemini-2.0-flash",       # Backup 1
-        "gemini-2.0-flash-lite",  # Backup 2 (Super light)
-        "gemini-2.5-pro",         # Backup 3 (Slower but powerful)
-        "gemini-1.5-flash"        # Old reliable (just in case)
-    ]
-
-    image_b64 = base64.b64encode(image_bytes).decode('utf-8')
-    headers = {'Content-Type': 'application/json'}
-    
+    # ♻️ Same photo seen before? Skip the API entirely
+    cached = cache.get(image_bytes)
+    if cached is not None:
+        print(f"♻️ AI Engine: Cache hit ({len(cached)} medicines)")
+        return cached
+
+    # 🗜️ Orient, grayscale and downscale before encoding (phone photos are 5-12 MB)
+    upload_bytes, mime_type = prepare_for_ocr(image_bytes)
+    print(f"🗜️ AI Engine: Image {len(image_bytes) // 1024} KB -> {len(upload_bytes) // 1024} KB ({mime_type})")
+    image_b64 = base64.b64encode(upload_bytes).decode('utf-8')
+
     payload = {
         "contents": [{
             "parts": [
                 {"text": "You are a pharmacist. Extract all medicine names from this image. Return ONLY a JSON list of strings. Example: [\"Dolo 650\", \"Pan 40\"]. Do not use markdown."},
                 {
                     "inline_data": {
-                        "mime_type": "image/jpeg",
+                        "mime_type": mime_type,
                         "data": image_b64
                     }
                 }
@@ -39,43 +169,37 @@ def analyze_prescription(image_bytes):
         }]
     }
 
-    print(f"🔍 AI Engine: Starting robust analysis...")
-
-    # 🔄 THE LOOP: Try models one by one
-    for model_name in models_to_try:
-        try:
-            print(f"👉 Attempting with: {model_name}...")
-            
-            url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent?key={API_KEY}"
-            
-            response = requests.post(url, headers=headers, json=payload)
-            
-            # 🛑 If Busy (503) or Rate Limited (429), CONTINUE to next model
-            if response.status_code in [503, 429]:
-                print(f"⚠️ {model_name} is overloaded/busy. Switching to next model...")
-                continue 
-            
-            # 🛑 If other error (404, 400), print and try next just in case
-            if response.status_code != 200:
-                print(f"⚠️ {model_name} returned Error {response.status_code}: {response.text}")
-                continue
-
-            # ✅ SUCCESS! We got a 200 OK response
-            result = response.json()
-            if 'candidates' in result:
-                raw_text = result['candidates'][0]['content']['parts'][0]['text']
-                print(f"✅ Success with {model_name}! Response: {raw_text}")
-                
-                # Extract JSON
-                match = re.search(r'\[.*\]', raw_text, re.DOTALL)
-                if match:
-                    return json.loads(match.group())
-                else:
-                    return [] # AI replied but no JSON found
-            
-        except Exception as e:
-            print(f"⚠️ Crash with {model_name}: {e}")
-            continue # Try next model
+    print("🔍 AI Engine: Starting robust analysis...")
+
+    # 🔄 THE RACE: start the best model; hedge with the next one if it is slow,
+    # move on immediately if it fails. First valid JSON list wins.
+    queue = model_order()
+    cancelled = threading.Event()
+    running = {}
+
+    def launch_next():
+        if queue:
+            name = queue.pop(0)
+            running[_pool.submit(_ask_model, name, payload, cancelled)] = name
+
+    launch_next()
+    while running:
+        done, _ = wait(running, timeout=HEDGE_DELAY if HEDGING else None, return_when=FIRST_COMPLETED)
+        if not done:
+            if queue: print(f"🏁 No answer after {HEDGE_DELAY:g}s, racing {queue[0]} too...")
+            launch_next()
+            continue
+        for future in done:
+            running.pop(future)
+            medicines = future.result()
+            if medicines is not None:
+                # Requests already on the wire can't be stopped: they run to completion
+                # (or MODEL_TIMEOUT) and their replies are ignored. Queued ones never start.
+                cancelled.set()
+                for other in running: other.cancel()
+                if medicines: cache.put(image_bytes, medicines)
+                return medicines
+            launch_next()
 
     print("❌ All AI models failed or were busy.")
-    return []
\ No newline at end of file
+    return []
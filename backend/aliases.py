@@ -0,0 +1,157 @@
+# aliases.py
+# Exact-match fast path in front of fuzzy medicine matching.
+#
+# Every name is reduced to a canonical key: lowercase, punctuation dropped,
+# "650mg" split into "650 mg", spellings of a unit or dosage form unified
+# ("tabs"/"tablet" -> "tab", "syp" -> "syrup") and the form moved to the end, so
+# "DOLO-650MG Tabs" and "Tab. Dolo 650 mg" are both "dolo 650 mg tab". Units and
+# forms are never dropped: "Inj Pan 40", "Pan 40 mg tab" and "Pan 40 ml syrup"
+# are different products and must not share a key. A query
+# whose key equals a stock name's key is matched without fuzzy scoring
+# (MedicineIndex.exact), and so is one whose key is a known alias:
+#
+#   medicine_aliases.json   curated brand/generic groups, any member finds the
+#                           first member that is in stock
+#   medicine_aliases table  alias -> stock name pairs an admin confirmed via
+#                           /admin/medicine-aliases
+#
+# Approved orders only *suggest* pairs (source="suggested"): their lines were
+# fuzzy-matched at threshold 60, and a wrong guess learned as an exact alias
+# would win over scoring forever. Suggestions are listed for review and are
+# not used until confirmed.
+#
+# This is whole-key lookup, not a substring/trie matcher (Aho-Corasick) over
+# the written text: "Pan 40 D" must not resolve to "Pan 40" just because it
+# contains it, and after canonicalization a dict lookup is already O(1).
+# Only misses go on to trigram + WRatio scoring.
+import json
+import os
+import re
+import threading
+import time
+
+CURATED_PATH = os.getenv("MEDICINE_ALIASES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "medicine_aliases.json"))
+REFRESH_SECONDS = int(os.getenv("MEDICINE_ALIAS_TTL", "300"))
+SUGGESTED = "suggested"  # MedicineAlias.source of pairs awaiting admin review
+
+# Spelling variants -> one token (units and dosage forms keep their meaning)
+SPELLINGS = {"mgs": "mg", "gm": "g", "gms": "g", "grams": "g", "mls": "ml",
+             "tabs": "tab", "tablet": "tab", "tablets": "tab", "caps": "cap", "capsule": "cap", "capsules": "cap",
+             "syp": "syrup", "syr": "syrup", "inj": "injection", "injections": "injection"}
+FORMS = {"tab", "cap", "syrup", "injection"}
+LEADING = {"rx"}
+_DOSING = re.compile(r"\b\d\s*-\s*\d\s*-\s*\d\b")  # "1-0-1"
+_PUNCT = re.compile(r"[^a-z0-9]+")
+_SPLIT = re.compile(r"(?<=[a-z])(?=\d)|(?<=\d)(?=[a-z])")
+
+
+def key(text):
+    """Canonical form used for exact matching."""
+    text = _SPLIT.sub(" ", _PUNCT.sub(" ", _DOSING.sub(" ", (text or "").lower())))
+    tokens = [SPELLINGS.get(t, t) for t in text.split()]
+    while tokens and tokens[0] in LEADING: tokens.pop(0)
+    # "Tab Dolo 650" and "Dolo 650 tab" name the same product: forms go last
+    return " ".join([t for t in tokens if t not in FORMS] + [t for t in tokens if t in FORMS])
+
+
+class AliasDictionary:
+    def __init__(self, path=CURATED_PATH, refresh_seconds=REFRESH_SECONDS):
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._targets = {}  # alias key -> [target keys], in preference order
+        self.curated = 0
+        self.learned = 0
+
+    def is_fresh(self):
+        if self._loaded_at is None: return False
+        return not self.refresh_seconds or time.monotonic() - self._loaded_at < self.refresh_seconds
+
+    def ensure(self, loader):
+        """Build once (and every refresh_seconds). `loader` returns learned (alias, name) rows."""
+        if self.is_fresh(): return self
+        with self._lock:
+            if not self.is_fresh(): self.load(self.read_curated(), loader())
+        return self
+
+    def read_curated(self):
+        try:
+            with open(self.path, encoding="utf-8") as f: return json.load(f).get("groups", [])
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not read medicine aliases {self.path}: {e}")
+            return []
+
+    def load(self, groups, learned):
+        targets = {}
+        for group in groups:
+            keys = list(dict.fromkeys(k for k in map(key, group) if k))
+            for k in keys: targets.setdefault(k, []).extend(other for other in keys if other != k)
+        for alias, name in learned:
+            # Learned pairs are admin-confirmed: they go ahead of curated guesses
+            alias_key, name_key = key(alias), key(name)
+            if alias_key and name_key and alias_key != name_key:
+                targets[alias_key] = [name_key] + [t for t in targets.get(alias_key, []) if t != name_key]
+        self._targets = targets
+        self.curated, self.learned = len(groups), len(learned)
+        self._loaded_at = time.monotonic()
+
+    def add(self, alias, name):
+        alias_key, name_key = key(alias), key(name)
+        if not alias_key or not name_key or alias_key == name_key: return
+        with self._lock:
+            self._targets[alias_key] = [name_key] + [t for t in self._targets.get(alias_key, []) if t != name_key]
+
+    def targets(self, alias_key):
+        return self._targets.get(alias_key, ())
+
+    def reset(self):
+        with self._lock: self._loaded_at = None
+
+    def __len__(self):
+        return len(self._targets)
+
+
+# Shared by every endpoint in this process
+dictionary = AliasDictionary()
+
+
+def learned(db):
+    """Confirmed (alias, name) rows from the medicine_aliases table, for dictionary.ensure()."""
+    from models import MedicineAlias
+    try: return db.query(MedicineAlias.alias, MedicineAlias.name).filter(MedicineAlias.source.is_distinct_from(SUGGESTED)).all()
+    except Exception as e:
+        db.rollback()  # e.g. table not migrated yet: run on the curated list alone
+        print(f"⚠️ Could not load learned medicine aliases: {e}")
+        return []
+
+
+def learn(db, pairs, source="admin"):
+    """Store confirmed (written name, stock name) pairs; the in-memory dictionary picks them up on commit."""
+    saved = _save(db, pairs, source)
+    if saved: db.info.setdefault("learned_aliases", []).extend(saved)
+    return saved
+
+
+def suggest(db, pairs):
+    """Queue unconfirmed pairs for review; never replaces an alias that is already stored."""
+    return _save(db, pairs, SUGGESTED)
+
+
+def _save(db, pairs, source):
+    from sqlalchemy.exc import IntegrityError
+    from models import MedicineAlias
+    saved = []
+    for alias, name in pairs:
+        alias_key = key(alias)
+        if not alias_key or not name or alias_key == key(name): continue
+        try:
+            with db.begin_nested():
+                row = db.get(MedicineAlias, alias_key)
+                if row is None: db.add(MedicineAlias(alias=alias_key, name=name, source=source))
+                elif source == SUGGESTED or (row.name == name and row.source != SUGGESTED): continue
+                else: row.name, row.source = name, source  # corrected, or a suggestion confirmed
+        except IntegrityError:
+            continue  # stored concurrently by another request
+        saved.append((alias_key, name))
+    return saved
@@ -0,0 +1,128 @@
+# benchmarks/bench_aliases.py
+# Hit rate, accuracy and latency of the alias fast path (MedicineIndex.exact)
+# against fuzzy matching alone, on OCR-style medicine names.
+# Run from backend/:
+#   python -m benchmarks.bench_aliases [--names 5000 --queries 2000]
+#   python -m benchmarks.bench_aliases --samples ocr_samples.jsonl   # {"ocr": ..., "expected": ...} per line
+#   DATABASE_URL=... python -m benchmarks.bench_aliases --from-db      # order_items original_name -> medicine_name
+import argparse
+import json
+import random
+import re
+import statistics
+import time
+
+import aliases
+from benchmarks.synthetic import medicine_names, ocr_variant
+from medicine_index import MedicineIndex
+
+THRESHOLD = 60
+
+
+def format_variant(name, rng):
+    """How the same product comes back from OCR / doctors: units, prefixes, dashes, case."""
+    words = name.split()
+    style = rng.randrange(5)
+    if style == 0: return ("Tab. " if rng.random() < 0.5 else "Cap ") + name
+    if style == 1: return " ".join(w + "mg" if w.isdigit() else w for w in words)
+    if style == 2: return name.upper().replace(" ", "-")
+    if style == 3: return re.sub(r" (?=\d)", "", name).lower()  # "dolo650"
+    return f"{name} 1-0-1"
+
+
+def synthetic(names_count, query_count, seed):
+    rng = random.Random(seed)
+    names = medicine_names(names_count, seed)
+    groups = aliases.dictionary.read_curated()
+    stocked = {tuple(g): g[1] for g in groups if len(g) > 1}  # one brand per group is in stock
+    catalog = names + list(stocked.values())
+
+    samples = []
+    for _ in range(query_count):
+        kind = rng.random()
+        if kind < 0.45:
+            name = rng.choice(names); samples.append((format_variant(name, rng), name, "format"))
+        elif kind < 0.85:
+            name = rng.choice(names); samples.append((ocr_variant(name, rng), name, "typo"))
+        else:
+            group = rng.choice(list(stocked))
+            other = rng.choice([m for m in group if m != stocked[group]])
+            samples.append((format_variant(other, rng) if rng.random() < 0.5 else other, stocked[group], "brand/generic"))
+    return catalog, samples
+
+
+def from_file(path):
+    samples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line); samples.append((row["ocr"], row["expected"], "file"))
+    return sorted({expected for _, expected, _ in samples}), samples
+
+
+def from_db(limit):
+    import main
+    db = main.SessionLocal()
+    try:
+        catalog = [name for (name,) in db.query(main.PharmacyStock.medicine_name).distinct() if name]
+        rows = (db.query(main.OrderItem.original_name, main.OrderItem.medicine_name)
+                .filter(main.OrderItem.original_name.isnot(None), main.OrderItem.stock_id.isnot(None)).limit(limit).all())
+        aliases.dictionary.load(aliases.dictionary.read_curated(), aliases.learned(db))
+        return catalog, [(written, name, "order_items") for written, name in rows]
+    finally:
+        db.close()
+
+
+def evaluate(index, samples):
+    latencies, correct, hits, hits_correct = [], 0, 0, 0
+    by_kind = {}
+    for query, expected, kind in samples:
+        started = time.perf_counter()
+        name, score = index.match(query, THRESHOLD)
+        latencies.append((time.perf_counter() - started) * 1000)
+        hit = score == 100 and index.exact(query) is not None
+        hits += hit; correct += name == expected; hits_correct += hit and name == expected
+        stats = by_kind.setdefault(kind, [0, 0, 0])
+        stats[0] += 1; stats[1] += name == expected; stats[2] += hit
+    latencies.sort()
+    return {"accuracy": correct / len(samples), "hit_rate": hits / len(samples),
+            "hit_precision": hits_correct / hits if hits else None,
+            "mean_ms": statistics.fmean(latencies), "p50_ms": latencies[len(latencies) // 2],
+            "p95_ms": latencies[int(len(latencies) * 0.95) - 1], "by_kind": by_kind}
+
+
+def run(args):
+    if args.samples: catalog, samples = from_file(args.samples)
+    elif args.from_db: catalog, samples = from_db(args.queries)
+    else: catalog, samples = synthetic(args.names, args.queries, args.seed)
+    if not samples: raise SystemExit("no samples")
+    if not len(aliases.dictionary): aliases.dictionary.load(aliases.dictionary.read_curated(), [])
+
+    with_aliases = MedicineIndex(refresh_seconds=0); with_aliases.load(enumerate(catalog))
+    fuzzy_only = MedicineIndex(refresh_seconds=0); fuzzy_only.load(enumerate(catalog))
+    fuzzy_only.exact = lambda query: None
+
+    print(f"{len(catalog)} catalog names, {len(samples)} queries, {len(aliases.dictionary)} alias keys\n")
+    print(f"{'':>16} {'accuracy':>9} {'exact hits':>11} {'hit precision':>14} {'mean ms':>8} {'p50 ms':>7} {'p95 ms':>7}")
+    results = {}
+    for label, index in (("fuzzy only", fuzzy_only), ("alias + fuzzy", with_aliases)):
+        r = results[label] = evaluate(index, samples)
+        precision = f"{r['hit_precision']:.1%}" if r["hit_precision"] is not None else "-"
+        print(f"{label:>16} {r['accuracy']:>9.1%} {r['hit_rate']:>11.1%} {precision:>14} {r['mean_ms']:>8.3f} {r['p50_ms']:>7.3f} {r['p95_ms']:>7.3f}")
+
+    print("\nby query kind (accuracy fuzzy only -> alias + fuzzy, exact hit rate):")
+    for kind, (count, fuzzy_correct, _) in results["fuzzy only"]["by_kind"].items():
+        _, alias_correct, alias_hits = results["alias + fuzzy"]["by_kind"][kind]
+        print(f"  {kind:<16} n={count:<6} {fuzzy_correct / count:>6.1%} -> {alias_correct / count:>6.1%}   hits {alias_hits / count:.1%}")
+    if args.json: print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--names", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--samples", help="JSONL of real OCR outputs with the stock name they should match")
+    parser.add_argument("--from-db", action="store_true", help="use confirmed order_items from DATABASE_URL")
+    parser.add_argument("--json", action="store_true")
+    run(parser.parse_args())
@@ -0,0 +1,62 @@
+# benchmarks/bench_cold_start.py
+# Cold-start profile of `import main` (what a fresh Vercel lambda pays before its
+# first request), from `python -X importtime`. Exits non-zero on regression:
+#   - median import time above --max-ms
+#   - a lazily-loaded module (LAZY) showing up at import
+# Run from backend/:  python -m benchmarks.bench_cold_start [--runs 5] [--max-ms 600] [--url postgresql://...]
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+# Must stay off the import path; they load on first use
+LAZY = ("requests", "thefuzz", "rapidfuzz", "ai_engine", "image_prep", "PIL", "numpy", "inventory_io", "sqlalchemy.ext.asyncio", "jinja2")
+
+
+def profile_once(env):
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], env=env,
+                         capture_output=True, text=True, check=True)
+    modules = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line: continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def by_package(modules):
+    totals = defaultdict(int)
+    for name, (self_us, _) in modules.items(): totals[name.split(".")[0]] += self_us
+    return sorted(totals.items(), key=lambda kv: kv[1], reverse=True)
+
+
+def run(args):
+    env = dict(os.environ, DATABASE_URL=args.url or f"sqlite:///{tempfile.mkdtemp()}/cold_start.db")
+    profile_once(dict(env, DB_AUTO_MIGRATE="1"))  # make sure the schema exists before timing
+    results = {}
+    for label, migrate in (("auto-migrate", "1"), ("migrations off", "0")):
+        runs = [profile_once(dict(env, DB_AUTO_MIGRATE=migrate)) for _ in range(args.runs)]
+        results[label] = statistics.median(r["main"][1] for r in runs) / 1000
+        print(f"{label:>15}: import main {results[label]:.0f} ms (median of {args.runs})")
+
+    print("\nself time by top-level package (last run, migrations off):")
+    for package, self_us in by_package(runs[-1])[:args.top]:
+        print(f"  {package:<28} {self_us / 1000:>7.1f} ms")
+
+    failures = [name for name in LAZY if name in runs[-1]]
+    if failures: print(f"\n❌ imported at startup but should be lazy: {', '.join(failures)}")
+    if results["migrations off"] > args.max_ms: print(f"\n❌ cold start {results['migrations off']:.0f} ms > {args.max_ms} ms")
+    if failures or results["migrations off"] > args.max_ms: sys.exit(1)
+    print(f"\n✅ under {args.max_ms} ms, no eager heavy imports")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=float(os.getenv("COLD_START_MAX_MS", "600")))
+    parser.add_argument("--top", type=int, default=12)
+    parser.add_argument("--url", help="database to start against (default: throwaway SQLite)")
+    run(parser.parse_args())
@@ -0,0 +1,54 @@
+# benchmarks/bench_db_pool.py
+# Per-request DB overhead (session open -> small query -> close) for each engine profile.
+# Run from backend/:  python -m benchmarks.bench_db_pool [--url postgresql://localhost/ayur] [--threads 8]
+# Without --url a throwaway SQLite file is used (connect cost is tiny there; Postgres shows the real gap).
+import argparse
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+import database
+
+
+def one_request(Session):
+    started = time.perf_counter()
+    db = Session()
+    try:
+        db.execute(text("SELECT 1")).scalar()
+    finally:
+        db.close()
+    return (time.perf_counter() - started) * 1000
+
+
+def run(url, requests, threads, configs):
+    print(f"{'profile':>22} {'p50 ms':>8} {'p99 ms':>8} {'req/s':>8} {'connects':>9} {'wait ms max':>12}")
+    for label, profile, pre_ping in configs:
+        database.DB_PRE_PING = pre_ping
+        database.metrics = database.PoolMetrics()
+        engine = database.make_engine(url, profile=profile)
+        Session = sessionmaker(bind=engine)
+        one_request(Session)  # warm-up: first connect, dialect initialization
+        started = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            timings = sorted(pool.map(lambda _: one_request(Session), range(requests)))
+        elapsed = time.perf_counter() - started
+        stats = database.pool_stats(engine)
+        print(f"{label:>22} {timings[len(timings) // 2]:>8.3f} {timings[int(len(timings) * 0.99)]:>8.3f} "
+              f"{requests / elapsed:>8.0f} {stats['connects']:>9} {stats['wait_ms_max']:>12.3f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=f"sqlite:///{tempfile.mkdtemp()}/bench_db_pool.db")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+    run(args.url, args.requests, args.threads, [
+        ("serverless (NullPool)", "serverless", False),
+        ("server + pre_ping", "server", True),
+        ("server (LIFO, recycle)", "server", False),
+    ])
@@ -0,0 +1,65 @@
+# benchmarks/bench_image_prep.py
+# Payload size and extraction time with and without image_prep, against the stub Gemini.
+# Run from backend/:  python -m benchmarks.bench_image_prep [photo.jpg ...]
+import argparse
+import base64
+import io
+import random
+import time
+
+import ai_engine
+import extraction_cache
+import image_prep
+from benchmarks import stub_gemini
+
+
+def synthetic_photo(width=4000, height=3000, seed=1):
+    """A noisy 12 MP 'phone photo' with dark text-like strokes."""
+    from PIL import Image, ImageDraw
+    rng = random.Random(seed)
+    img = Image.effect_noise((width, height), 40).convert("RGB")
+    draw = ImageDraw.Draw(img)
+    for _ in range(400):
+        x, y = rng.randrange(width), rng.randrange(height)
+        draw.line((x, y, x + rng.randrange(20, 200), y), fill=(20, 20, 60), width=6)
+    out = io.BytesIO()
+    img.save(out, "JPEG", quality=95)
+    return out.getvalue()
+
+
+def extract_seconds(image_bytes, prep):
+    original = ai_engine.prepare_for_ocr
+    ai_engine.prepare_for_ocr = prep
+    try:
+        start = time.perf_counter()
+        ai_engine.analyze_prescription(image_bytes)
+        return time.perf_counter() - start
+    finally:
+        ai_engine.prepare_for_ocr = original
+
+
+def run(images, bandwidth):
+    server, base = stub_gemini.start(delay=0.2, bytes_per_second=bandwidth)
+    ai_engine.GEMINI_API_BASE, ai_engine.API_KEY = base, ai_engine.API_KEY or "stub"
+    ai_engine.cache = extraction_cache.ExtractionCache(path=":memory:", ttl=0)  # never hit
+
+    print(f"{'image':>12} {'raw KB':>8} {'prepped KB':>11} {'b64 ratio':>9} {'prep ms':>8} {'raw e2e s':>10} {'prepped e2e s':>13}")
+    for label, data in images:
+        start = time.perf_counter()
+        prepped, mime = image_prep.prepare_for_ocr(data)
+        prep_ms = (time.perf_counter() - start) * 1000
+        ratio = len(base64.b64encode(prepped)) / len(base64.b64encode(data))
+
+        raw_s = extract_seconds(data, lambda b: (b, image_prep.sniff_mime(b)))
+        prepped_s = extract_seconds(data, image_prep.prepare_for_ocr)
+        print(f"{label:>12} {len(data) // 1024:>8} {len(prepped) // 1024:>11} {ratio:>9.2f} {prep_ms:>8.0f} {raw_s:>10.2f} {prepped_s:>13.2f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--bandwidth", type=float, default=2_000_000, help="simulated upstream bytes/second")
+    args = parser.parse_args()
+    images = [(path.rsplit("/", 1)[-1][:12], open(path, "rb").read()) for path in args.files]
+    run(images or [("synthetic", synthetic_photo())], args.bandwidth)
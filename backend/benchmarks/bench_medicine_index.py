@@ -0,0 +1,49 @@
+# benchmarks/bench_medicine_index.py
+# Compares the old per-request thefuzz.extractOne scan with MedicineIndex.
+# Run from backend/:  python -m benchmarks.bench_medicine_index [--queries 200]
+import argparse
+import time
+from thefuzz import process
+
+from medicine_index import MedicineIndex
+from benchmarks.synthetic import medicine_names, ocr_queries
+
+
+def timed(fn, queries):
+    start = time.perf_counter()
+    results = [fn(q) for q in queries]
+    return results, (time.perf_counter() - start) / len(queries) * 1000
+
+
+def run(sizes, query_count, threshold):
+    print(f"{'names':>8} {'build ms':>9} {'extractOne ms/q':>16} {'index ms/q':>11} {'speedup':>8} {'agree':>6}")
+    for size in sizes:
+        names = medicine_names(size)
+        queries = ocr_queries(names, query_count)
+
+        start = time.perf_counter()
+        index = MedicineIndex(refresh_seconds=0)
+        index.load(enumerate(names))
+        build_ms = (time.perf_counter() - start) * 1000
+
+        def old(q):
+            best, score = process.extractOne(q, names)
+            return score if score > threshold else 0
+
+        def new(q):
+            return index.match(q, threshold)[1]
+
+        # Equal-score ties may resolve to different names, so compare best scores
+        old_scores, old_ms = timed(old, queries)
+        new_scores, new_ms = timed(new, queries)
+        agree = sum(a == b for a, b in zip(old_scores, new_scores)) / len(queries)
+        print(f"{size:>8} {build_ms:>9.1f} {old_ms:>16.3f} {new_ms:>11.3f} {old_ms / new_ms:>7.1f}x {agree:>6.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--threshold", type=int, default=60)
+    args = parser.parse_args()
+    run(args.sizes, args.queries, args.threshold)
@@ -0,0 +1,57 @@
+# benchmarks/bench_routing.py
+# Routing latency per order against a synthetic multi-pharmacy catalog.
+# Run from backend/:  python -m benchmarks.bench_routing [--pharmacies 2000 --per-pharmacy 150]
+import argparse
+import os
+import random
+import tempfile
+import time
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_routing.db"
+
+import routing
+from benchmarks.synthetic import medicine_names
+
+
+def catalog(pharmacies, per_pharmacy, names, seed=3):
+    rng = random.Random(seed)
+    pharmacy_rows = [(pid, f"Pharmacy {pid}", f"Shop {pid}, Pin: {rng.randrange(500001, 560100)}") for pid in range(1, pharmacies + 1)]
+    stock_rows, stock_id = [], 0
+    for pid in range(1, pharmacies + 1):
+        for name in rng.sample(names, per_pharmacy):
+            stock_id += 1
+            stock_rows.append((stock_id, pid, name, rng.randrange(0, 50), rng.randrange(20, 500)))
+    return stock_rows, pharmacy_rows
+
+
+def run(args):
+    names = medicine_names(args.medicines)
+    stock_rows, pharmacy_rows = catalog(args.pharmacies, args.per_pharmacy, names)
+    start = time.perf_counter()
+    table = routing.RoutingTable(stock_rows, pharmacy_rows)
+    print(f"{len(stock_rows)} offers from {args.pharmacies} pharmacies: table built in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    rng = random.Random(9)
+    orders = [([(rng.choice(names), rng.randrange(1, 4)) for _ in range(args.lines)], str(rng.randrange(500001, 560100)))
+              for _ in range(args.orders)]
+    for objective in routing.OBJECTIVES:
+        timings, shipments, missing = [], 0, 0
+        for lines, pincode in orders:
+            start = time.perf_counter()
+            chosen, lost = table.route(lines, pincode, objective)
+            timings.append((time.perf_counter() - start) * 1000)
+            shipments += len({o.pharmacy_id for o in chosen.values()}); missing += len(lost)
+        timings.sort()
+        print(f"{objective:>10}: p50 {timings[len(timings) // 2]:.3f} ms  p99 {timings[int(len(timings) * 0.99)]:.3f} ms  "
+              f"avg shipments {shipments / len(orders):.2f}  unfilled lines {missing}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pharmacies", type=int, default=2000)
+    parser.add_argument("--per-pharmacy", type=int, default=150)
+    parser.add_argument("--medicines", type=int, default=3000)
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--lines", type=int, default=5)
+    run(parser.parse_args())
@@ -0,0 +1,105 @@
+# benchmarks/load_async_db.py
+# Throughput of the async DB endpoints vs. their old sync (threadpool) versions
+# under concurrent clients, served by a real uvicorn server.
+# Run from backend/:  python -m benchmarks.load_async_db [--clients 100 --seconds 5]
+#                     DATABASE_URL=postgresql://... to measure against Postgres (asyncpg vs psycopg2)
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/load_async_db.db"
+
+import httpx
+import uvicorn
+from fastapi import Depends
+from sqlalchemy.orm import Session
+
+import main
+from benchmarks.synthetic import medicine_names
+
+
+# The pre-async handlers, mounted next to the real ones for comparison
+@main.app.get("/bench/sync/check-order-status/{pres_id}")
+def sync_check_status(pres_id: int, db: Session = Depends(main.get_db)):
+    pres = db.query(main.Prescription).filter(main.Prescription.id == pres_id).first()
+    return {"status": pres.status if pres else "error"}
+
+
+@main.app.get("/bench/sync/get-prescription/{pres_id}")
+def sync_get_data(pres_id: int, db: Session = Depends(main.get_db)):
+    pres = db.query(main.Prescription).filter(main.Prescription.id == pres_id).first()
+    raw = main.medicine_list(pres)
+    return main.build_bill(pres, raw, main.match_stock([m.get("name") for m in raw], db, threshold=60))
+
+
+def seed(medicines=2000, prescriptions=50):
+    db = main.SessionLocal()
+    names = medicine_names(medicines)
+    pharmacy = main.Pharmacy(name="Bench Pharmacy", location="Hyderabad 500001")
+    doctor = main.Doctor(name="Bench", uuid_code=f"bench-{time.time()}")
+    db.add_all([pharmacy, doctor]); db.flush()
+    db.add_all([main.PharmacyStock(pharmacy_id=pharmacy.id, medicine_name=n, qty=1000, price=50) for n in names])
+    db.flush()
+    ids = []
+    for i in range(prescriptions):
+        pres = main.Prescription(doctor_id=doctor.id, image_url="bench", status="Pending Approval")
+        main.set_medicines(pres, [{"name": names[(i * 7 + k) % len(names)], "qty": 1, "price": 50} for k in range(4)], db)
+        db.add(pres); db.flush(); ids.append(pres.id)
+    db.commit(); db.close()
+    return ids
+
+
+async def hammer(base, paths, clients, seconds):
+    done, latencies, errors = 0, [], 0
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=30) as client:
+        async def worker(n):
+            nonlocal done, errors
+            i = n
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                r = await client.get(paths[i % len(paths)])
+                latencies.append(time.perf_counter() - started)
+                if r.status_code >= 400: errors += 1
+                done += 1; i += clients
+        await asyncio.gather(*(worker(n) for n in range(clients)))
+    latencies.sort()
+    return {"rps": round(done / seconds), "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+            "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 1), "errors": errors}
+
+
+def run(args):
+    ids = seed()
+    # Server in its own process so the load generator doesn't share its GIL
+    server = multiprocessing.get_context("fork").Process(
+        target=uvicorn.run, args=(main.app,), kwargs={"host": "127.0.0.1", "port": args.port, "log_level": "warning"}, daemon=True)
+    server.start()
+    base = f"http://127.0.0.1:{args.port}"
+    while True:
+        try: httpx.get(f"{base}/check-order-status/{ids[0]}"); break
+        except httpx.TransportError: time.sleep(0.1)
+
+    results = {}
+    for label, template in [("check-order-status (async)", "/check-order-status/{}"),
+                            ("check-order-status (sync)", "/bench/sync/check-order-status/{}"),
+                            ("get-prescription (async)", "/get-prescription/{}"),
+                            ("get-prescription (sync)", "/bench/sync/get-prescription/{}")]:
+        results[label] = asyncio.run(hammer(base, [template.format(i) for i in ids], args.clients, args.seconds))
+        print(f"{label:>28}: {results[label]}")
+    server.terminate()
+    if args.json: print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--json", action="store_true")
+    run(parser.parse_args())
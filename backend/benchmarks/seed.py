@@ -0,0 +1,89 @@
+# benchmarks/seed.py
+# Synthetic doctors, pharmacies, stock and prescriptions at a chosen scale.
+# Run from backend/:  DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.seed --scale medium
+# Deterministic for a given scale + seed, so runs on different days are comparable.
+import argparse
+import datetime
+import json
+import random
+import time
+
+from sqlalchemy import insert
+
+from benchmarks.synthetic import medicine_names, ocr_variant
+
+SCALES = {
+    "small": {"doctors": 20, "pharmacies": 5, "medicines": 1000, "stock_per_pharmacy": 300, "prescriptions": 500},
+    "medium": {"doctors": 200, "pharmacies": 50, "medicines": 5000, "stock_per_pharmacy": 1500, "prescriptions": 5000},
+    "large": {"doctors": 2000, "pharmacies": 500, "medicines": 20000, "stock_per_pharmacy": 4000, "prescriptions": 50000},
+}
+BATCH = 5000
+
+
+def _insert(db, model, rows):
+    for start in range(0, len(rows), BATCH):
+        db.execute(insert(model), rows[start:start + BATCH])
+
+
+def seed(db, doctors, pharmacies, medicines, stock_per_pharmacy, prescriptions, seed=42):
+    """Bulk-inserts everything and returns ids/names the benchmarks need."""
+    import main
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    names = medicine_names(medicines, seed)
+    tag = f"{seed}-{int(time.time())}"
+
+    _insert(db, main.Doctor, [{"name": f"Dr. Bench {i}", "phone": f"9{tag}{i}", "clinic_address": "Bench Clinic",
+                               "uuid_code": f"bench-{tag}-{i}"} for i in range(doctors)])
+    _insert(db, main.Pharmacy, [{"name": f"Bench Pharmacy {tag}-{i}", "location": f"Shop {i}, Pin: {rng.randrange(500001, 560100)}"}
+                                for i in range(pharmacies)])
+    doctor_ids = [d.id for d in db.query(main.Doctor.id).filter(main.Doctor.uuid_code.like(f"bench-{tag}-%"))]
+    pharmacy_ids = [p.id for p in db.query(main.Pharmacy.id).filter(main.Pharmacy.name.like(f"Bench Pharmacy {tag}-%"))]
+
+    stock = []
+    for pharmacy_id in pharmacy_ids:
+        for name in rng.sample(names, min(stock_per_pharmacy, len(names))):
+            stock.append({"pharmacy_id": pharmacy_id, "medicine_name": name, "qty": rng.randrange(0, 200),
+                          "price": rng.randrange(10, 900), "image_url": "default.jpg"})
+    _insert(db, main.PharmacyStock, stock)
+    db.commit()
+
+    # Prescriptions through the ORM (order_items + legacy JSON), as the app writes them
+    statuses = ["Pending Approval", "Approved", "Verifying Payment", "Ordered", "Payment Failed"]
+    now = datetime.datetime.utcnow()
+    prescription_ids = []
+    for start in range(0, prescriptions, 500):
+        batch = []
+        for i in range(start, min(start + 500, prescriptions)):
+            meds = [{"name": ocr_variant(rng.choice(names), rng), "qty": rng.randrange(1, 4), "price": 0} for _ in range(rng.randrange(1, 6))]
+            pres = main.Prescription(doctor_id=rng.choice(doctor_ids), patient_name=f"Patient {i}", patient_phone=f"8{i:09d}",
+                                     image_url="bench.jpg", status=rng.choice(statuses),
+                                     created_at=now - datetime.timedelta(minutes=rng.randrange(0, 60 * 24 * 90)))
+            main.set_medicines(pres, meds, db)
+            batch.append(pres)
+        db.add_all(batch); db.commit()
+        prescription_ids += [p.id for p in batch]
+
+    return {"doctor_uuids": [f"bench-{tag}-{i}" for i in range(doctors)], "pharmacy_ids": pharmacy_ids,
+            "prescription_ids": prescription_ids, "names": names, "stock_rows": len(stock),
+            "seconds": round(time.perf_counter() - started, 2)}
+
+
+def seed_scale(db, scale, seed_value=42, **overrides):
+    return seed(db, **{**SCALES[scale], **{k: v for k, v in overrides.items() if v is not None}}, seed=seed_value)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    for field in SCALES["small"]: parser.add_argument(f"--{field.replace('_', '-')}", type=int, dest=field)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    import main
+    db = main.SessionLocal()
+    try:
+        info = seed_scale(db, args.scale, args.seed, **{f: getattr(args, f) for f in SCALES["small"]})
+    finally:
+        db.close()
+    print(json.dumps({k: (len(v) if isinstance(v, list) else v) for k, v in info.items()}))
@@ -0,0 +1,94 @@
+# benchmarks/stress_reservations.py
+# Many concurrent checkouts racing for one SKU: stock must never go negative and
+# exactly `stock` units may be held. Then releases/expiry must put every unit back.
+# Run from backend/:  DATABASE_URL=postgresql://... python -m benchmarks.stress_reservations
+#                     (defaults to a throwaway SQLite file)
+import argparse
+import datetime
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/stress_reservations.db"
+
+import main
+import reservations
+
+
+def checkout(stock_id, doctor_id, qty, start):
+    db = main.SessionLocal()
+    try:
+        pres = main.Prescription(doctor_id=doctor_id, patient_name="stress", image_url="STRESS", status="Verifying Payment")
+        db.add(pres); db.flush()
+        pres.items.append(main.OrderItem(position=0, medicine_name="Stress SKU", qty=qty, price=10, stock_id=stock_id))
+        db.flush()
+        start.wait()
+        reservations.hold(db, pres)
+        db.commit()
+        return pres.id
+    except reservations.OutOfStock:
+        db.rollback()
+        return None
+    finally:
+        db.close()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stock", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--qty", type=int, default=1)
+    args = parser.parse_args()
+
+    db = main.SessionLocal()
+    pharmacy = main.Pharmacy(name=f"Stress {time.time()}", location="")
+    doctor = main.Doctor(name="Stress", uuid_code=f"stress-{time.time()}")
+    db.add_all([pharmacy, doctor]); db.flush()
+    stock = main.PharmacyStock(pharmacy_id=pharmacy.id, medicine_name="Stress SKU", qty=args.stock, price=10)
+    db.add(stock); db.commit()
+    stock_id, doctor_id = stock.id, doctor.id
+
+    start = threading.Event()
+    began = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as pool:
+        futures = [pool.submit(checkout, stock_id, doctor_id, args.qty, start) for _ in range(args.orders)]
+        time.sleep(0.2); start.set()
+        results = [f.result() for f in futures]
+    elapsed = time.perf_counter() - began
+
+    held = [r for r in results if r]
+    remaining = db.query(main.PharmacyStock.qty).filter(main.PharmacyStock.id == stock_id).scalar()
+    print(f"{args.orders} checkouts on {args.threads} threads in {elapsed:.2f}s: "
+          f"{len(held)} held, {args.orders - len(held)} refused, {remaining} left")
+    assert remaining >= 0, "oversold"
+    assert remaining + len(held) * args.qty == args.stock, "units lost or duplicated"
+    assert len(held) == min(args.orders, args.stock // args.qty), "refused while stock was available"
+
+    # Half are declined concurrently (twice each, to race the release), the rest expire
+    declined, expiring = held[::2], held[1::2]
+
+    def decline(pres_id):
+        s = main.SessionLocal()
+        try: reservations.release(s, pres_id); s.commit()
+        finally: s.close()
+    with ThreadPoolExecutor(args.threads) as pool:
+        list(pool.map(decline, declined + declined))
+    db.query(main.StockReservation).filter(main.StockReservation.prescription_id.in_(expiring)).update(
+        {"expires_at": datetime.datetime.utcnow() - datetime.timedelta(minutes=1)}, synchronize_session=False)
+    db.commit()
+    while reservations.release_expired(db): pass
+
+    db.expire_all()
+    remaining = db.query(main.PharmacyStock.qty).filter(main.PharmacyStock.id == stock_id).scalar()
+    print(f"after declines and expiry: {remaining} left")
+    assert remaining == args.stock, "released units do not add up"
+    db.close()
+    print("✅ no oversell")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,65 @@
+# benchmarks/stub_gemini.py
+# Tiny stand-in for the Gemini generateContent API.
+#   python -m benchmarks.stub_gemini --port 8765 --delay 2
+#   GEMINI_API_BASE=http://127.0.0.1:8765/v1beta GOOGLE_API_KEY=stub uvicorn main:app
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_MEDICINES = ["Dolo 650", "Pan 40"]
+
+
+def make_handler(delay, medicines, fail_models, bytes_per_second=None):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            size = int(self.headers.get("Content-Length", 0))
+            self.rfile.read(size)
+            model = re.search(r"/models/([^:]+):", self.path)
+            model = model.group(1) if model else ""
+            # Bigger payloads take longer, like a real upload + vision model would
+            time.sleep(delay + (size / bytes_per_second if bytes_per_second else 0))
+
+            if model in fail_models:
+                self._reply(503, {"error": {"message": f"{model} overloaded (stub)"}})
+                return
+            text = json.dumps(medicines)
+            self._reply(200, {"candidates": [{"content": {"parts": [{"text": text}]}}]})
+
+        def _reply(self, code, body):
+            raw = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start(port=0, delay=0.0, medicines=None, fail_models=(), bytes_per_second=None):
+    """Serve in a daemon thread. Returns (server, base_url for GEMINI_API_BASE)."""
+    handler = make_handler(delay, medicines or DEFAULT_MEDICINES, set(fail_models), bytes_per_second)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1beta"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0)
+    parser.add_argument("--bandwidth", type=float, default=None, help="simulated bytes/second")
+    parser.add_argument("--fail", nargs="*", default=[], help="model names that answer 503")
+    args = parser.parse_args()
+    server, base = start(args.port, args.delay, fail_models=args.fail, bytes_per_second=args.bandwidth)
+    print(f"Stub Gemini on {base}")
+    try:
+        while True: time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
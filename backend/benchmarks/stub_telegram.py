@@ -0,0 +1,45 @@
+# benchmarks/stub_telegram.py
+# Records sendMessage calls instead of talking to Telegram.
+#   server, base, inbox = start(); notifier.dispatcher.api_base = base
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+def make_handler(inbox, delay, rate_limit_first):
+    state = {"seen": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+            fields = {k: v[0] for k, v in parse_qs(body).items()}
+            time.sleep(delay)
+            state["seen"] += 1
+            if state["seen"] <= rate_limit_first:
+                self._reply(429, {"ok": False, "parameters": {"retry_after": 1}})
+                return
+            inbox.append({"at": time.time(), **fields})
+            self._reply(200, {"ok": True, "result": {"message_id": len(inbox)}})
+
+        def _reply(self, code, body):
+            raw = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start(port=0, delay=0.0, rate_limit_first=0):
+    """Returns (server, api_base for TELEGRAM_API_BASE, inbox list of delivered messages)."""
+    inbox = []
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(inbox, delay, rate_limit_first))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", inbox
@@ -0,0 +1,176 @@
+# benchmarks/suite.py
+# End-to-end and micro benchmarks against the real app, with stub Gemini and
+# Telegram servers, writing one JSON result file per run for comparison.
+# Run from backend/:
+#   python -m benchmarks.suite --scale small --output results/$(date +%F).json
+#   python -m benchmarks.suite --scale medium --compare results/last.json
+#   DATABASE_URL=postgresql://localhost/ayur_bench python -m benchmarks.suite
+# Without DATABASE_URL a throwaway SQLite file is used.
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+
+from benchmarks import stub_gemini, stub_telegram
+
+# Everything external is stubbed before main is imported (it reads env at import)
+_tmp = tempfile.mkdtemp(prefix="ayur-bench-")
+gemini, GEMINI_BASE = stub_gemini.start(delay=0.05)
+telegram, TELEGRAM_BASE, TELEGRAM_INBOX = stub_telegram.start()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/bench.db")
+os.environ.update(GEMINI_API_BASE=GEMINI_BASE, GOOGLE_API_KEY="stub", TELEGRAM_API_BASE=TELEGRAM_BASE,
+                  TELEGRAM_BOT_TOKEN="stub", TELEGRAM_CHAT_ID="1", TELEGRAM_CHAT_INTERVAL="0",
+                  OCR_CACHE_PATH=f"{_tmp}/ocr_cache.db", DB_AUTO_MIGRATE="1", RATE_LIMIT_ENABLED="0")
+
+import main  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from benchmarks.seed import SCALES, seed_scale  # noqa: E402
+from benchmarks.synthetic import ocr_queries  # noqa: E402
+
+
+def measure(fn, iterations, warmup=3):
+    for _ in range(warmup): fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {"iterations": iterations, "mean_ms": round(statistics.fmean(samples), 3),
+            "p50_ms": round(samples[len(samples) // 2], 3), "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 3),
+            "ops_per_s": round(1000 / statistics.fmean(samples), 1)}
+
+
+def sample_image():
+    from PIL import Image, ImageDraw
+    img = Image.new("RGB", (1200, 1600), "white")
+    ImageDraw.Draw(img).text((100, 100), "Rx Dolo 650 1-0-1", fill="black")
+    out = io.BytesIO(); img.save(out, "JPEG")
+    return out.getvalue()
+
+
+def micro(data, iterations):
+    rng = random.Random(5)
+    db = main.SessionLocal()
+    try:
+        main.stock_index(db)  # index build is reported separately below
+        queries = ocr_queries(data["names"], 200)
+        prescriptions = [rng.choice(data["prescription_ids"]) for _ in range(iterations)]
+        batch_ids = data["prescription_ids"][:100]
+
+        def get_data_matching():
+            pres = db.get(main.Prescription, rng.choice(prescriptions))
+            meds = main.medicine_list(pres)
+            main.build_bill(pres, meds, main.match_stock([m.get("name") for m in meds], db, threshold=60))
+
+        def catalog_serialization():
+            rows = main.catalog_rows(db)
+            snap = main.catalog.Snapshot([{"name": n, "price": p, "image": i, "pharmacy": ph} for n, p, i, ph in rows if p], 0)
+            snap.encoded("gzip")
+
+        started = time.perf_counter()
+        main.medicine_index.index.reset(); main.stock_index(db)
+        index_build_ms = (time.perf_counter() - started) * 1000
+        return {
+            "index_build": {"ms": round(index_build_ms, 1)},
+            "check_real_stock": measure(lambda: main.check_real_stock([{"name": q} for q in rng.sample(queries, 5)], db), iterations),
+            "get_data_matching": measure(get_data_matching, iterations),
+            "price_prescriptions_batch_100": measure(lambda: main.price_prescriptions_batch(batch_ids, db), max(3, iterations // 20)),
+            "catalog_serialization": measure(catalog_serialization, max(3, iterations // 20)),
+            "routing_plan": measure(lambda: main.routing.plan(db, [{"name": n, "qty": 1} for n in rng.sample(data["names"], 5)], "500001"), iterations),
+        }
+    finally:
+        db.close()
+
+
+def api(data, iterations):
+    rng = random.Random(6)
+    client = TestClient(main.app)
+    ids, names = data["prescription_ids"], data["names"]
+    image = sample_image()
+    results = {}
+
+    results["get_prescription"] = measure(lambda: client.get(f"/get-prescription/{rng.choice(ids)}"), iterations)
+    results["check_order_status"] = measure(lambda: client.get(f"/check-order-status/{rng.choice(ids)}"), iterations)
+
+    main.catalog.invalidate()
+    results["all_medicines_cold"] = measure(lambda: (main.catalog.invalidate(), client.get("/store/all-medicines")), max(3, iterations // 20), warmup=0)
+    etag = client.get("/store/all-medicines").headers["etag"]
+    results["all_medicines_warm"] = measure(lambda: client.get("/store/all-medicines", headers={"accept-encoding": "gzip"}), iterations)
+    results["all_medicines_304"] = measure(lambda: client.get("/store/all-medicines", headers={"if-none-match": etag}), iterations)
+    results["store_search"] = measure(lambda: client.get("/store/medicines", params={"q": rng.choice(names)[:4], "match": "fuzzy"}), iterations)
+    results["medicine_typeahead"] = measure(lambda: client.get("/doctor/medicine-search", params={"q": rng.choice(names)[:3]}), iterations)
+
+    def checkout():
+        meds = [{"name": n, "qty": 1, "price": 50} for n in rng.sample(names, 3)]
+        client.post("/store/checkout", json={"patient_name": "Bench", "address_line": "x", "pincode": "500001", "landmark": "y",
+                                             "payment_mode": "UPI (bench)", "phone": "9", "final_medicines": meds})
+    results["store_checkout"] = measure(checkout, max(3, iterations // 5))
+
+    def upload_to_done():
+        # Upload returns immediately; this waits for the OCR worker (stub Gemini ~50 ms) to finish
+        body = client.post(f"/upload-prescription/{rng.choice(data['doctor_uuids'])}",
+                           files={"file": ("rx.jpg", image, "image/jpeg")}, data={"manual_phone": "9000000000"}).json()
+        while client.get(f"/ocr-jobs/{body['job_id']}").json().get("state") not in ("done", "failed"):
+            time.sleep(0.005)
+    main.extraction_cache.cache.put = lambda *a, **k: None  # every upload goes to the stub, not the OCR cache
+    results["upload_ocr_end_to_end"] = measure(upload_to_done, max(3, iterations // 10), warmup=1)
+    return results
+
+
+def git_revision():
+    try: return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception: return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f: baseline = json.load(f)
+    print(f"\nvs {baseline_path} ({baseline['meta'].get('git')}):")
+    for group in ("micro", "api"):
+        for name, now in results[group].items():
+            before = baseline.get(group, {}).get(name)
+            if not before or "p50_ms" not in now or "p50_ms" not in before: continue
+            change = (now["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100 if before["p50_ms"] else 0
+            flag = "🔺" if change > 10 else ("🔻" if change < -10 else "  ")
+            print(f"  {flag} {group}.{name:<32} {before['p50_ms']:>9.3f} -> {now['p50_ms']:>9.3f} ms ({change:+.0f}%)")
+
+
+def run(args):
+    db = main.SessionLocal()
+    try: data = seed_scale(db, args.scale, args.seed)
+    finally: db.close()
+    print(f"🌱 seeded {args.scale}: {len(data['prescription_ids'])} prescriptions, {data['stock_rows']} stock rows in {data['seconds']}s")
+
+    results = {
+        "meta": {"scale": args.scale, "sizes": SCALES[args.scale], "iterations": args.iterations, "git": git_revision(),
+                 "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                 "database": main.engine.dialect.name, "seed_seconds": data["seconds"]},
+        "micro": micro(data, args.iterations),
+        "api": api(data, args.iterations),
+    }
+    for group in ("micro", "api"):
+        for name, r in results[group].items():
+            print(f"  {group}.{name:<32} " + "  ".join(f"{k} {v}" for k, v in r.items()))
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f: json.dump(results, f, indent=2)
+        print(f"\n💾 {args.output}")
+    if args.compare: compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", help="earlier results JSON to diff against")
+    run(parser.parse_args())
@@ -0,0 +1,41 @@
+# benchmarks/synthetic.py
+# Deterministic fake catalog data for the benchmark scripts.
+import random
+
+PREFIXES = ["Dolo", "Pan", "Azi", "Ashwa", "Tri", "Brah", "Cro", "Neu", "Calp", "Liv", "Amo", "Meto",
+            "Glu", "Ome", "Ceti", "Mont", "Rani", "Vita", "Zinc", "Feb", "Sino", "Tulsi", "Giloy", "Shata"]
+MIDDLES = ["", "ra", "lo", "xi", "va", "mi", "to", "ne", "phala", "gandha", "mycin", "zole", "pril", "din"]
+FORMS = ["Tablet", "Capsule", "Syrup", "Churna", "Vati", "Drops", "Gel", "Kwath"]
+STRENGTHS = ["", "5", "10", "40", "250", "500", "650", "1000"]
+
+
+def medicine_names(n, seed=42):
+    """`n` unique, realistic-looking medicine names."""
+    rng = random.Random(seed)
+    names, seen = [], set()
+    while len(names) < n:
+        name = f"{rng.choice(PREFIXES)}{rng.choice(MIDDLES)}"
+        strength = rng.choice(STRENGTHS)
+        if strength: name += f" {strength}"
+        if rng.random() < 0.6: name += f" {rng.choice(FORMS)}"
+        if name in seen: name += f" {len(names)}"
+        seen.add(name); names.append(name)
+    return names
+
+
+def ocr_variant(name, rng):
+    """Roughly what Gemini hands back: dropped words, typos, case noise."""
+    words = name.split()
+    if len(words) > 1 and rng.random() < 0.4: words.pop()
+    text = " ".join(words)
+    if len(text) > 4 and rng.random() < 0.5:
+        i = rng.randrange(1, len(text) - 1)
+        text = text[:i] + text[i + 1:]
+    if rng.random() < 0.3: text = text.upper()
+    if rng.random() < 0.3: text = text.replace(" ", "-")
+    return text
+
+
+def ocr_queries(names, count, seed=7):
+    rng = random.Random(seed)
+    return [ocr_variant(rng.choice(names), rng) for _ in range(count)]
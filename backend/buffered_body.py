@@ -0,0 +1,33 @@
+# buffered_body.py
+# Reading a request body inside ASGI middleware (idempotency fingerprints,
+# rate-limit keys) and handing the same bytes on to the app.
+#
+# read() stops at `limit` bytes: from Content-Length when the client sends
+# one, otherwise as soon as the buffered body passes it. Callers answer
+# TooLarge with a 413 before anything else has been kept in memory.
+
+
+class TooLarge(Exception):
+    pass
+
+
+async def read(headers, receive, limit):
+    """The whole body, or None if the client disconnected first."""
+    declared = headers.get(b"content-length", b"")
+    if declared.isdigit() and int(declared) > limit: raise TooLarge()
+    chunks, size, more = [], 0, True
+    while more:
+        message = await receive()
+        if message["type"] == "http.disconnect": return None
+        chunks.append(message.get("body", b"")); more = message.get("more_body", False)
+        size += len(chunks[-1])
+        if size > limit: raise TooLarge()
+    return b"".join(chunks)
+
+
+def replay(body, receive):
+    """A receive() that yields the buffered body once, then the real channel (so disconnects still arrive)."""
+    pending = [{"type": "http.request", "body": body, "more_body": False}]
+    async def replay_receive():
+        return pending.pop() if pending else await receive()
+    return replay_receive
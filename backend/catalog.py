@@ -0,0 +1,118 @@
+# catalog.py
+# Versioned, pre-serialized snapshots of the public catalog endpoints.
+#
+# The JSON body is built once per stock change (or every CATALOG_TTL seconds, so
+# several workers converge) and reused byte-for-byte. The ETag is a hash of the
+# body, so every worker hands out the same tag and browsers/CDNs get 304s.
+import base64
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+from fastapi import HTTPException, Request, Response
+from starlette.concurrency import run_in_threadpool
+
+try:
+    import brotli  # optional: pip install brotli
+except ImportError:
+    brotli = None
+
+CATALOG_TTL = int(os.getenv("CATALOG_TTL", "60"))
+CACHE_CONTROL = os.getenv("CATALOG_CACHE_CONTROL", "public, max-age=60, stale-while-revalidate=300")
+
+
+class Snapshot:
+    def __init__(self, data, version):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.body = json.dumps(data, separators=(",", ":")).encode()
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest()[:20] + '"'
+        self._encoded = {}
+
+    def encoded(self, encoding):
+        # Compress lazily, once per snapshot
+        if encoding not in self._encoded:
+            if encoding == "br": self._encoded[encoding] = brotli.compress(self.body)
+            else: self._encoded[encoding] = gzip.compress(self.body, compresslevel=6)
+        return self._encoded[encoding]
+
+
+_lock = threading.Lock()
+_version = 0
+_snapshots = {}
+
+
+def invalidate():
+    """Call whenever PharmacyStock/Pharmacy rows change."""
+    global _version
+    with _lock:
+        _version += 1
+        _snapshots.clear()
+
+
+def version():
+    return _version
+
+
+def _fresh(key):
+    snap = _snapshots.get(key)
+    if snap and snap.version == _version and time.monotonic() - snap.built_at < CATALOG_TTL:
+        return snap
+    return None
+
+
+def _store(key, data, started_at):
+    snap = Snapshot(data, started_at)
+    with _lock:
+        if started_at == _version: _snapshots[key] = snap
+    return snap
+
+
+def get(key, builder):
+    """Current snapshot for `key`, calling builder() -> data when stale."""
+    snap = _fresh(key)
+    if snap: return snap
+    with _lock:
+        snap = _fresh(key)
+        if snap: return snap
+        started_at = _version
+    return _store(key, builder(), started_at)  # DB work happens outside the lock
+
+
+async def get_async(key, builder):
+    """Same as get() for async handlers: a stale snapshot is rebuilt (sync builder) in the threadpool."""
+    snap = _fresh(key)
+    if snap: return snap
+    return await run_in_threadpool(get, key, builder)  # query, JSON and compression stay off the event loop
+
+
+def respond(request: Request, snap: Snapshot):
+    headers = {"ETag": snap.etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if snap.etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    accepted = request.headers.get("accept-encoding", "")
+    body = snap.body
+    if len(body) > 1024:
+        if brotli and "br" in accepted: body = snap.encoded("br"); headers["Content-Encoding"] = "br"
+        elif "gzip" in accepted: body = snap.encoded("gzip"); headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# Opaque keyset-pagination cursors: (last sort value, last id), shared with the admin dashboard
+def encode_cursor(value, row_id):
+    return base64.urlsafe_b64encode(json.dumps([value, row_id]).encode()).decode()
+
+
+def decode_cursor(cursor, value_type=None):
+    """(value, id) from encode_cursor; a 400 if it doesn't decode or `value` isn't a `value_type`."""
+    try: value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception: raise HTTPException(400, "Invalid cursor")
+    # json gives bools for true/false, which isinstance() would pass as ints
+    valid_id = isinstance(row_id, int) and not isinstance(row_id, bool)
+    valid_value = value_type is None or (isinstance(value, value_type) and not isinstance(value, bool))
+    if not (valid_id and valid_value): raise HTTPException(400, "Invalid cursor")
+    return value, row_id
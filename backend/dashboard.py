@@ -0,0 +1,140 @@
+# dashboard.py
+# Admin dashboard queries: prescriptions and completed orders by status / date
+# range, and sales aggregates.
+#
+#   list_prescriptions() / list_orders()   keyset pagination, newest first, on
+#                                          (status, created_at) and (order_date)
+#   summary()                              counts, revenue and top medicines, all
+#                                          computed by SQL GROUP BY
+#   refresh_rollup()                       incremental refresh of daily_sales
+#
+# With DASHBOARD_ROLLUP=1 the per-day revenue series is read from daily_sales
+# instead of grouping completed_orders on every request.
+import datetime
+import os
+
+from fastapi import HTTPException
+from sqlalchemy import and_, delete, func, insert, or_, select
+from sqlalchemy.exc import IntegrityError
+
+import catalog
+from models import CompletedOrder, DailySales, Doctor, OrderItem, Prescription
+
+USE_ROLLUP = os.getenv("DASHBOARD_ROLLUP", "0") == "1"
+MAX_PAGE = 200
+
+
+def date_range(column, start, end):
+    # Dates are inclusive; end covers the whole day
+    conditions = []
+    if start: conditions.append(column >= datetime.datetime.combine(start, datetime.time.min))
+    if end: conditions.append(column < datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time.min))
+    return conditions
+
+
+def _page(db, query, column, id_column, limit, cursor):
+    limit = max(1, min(limit, MAX_PAGE))
+    if cursor:
+        value, last_id = catalog.decode_cursor(cursor)
+        try: value = datetime.datetime.fromisoformat(value)
+        except (TypeError, ValueError): raise HTTPException(400, "Invalid cursor")
+        query = query.where(or_(column < value, and_(column == value, id_column < last_id)))
+    rows = db.execute(query.order_by(column.desc(), id_column.desc()).limit(limit + 1)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]._mapping
+        next_cursor = catalog.encode_cursor(last[column.key].isoformat(), last[id_column.key])
+    return rows[:limit], next_cursor
+
+
+def list_prescriptions(db, status=None, start=None, end=None, limit=50, cursor=None):
+    P = Prescription
+    query = (select(P.id, P.status, P.patient_name, P.patient_phone, P.total_amount, P.payment_mode, P.created_at,
+                    Doctor.name.label("doctor"))
+             .outerjoin(Doctor, P.doctor_id == Doctor.id)
+             .where(P.created_at.isnot(None), *date_range(P.created_at, start, end)))
+    if status: query = query.where(P.status == status)
+    rows, next_cursor = _page(db, query, P.created_at, P.id, limit, cursor)
+    items = [{"id": r.id, "status": r.status, "patient_name": r.patient_name, "phone": r.patient_phone,
+              "total": r.total_amount, "payment_mode": r.payment_mode, "doctor": r.doctor,
+              "created_at": r.created_at.isoformat()} for r in rows]
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def list_orders(db, start=None, end=None, limit=50, cursor=None):
+    C = CompletedOrder
+    query = (select(C.id, C.original_pres_id, C.customer_name, C.phone_number, C.total_amount, C.transaction_id, C.order_date)
+             .where(C.order_date.isnot(None), *date_range(C.order_date, start, end)))
+    rows, next_cursor = _page(db, query, C.order_date, C.id, limit, cursor)
+    items = [{"id": r.id, "prescription_id": r.original_pres_id, "customer_name": r.customer_name, "phone": r.phone_number,
+              "total": r.total_amount, "transaction_id": r.transaction_id, "order_date": r.order_date.isoformat()} for r in rows]
+    return {"items": items, "next_cursor": next_cursor}
+
+
+# ==========================================
+# 📊 Aggregates
+# ==========================================
+def _daily(db, start=None, end=None):
+    C = CompletedOrder
+    day = func.date(C.order_date)
+    rows = db.execute(select(day.label("day"), func.count(C.id), func.coalesce(func.sum(C.total_amount), 0))
+                      .where(*date_range(C.order_date, start, end)).group_by(day).order_by(day)).all()
+    return [(str(d), orders, int(revenue)) for d, orders, revenue in rows]
+
+
+def _daily_from_rollup(db, start=None, end=None):
+    refresh_rollup(db)
+    D = DailySales
+    query = select(D.day, D.orders, D.revenue).order_by(D.day)
+    if start: query = query.where(D.day >= start.isoformat())
+    if end: query = query.where(D.day <= end.isoformat())
+    return [tuple(r) for r in db.execute(query)]
+
+
+def summary(db, start=None, end=None, top=10):
+    P, C, I = Prescription, CompletedOrder, OrderItem
+    by_status = dict(db.execute(select(P.status, func.count(P.id)).where(*date_range(P.created_at, start, end))
+                                .group_by(P.status)).all())
+
+    days = (_daily_from_rollup if USE_ROLLUP else _daily)(db, start, end)
+
+    units, revenue = func.sum(I.qty), func.sum(I.qty * I.price)
+    top_rows = db.execute(select(I.medicine_name, units.label("units"), revenue.label("revenue"), func.count(func.distinct(C.id)).label("orders"))
+                          .join(C, C.original_pres_id == I.prescription_id)
+                          .where(*date_range(C.order_date, start, end))
+                          .group_by(I.medicine_name).order_by(units.desc(), I.medicine_name)
+                          .limit(max(1, min(top, 100)))).all()
+
+    return {
+        "range": {"start": start.isoformat() if start else None, "end": end.isoformat() if end else None},
+        "prescriptions_by_status": by_status,
+        "orders": sum(d[1] for d in days),
+        "revenue": sum(d[2] for d in days),
+        "daily": [{"day": d, "orders": n, "revenue": r} for d, n, r in days],
+        "top_medicines": [{"name": r.medicine_name, "units": int(r.units or 0), "revenue": int(r.revenue or 0), "orders": r.orders}
+                          for r in top_rows],
+        "source": "rollup" if USE_ROLLUP else "live",
+    }
+
+
+# ==========================================
+# 🧮 Daily rollup
+# ==========================================
+def refresh_rollup(db, full=False):
+    """Recompute daily_sales from the last rolled-up day onwards (that day may have been partial).
+
+    Sales are stamped with the approval time, so older days never change once rolled up;
+    `full` rebuilds everything (e.g. after editing old completed_orders by hand)."""
+    D = DailySales
+    since = None if full else db.scalar(select(func.max(D.day)))
+    start = datetime.date.fromisoformat(since) if since else None
+    days = _daily(db, start)
+    now = datetime.datetime.utcnow()
+    try:
+        stale = delete(D) if start is None else delete(D).where(D.day >= since)
+        db.execute(stale)
+        if days: db.execute(insert(D), [{"day": d, "orders": n, "revenue": r, "refreshed_at": now} for d, n, r in days])
+        db.commit()
+    except IntegrityError:
+        db.rollback()  # a concurrent refresh wrote the same days
+    return {"since": since, "days": len(days)}
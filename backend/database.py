@@ -1,8 +1,11 @@
 # database.py
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
 # 1. Load secrets immediately
@@ -17,20 +20,132 @@ if not SQLALCHEMY_DATABASE_URL:
     # We set a dummy URL so the app can at least start and show the error log
     SQLALCHEMY_DATABASE_URL = "sqlite:///./error_fallback.db"
 
+# Deployment profiles:
+#   serverless  (Vercel/Lambda) no pool in the process: every request opens one
+#               connection and closes it, ideally to PgBouncer/Supabase pooler
+#               (DB_POOLER=pgbouncer) so the real Postgres connections stay warm
+#   server      (uvicorn/gunicorn) a sized QueuePool, LIFO so idle connections
+#               age out, recycled before the server/proxy drops them
+# DB_PROFILE defaults to serverless when running on Vercel or Lambda.
+DB_PROFILE = os.getenv("DB_PROFILE") or ("serverless" if os.getenv("VERCEL") or os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "server")
+DB_POOLER = os.getenv("DB_POOLER", "")  # "pgbouncer": transaction pooling, no startup options
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_PRE_PING = os.getenv("DB_PRE_PING", "0") == "1"  # recycle + LIFO usually make the extra round trip unnecessary
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))
+DB_IDLE_TX_TIMEOUT_MS = int(os.getenv("DB_IDLE_TX_TIMEOUT_MS", "30000"))
+
+
+class PoolMetrics:
+    """Checkout counts and wait times, recorded by the Timed*Pool classes below."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, seconds, timed_out=False):
+        with self._lock:
+            if timed_out: self.timeouts += 1
+            else: self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def snapshot(self):
+        with self._lock:
+            done = self.checkouts + self.timeouts
+            return {"checkouts": self.checkouts, "timeouts": self.timeouts, "connects": self.connects,
+                    "wait_ms_avg": round(self.wait_total / done * 1000, 3) if done else 0.0,
+                    "wait_ms_max": round(self.wait_max * 1000, 3)}
+
+
+metrics = PoolMetrics()
+
+
+class _TimedConnect:
+    # Wait time = how long a session waits for a connection (queueing + connecting)
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            conn = super().connect()
+        except exc.TimeoutError:
+            metrics.record(time.perf_counter() - started, timed_out=True)
+            raise
+        metrics.record(time.perf_counter() - started)
+        return conn
+
+
+class TimedQueuePool(_TimedConnect, QueuePool): pass
+class TimedNullPool(_TimedConnect, NullPool): pass
+
+
+def engine_options(url, profile=DB_PROFILE, pooler=DB_POOLER):
+    options = {"pool_pre_ping": DB_PRE_PING}
+    if profile == "serverless":
+        options["poolclass"] = TimedNullPool
+        options["pool_pre_ping"] = False  # a fresh connection per request has nothing to ping
+    else:
+        options.update(poolclass=TimedQueuePool, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                       pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE, pool_use_lifo=True)
+    if url.startswith("sqlite"):
+        options["connect_args"] = {"check_same_thread": False}
+    elif url.startswith("postgres") and pooler != "pgbouncer":
+        # Session-level timeouts sent once per connection (PgBouncer rejects startup options; see make_engine)
+        options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS} "
+                                              f"-c idle_in_transaction_session_timeout={DB_IDLE_TX_TIMEOUT_MS}"}
+    return options
+
+
+def _count_connect(dbapi_connection, connection_record):
+    with metrics._lock: metrics.connects += 1
+
+
+def make_engine(url=None, profile=DB_PROFILE, pooler=DB_POOLER):
+    url = url or SQLALCHEMY_DATABASE_URL
+    new_engine = create_engine(url, **engine_options(url, profile, pooler))
+    event.listen(new_engine, "connect", _count_connect)
+    if url.startswith("postgres") and pooler == "pgbouncer":
+        # Transaction pooling: the timeout has to travel with every transaction
+        @event.listens_for(new_engine, "begin")
+        def _statement_timeout(conn):
+            conn.exec_driver_sql(f"SET LOCAL statement_timeout = {DB_STATEMENT_TIMEOUT_MS}")
+    return new_engine
+
+
+def pool_stats(target=None):
+    target = target or engine
+    stats = {"profile": DB_PROFILE, "pooler": DB_POOLER or None, **metrics.snapshot(), **_pool_state(target.pool)}
+    if target is engine and async_engine is not None:
+        stats["async"] = _pool_state(async_engine.pool)  # checkouts/waits above cover both engines
+    return stats
+
+
+def _pool_state(pool):
+    state = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        state.update(size=pool.size(), checked_out=pool.checkedout(), checked_in=pool.checkedin(),
+                     overflow=max(pool.overflow(), 0), max_overflow=DB_MAX_OVERFLOW)
+    return state
+
+
 # 4. Create the Database Engine
 try:
-    # 'pool_pre_ping=True' helps prevent connection drops
-    engine = create_engine(SQLALCHEMY_DATABASE_URL, pool_pre_ping=True)
-    
+    engine = make_engine()
+
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     Base = declarative_base()
-    print("✅ Database engine initialized successfully.")
+    print(f"✅ Database engine initialized successfully ({DB_PROFILE} profile).")
 
 except Exception as e:
     print(f"❌ Database Connection Failed: {e}")
     # Create a dummy Base to prevent 'NameError' in main.py
     Base = declarative_base()
-    SessionLocal = None 
+    SessionLocal = None
     engine = None
 
 def get_db():
@@ -40,4 +155,62 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# 5. Async engine (asyncpg on Postgres, aiosqlite locally) for the hot endpoints.
+# Created on first use so sync-only scripts never import the async drivers.
+def async_url(url):
+    if url.startswith("postgres://"): url = "postgresql://" + url[len("postgres://"):]
+    if url.startswith("postgresql://") or url.startswith("postgresql+psycopg2://"):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1].replace("sslmode=", "ssl=")
+    if url.startswith("sqlite:///"): return "sqlite+aiosqlite:///" + url[len("sqlite:///"):]
+    return url
+
+
+def make_async_engine(url=None, profile=DB_PROFILE, pooler=DB_POOLER):
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+    class TimedAsyncQueuePool(_TimedConnect, AsyncAdaptedQueuePool): pass
+
+    url = async_url(url or SQLALCHEMY_DATABASE_URL)
+    options = engine_options(url, profile, pooler)
+    if options["poolclass"] is TimedQueuePool: options["poolclass"] = TimedAsyncQueuePool
+    if url.startswith("postgresql+asyncpg"):
+        # asyncpg takes server settings instead of libpq "options"; PgBouncer can't keep prepared statements
+        options["connect_args"] = ({"statement_cache_size": 0} if pooler == "pgbouncer" else
+                                   {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS),
+                                                        "idle_in_transaction_session_timeout": str(DB_IDLE_TX_TIMEOUT_MS)}})
+    elif url.startswith("sqlite"):
+        options.pop("connect_args", None)
+    new_engine = create_async_engine(url, **options)
+    event.listen(new_engine.sync_engine, "connect", _count_connect)
+    if url.startswith("postgresql") and pooler == "pgbouncer":
+        @event.listens_for(new_engine.sync_engine, "begin")
+        def _statement_timeout(conn):
+            conn.exec_driver_sql(f"SET LOCAL statement_timeout = {DB_STATEMENT_TIMEOUT_MS}")
+    return new_engine
+
+
+async_engine = None
+AsyncSessionLocal = None
+_async_lock = threading.Lock()
+
+
+def async_sessions():
+    global async_engine, AsyncSessionLocal
+    if AsyncSessionLocal is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+        with _async_lock:
+            if AsyncSessionLocal is None:
+                async_engine = make_async_engine()
+                AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    return AsyncSessionLocal
+
+
+async def get_async_db():
+    if SessionLocal is None:
+        raise Exception("Database not connected")
+    async with async_sessions()() as db:
+        yield db
@@ -0,0 +1,113 @@
+# extraction_cache.py
+# Persistent cache of AI prescription extractions, keyed by image content.
+#
+# Re-uploads of the same photo hit the SHA-256 key. With OCR_CACHE_PHASH=1 a
+# 64-bit difference hash of the downscaled image also matches re-compressed or
+# resized copies (exact dHash equality, so lookups stay an indexed query).
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+CACHE_PATH = os.getenv("OCR_CACHE_PATH", os.path.join(tempfile.gettempdir(), "ayurneeds_ocr_cache.db"))
+TTL_SECONDS = int(os.getenv("OCR_CACHE_TTL", str(30 * 24 * 3600)))
+MAX_ENTRIES = int(os.getenv("OCR_CACHE_MAX_ENTRIES", "5000"))
+USE_PHASH = os.getenv("OCR_CACHE_PHASH", "0") == "1"
+
+
+def content_key(image_bytes):
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def perceptual_key(image_bytes):
+    """dHash: compare neighbouring pixels of a 9x8 grayscale thumbnail."""
+    try:
+        from PIL import Image
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            pixels = list(img.convert("L").resize((9, 8)).getdata())
+    except Exception:
+        return None  # not an image Pillow understands
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return f"{bits:016x}"
+
+
+class ExtractionCache:
+    def __init__(self, path=CACHE_PATH, ttl=TTL_SECONDS, max_entries=MAX_ENTRIES, use_phash=USE_PHASH):
+        self.path, self.ttl, self.max_entries, self.use_phash = path, ttl, max_entries, use_phash
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _db(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("""CREATE TABLE IF NOT EXISTS extraction_cache (
+                key TEXT PRIMARY KEY, phash TEXT, medicines TEXT NOT NULL,
+                created_at REAL NOT NULL, last_used REAL NOT NULL)""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_extraction_cache_phash ON extraction_cache (phash)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_extraction_cache_last_used ON extraction_cache (last_used)")
+        return self._conn
+
+    def get(self, image_bytes):
+        """Cached medicine list for this image, or None."""
+        key = content_key(image_bytes)
+        now = time.time()
+        with self._lock:
+            try:
+                db = self._db()
+                row = db.execute("SELECT key, medicines FROM extraction_cache WHERE key = ? AND created_at > ?",
+                                 (key, now - self.ttl)).fetchone()
+                if row is None and self.use_phash:
+                    phash = perceptual_key(image_bytes)
+                    if phash:
+                        row = db.execute("""SELECT key, medicines FROM extraction_cache WHERE phash = ? AND created_at > ?
+                                            ORDER BY last_used DESC LIMIT 1""", (phash, now - self.ttl)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                db.execute("UPDATE extraction_cache SET last_used = ? WHERE key = ?", (now, row[0]))
+                db.commit()
+                self.hits += 1
+                return json.loads(row[1])
+            except sqlite3.Error as e:
+                print(f"⚠️ OCR cache read failed: {e}")
+                self.misses += 1
+                return None
+
+    def put(self, image_bytes, medicines):
+        now = time.time()
+        phash = perceptual_key(image_bytes) if self.use_phash else None
+        with self._lock:
+            try:
+                db = self._db()
+                db.execute("INSERT OR REPLACE INTO extraction_cache VALUES (?, ?, ?, ?, ?)",
+                           (content_key(image_bytes), phash, json.dumps(medicines), now, now))
+                self._evict(db, now)
+                db.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️ OCR cache write failed: {e}")
+
+    def _evict(self, db, now):
+        # Expired rows first, then least recently used beyond the size cap
+        db.execute("DELETE FROM extraction_cache WHERE created_at <= ?", (now - self.ttl,))
+        db.execute("""DELETE FROM extraction_cache WHERE key IN (
+                        SELECT key FROM extraction_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)""",
+                   (self.max_entries,))
+
+    def stats(self):
+        with self._lock:
+            try: size = self._db().execute("SELECT COUNT(*) FROM extraction_cache").fetchone()[0]
+            except sqlite3.Error: size = None
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "entries": size, "max_entries": self.max_entries, "ttl_seconds": self.ttl}
+
+
+cache = ExtractionCache()
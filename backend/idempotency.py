@@ -0,0 +1,246 @@
+# idempotency.py
+# Idempotency-Key support for the endpoints patients and doctors double-submit
+# (store checkout, confirm-order, prescription upload).
+#
+# A POST carrying an `Idempotency-Key` header runs once. Its successful response
+# is stored, and a retry with the same key gets that response back
+# (`Idempotent-Replayed: true`) without touching the handler: no second
+# Prescription, OCR call or Telegram alert. A duplicate that arrives while the
+# first is still running waits for it rather than racing it.
+#
+#   in-process   LRU of finished responses + a future per in-flight key
+#   database     idempotency_keys table, so other workers / lambdas see the
+#                claim and the result; rows expire after IDEMPOTENCY_TTL_HOURS
+#
+# Only 2xx responses are kept: after an error the key is released and the
+# client may retry with it. Reusing a key for a different body is a 422.
+# The body is buffered for the fingerprint, so one past MAX_UPLOAD_MB (plus room
+# for the other form fields) is refused with a 413 as soon as it gets there.
+import asyncio
+import datetime
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+import buffered_body
+from database import SessionLocal
+from models import IdempotencyKey
+
+TTL_HOURS = int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "1000"))
+WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "60"))  # also when an unfinished claim counts as abandoned
+SWEEP_SECONDS = 600
+MAX_BODY_BYTES = (int(os.getenv("MAX_UPLOAD_MB", "15")) + 1) * 1024 * 1024
+PATHS = ("/store/checkout", "/confirm-order/", "/upload-prescription/")
+
+
+class Stored:
+    __slots__ = ("fingerprint", "status", "content_type", "body", "expires_at")
+
+    def __init__(self, fingerprint, status, content_type, body, expires_at):
+        self.fingerprint, self.status, self.content_type, self.body, self.expires_at = fingerprint, status, content_type, body, expires_at
+
+
+class ResponseCache:
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            found = self._items.get(key)
+            if found is None: return None
+            if found.expires_at < datetime.datetime.utcnow():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return found
+
+    def put(self, key, stored):
+        with self._lock:
+            self._items[key] = stored
+            self._items.move_to_end(key)
+            while len(self._items) > self.size: self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock: self._items.clear()
+
+
+cache = ResponseCache()
+_inflight = {}  # key -> asyncio.Future, for duplicates arriving at this worker
+_last_sweep = 0.0
+
+
+def _fingerprint(method, path, content_type, body):
+    # Browsers pick a new multipart boundary on every submit; it mustn't make a retry look different
+    if "boundary=" in content_type:
+        body = body.replace(content_type.split("boundary=", 1)[1].strip('"').encode(), b"")
+    return hashlib.sha256(f"{method} {path}\n".encode() + body).hexdigest()
+
+
+# ==========================================
+# 🗄️ Database side (runs in the threadpool)
+# ==========================================
+def _stored(row):
+    return Stored(row.fingerprint, row.status_code, row.content_type, row.body, row.expires_at)
+
+
+def _sweep(db):
+    global _last_sweep
+    if time.monotonic() - _last_sweep < SWEEP_SECONDS: return
+    _last_sweep = time.monotonic()
+    db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.datetime.utcnow()))
+    db.commit()
+
+
+def claim(key, fingerprint):
+    """Returns ("run", None) if this request owns the key, or ("done"/"busy", Stored-or-None) if another does."""
+    IK = IdempotencyKey
+    now = datetime.datetime.utcnow()
+    db = SessionLocal()
+    try:
+        _sweep(db)
+        try:
+            db.add(IK(key=key, fingerprint=fingerprint, created_at=now, expires_at=now + datetime.timedelta(hours=TTL_HOURS)))
+            db.commit()
+            return "run", None
+        except IntegrityError:
+            db.rollback()
+        row = db.get(IK, key)
+        if row is None: return claim(key, fingerprint)  # expired and swept in between
+        if row.status_code is not None and row.expires_at >= now: return "done", _stored(row)
+        # Unfinished for too long (the worker died) or expired: take the key over
+        stale = row.status_code is not None or row.created_at < now - datetime.timedelta(seconds=WAIT_SECONDS)
+        if stale:
+            taken = db.execute(update(IK).where(IK.key == key, IK.created_at == row.created_at)
+                               .values(fingerprint=fingerprint, status_code=None, content_type=None, body=None, created_at=now,
+                                       expires_at=now + datetime.timedelta(hours=TTL_HOURS)))
+            db.commit()
+            if taken.rowcount == 1: return "run", None
+        return "busy", Stored(row.fingerprint, None, None, None, row.expires_at)
+    finally:
+        db.close()
+
+
+def finish(key, status, content_type, body):
+    db = SessionLocal()
+    try:
+        IK = IdempotencyKey
+        if 200 <= status < 300:
+            db.execute(update(IK).where(IK.key == key).values(status_code=status, content_type=content_type, body=body))
+        else:
+            db.execute(delete(IK).where(IK.key == key))
+        db.commit()
+    finally:
+        db.close()
+
+
+def lookup(key):
+    db = SessionLocal()
+    try:
+        row = db.get(IdempotencyKey, key)
+        return _stored(row) if row is not None and row.status_code is not None else None
+    finally:
+        db.close()
+
+
+# ==========================================
+# 🔁 ASGI middleware
+# ==========================================
+async def _respond(send, status, content_type, body, replayed=False):
+    headers = [(b"content-type", (content_type or "application/json").encode()), (b"content-length", str(len(body)).encode())]
+    if replayed: headers.append((b"idempotent-replayed", b"true"))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _error(send, status, detail):
+    await _respond(send, status, "application/json", f'{{"detail": "{detail}"}}'.encode())
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith(PATHS):
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        client_key = headers.get(b"idempotency-key", b"").decode().strip()
+        if not client_key: return await self.app(scope, receive, send)
+        if len(client_key) > 255: return await _error(send, 400, "Idempotency-Key too long")
+
+        # The body is needed up front for the fingerprint; the handler then reads it from here
+        try: body = await buffered_body.read(headers, receive, MAX_BODY_BYTES)
+        except buffered_body.TooLarge: return await _error(send, 413, "Request body too large")
+        if body is None: return
+        replay_receive = buffered_body.replay(body, receive)
+
+        key = hashlib.sha256(f"{scope['path']}\n{client_key}".encode()).hexdigest()
+        fingerprint = _fingerprint(scope["method"], scope["path"], headers.get(b"content-type", b"").decode(), body)
+
+        deadline = time.monotonic() + WAIT_SECONDS
+        while True:
+            stored = cache.get(key)
+            if stored is None and key in _inflight:
+                try: await asyncio.wait_for(asyncio.shield(_inflight[key]), timeout=max(0.1, deadline - time.monotonic()))
+                except Exception: pass
+                stored = cache.get(key)
+            if stored is not None:
+                if stored.fingerprint != fingerprint: return await _error(send, 422, "Idempotency-Key reused with a different request")
+                return await _respond(send, stored.status, stored.content_type, stored.body, replayed=True)
+            if key in _inflight:
+                # The first request failed (key released) or is still running past the deadline
+                if time.monotonic() >= deadline: return await _error(send, 409, "A request with this Idempotency-Key is still in progress")
+                continue
+
+            future = _inflight[key] = asyncio.get_running_loop().create_future()
+            try:
+                state, stored = await run_in_threadpool(claim, key, fingerprint)
+            except BaseException:
+                _inflight.pop(key, None); future.set_result(None)
+                raise
+            if state == "run": break
+            _inflight.pop(key, None); future.set_result(None)
+            if state == "done":
+                cache.put(key, stored)
+                continue
+            # Another worker owns the key: poll its row
+            if stored.fingerprint != fingerprint: return await _error(send, 422, "Idempotency-Key reused with a different request")
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.2)
+                stored = await run_in_threadpool(lookup, key)
+                if stored is not None: break
+            if stored is None:
+                return await _error(send, 409, "A request with this Idempotency-Key is still in progress")
+            cache.put(key, stored)
+
+        response = {"status": 500, "content_type": None, "body": []}
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["content_type"] = next((v.decode() for k, v in message.get("headers", ()) if k == b"content-type"), None)
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, send_wrapper)
+        finally:
+            result = b"".join(response["body"])
+            try:
+                await run_in_threadpool(finish, key, response["status"], response["content_type"], result)
+                if 200 <= response["status"] < 300:
+                    cache.put(key, Stored(fingerprint, response["status"], response["content_type"], result,
+                                          datetime.datetime.utcnow() + datetime.timedelta(hours=TTL_HOURS)))
+            except Exception as e:
+                print(f"⚠️ Could not store idempotent response: {e}")
+            _inflight.pop(key, None)
+            future.set_result(None)
@@ -0,0 +1,50 @@
+# image_prep.py
+# Shrinks prescription photos before they are base64-encoded for Gemini.
+#
+# Phone photos are 5-12 MB; text stays readable at ~1600px on the long side in
+# grayscale, which cuts the payload (and provider latency) by an order of magnitude.
+import io
+import os
+
+MAX_DIMENSION = int(os.getenv("OCR_MAX_DIMENSION", "1600"))
+JPEG_QUALITY = int(os.getenv("OCR_JPEG_QUALITY", "80"))
+GRAYSCALE = os.getenv("OCR_GRAYSCALE", "1") == "1"
+
+# Magic bytes -> MIME, for uploads we pass through untouched
+SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF8", "image/gif"),
+    (b"%PDF", "application/pdf"),
+]
+
+
+def sniff_mime(data):
+    for magic, mime in SIGNATURES:
+        if data.startswith(magic): return mime
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP": return "image/webp"
+    if data[4:12] in (b"ftypheic", b"ftypheix", b"ftypmif1"): return "image/heic"
+    return "image/jpeg"  # what we always claimed before
+
+
+def prepare_for_ocr(image_bytes, max_dimension=MAX_DIMENSION, quality=JPEG_QUALITY, grayscale=GRAYSCALE):
+    """Returns (bytes, mime_type): auto-oriented, downscaled, re-encoded JPEG.
+
+    Anything Pillow can't open (PDFs, HEIC without a plugin) is sent as-is with
+    its real MIME type. The original is also kept if re-encoding would not shrink it.
+    """
+    try:
+        from PIL import Image, ImageOps
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            img = ImageOps.exif_transpose(img)
+            img = img.convert("L") if grayscale else img.convert("RGB")
+            img.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+            out = io.BytesIO()
+            img.save(out, "JPEG", quality=quality, optimize=True)
+    except Exception as e:
+        print(f"⚠️ Image prep skipped: {e}")
+        return image_bytes, sniff_mime(image_bytes)
+
+    processed = out.getvalue()
+    if len(processed) >= len(image_bytes): return image_bytes, sniff_mime(image_bytes)
+    return processed, "image/jpeg"
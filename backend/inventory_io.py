@@ -0,0 +1,223 @@
+# inventory_io.py
+# Bulk PharmacyStock import/export, used by the admin endpoints and as a CLI:
+#   python inventory_io.py import stock.csv --pharmacy "Ayur Pharma" [--batch 5000]
+#   python inventory_io.py export catalog.csv [--format jsonl]
+#
+# Files are parsed as generators and written in large batches: existing
+# (pharmacy, medicine) rows are updated and new ones inserted with executemany,
+# one round trip each per batch (psycopg2 gets multi-row VALUES from SQLAlchemy).
+# Bulk statements skip the per-row ORM events, so the catalog snapshot and
+# medicine index are refreshed once at the end.
+import argparse
+import csv
+import io
+import json
+import sys
+import time
+from itertools import islice
+
+from sqlalchemy import bindparam, func, insert, select, update
+
+import catalog
+import medicine_index
+import routing
+from database import SessionLocal
+from models import Pharmacy, PharmacyStock, StockReservation
+
+EXPORT_FIELDS = ["pharmacy", "location", "medicine_name", "qty", "price", "image_url"]
+ALIASES = {
+    "medicine_name": ("medicine_name", "medicine", "name", "item"),
+    "qty": ("qty", "quantity", "stock"),
+    "price": ("price", "mrp", "rate"),
+    "pharmacy": ("pharmacy", "pharmacy_name", "store"),
+    "location": ("location", "address", "pincode"),
+    "image_url": ("image_url", "image"),
+}
+
+
+# ==========================================
+# 📥 PARSING (generators, constant memory)
+# ==========================================
+def parse_csv(text_stream):
+    yield from csv.DictReader(text_stream)
+
+
+def parse_jsonl(text_stream):
+    for line in text_stream:
+        if not line.strip(): continue
+        try: yield json.loads(line)
+        except ValueError: yield None  # malformed line: rejected like an unusable CSV row
+
+
+def normalize(raw, default_pharmacy=None, default_location=None):
+    """Map a parsed record onto our columns, or None if it is unusable."""
+    if not isinstance(raw, dict): return None
+    raw = {str(k).strip().lower(): v for k, v in raw.items() if k is not None}
+    row = {}
+    for field, names in ALIASES.items():
+        row[field] = next((raw[n] for n in names if raw.get(n) not in (None, "")), None)
+    row["pharmacy"] = row["pharmacy"] or default_pharmacy
+    row["location"] = row["location"] or default_location
+    if not row["medicine_name"] or not row["pharmacy"]: return None
+    try:
+        row["qty"] = int(float(row["qty"] or 0))
+        row["price"] = int(round(float(row["price"] or 0)))
+    except (TypeError, ValueError):
+        return None
+    row["medicine_name"] = str(row["medicine_name"]).strip()
+    row["pharmacy"] = str(row["pharmacy"]).strip()
+    return row
+
+
+def read_records(binary_stream, fmt, default_pharmacy=None, default_location=None, counts=None):
+    """Usable rows; unusable ones are only counted (counts["rejected"]), not kept."""
+    text = io.TextIOWrapper(binary_stream, encoding="utf-8-sig", newline="")
+    parser = parse_jsonl if fmt == "jsonl" else parse_csv
+    for raw in parser(text):
+        row = normalize(raw, default_pharmacy, default_location)
+        if row: yield row
+        elif counts is not None: counts["rejected"] = counts.get("rejected", 0) + 1
+
+
+# ==========================================
+# 💾 BATCHED UPSERT
+# ==========================================
+def _pharmacy_ids(db, rows, cache):
+    for row in rows:
+        name = row["pharmacy"]
+        if name in cache: continue
+        found = db.query(Pharmacy.id).filter(Pharmacy.name == name).first()
+        if found: cache[name] = found.id
+        else:
+            pharmacy = Pharmacy(name=name, location=row["location"] or "")
+            db.add(pharmacy); db.flush()
+            cache[name] = pharmacy.id
+    return cache
+
+
+# The file counts units on the shelf, including ones held for orders awaiting payment.
+# Those holds give their units back when released, so they are subtracted here, in the
+# same statement, or every release after an import would overstate stock. (qty can dip
+# below zero when the file has fewer units than are on hold; releases bring it back.)
+_stock = PharmacyStock.__table__
+_held = (select(func.coalesce(func.sum(StockReservation.qty), 0))
+         .where(StockReservation.stock_id == _stock.c.id, StockReservation.status == "held").scalar_subquery())
+UPDATE_STOCK = (update(_stock).where(_stock.c.id == bindparam("b_id"))
+                .values(qty=bindparam("b_qty") - _held, price=bindparam("b_price"),
+                        image_url=func.coalesce(bindparam("b_image"), _stock.c.image_url)))
+
+
+def import_records(db, records, batch_size=5000, report=print):
+    stats = {"rows": 0, "inserted": 0, "updated": 0, "batches": 0, "seconds": 0.0}
+    pharmacies = {}
+    started = time.perf_counter()
+    records = iter(records)
+    try:
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch: break
+            batch_started = time.perf_counter()
+            _pharmacy_ids(db, batch, pharmacies)
+
+            # Last occurrence wins inside a batch, like a plain sequence of upserts
+            wanted = {(pharmacies[r["pharmacy"]], r["medicine_name"]): r for r in batch}
+            existing = {}
+            for stock_id, pharmacy_id, name in (db.query(PharmacyStock.id, PharmacyStock.pharmacy_id, PharmacyStock.medicine_name)
+                                                .filter(PharmacyStock.pharmacy_id.in_({k[0] for k in wanted}),
+                                                        PharmacyStock.medicine_name.in_({k[1] for k in wanted}))):
+                existing[(pharmacy_id, name)] = stock_id
+
+            updates, inserts = [], []
+            for (pharmacy_id, name), r in wanted.items():
+                if (pharmacy_id, name) in existing:
+                    updates.append({"b_id": existing[(pharmacy_id, name)], "b_qty": r["qty"], "b_price": r["price"],
+                                    "b_image": r["image_url"] or None})
+                else:
+                    inserts.append({"pharmacy_id": pharmacy_id, "medicine_name": name, "qty": r["qty"], "price": r["price"],
+                                    "image_url": r["image_url"] or "default.jpg"})
+            if updates: db.execute(UPDATE_STOCK, updates)
+            if inserts: db.execute(insert(PharmacyStock), inserts)
+            db.commit()
+
+            elapsed = time.perf_counter() - batch_started
+            stats["rows"] += len(batch); stats["batches"] += 1
+            stats["inserted"] += len(inserts); stats["updated"] += len(updates)
+            report(f"📦 Batch {stats['batches']}: {len(batch)} rows in {elapsed:.2f}s ({len(batch) / elapsed:.0f} rows/s)")
+    finally:
+        stats["seconds"] = round(time.perf_counter() - started, 3)
+        # 📣 One catalog-change signal for the whole import
+        catalog.invalidate()
+        routing.invalidate()
+        medicine_index.index.reset()
+    return stats
+
+
+# ==========================================
+# 📤 STREAMING EXPORT
+# ==========================================
+def export_rows(db, chunk_size=5000):
+    query = (db.query(Pharmacy.name, Pharmacy.location, PharmacyStock.medicine_name,
+                      PharmacyStock.qty, PharmacyStock.price, PharmacyStock.image_url)
+             .outerjoin(Pharmacy, PharmacyStock.pharmacy_id == Pharmacy.id)
+             .order_by(PharmacyStock.id)
+             .execution_options(yield_per=chunk_size))  # server-side cursor where supported
+    for row in query:
+        yield dict(zip(EXPORT_FIELDS, row))
+
+
+def export_chunks(db, fmt="csv", chunk_size=5000):
+    """Yields text chunks of the whole catalog without materializing it."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    if fmt == "csv": writer.writeheader()
+    for count, row in enumerate(export_rows(db, chunk_size), 1):
+        if fmt == "jsonl": buffer.write(json.dumps(row) + "\n")
+        else: writer.writerow(row)
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0); buffer.truncate()
+    if buffer.tell(): yield buffer.getvalue()
+
+
+# ==========================================
+# 🖥️ CLI
+# ==========================================
+def _format_for(path, explicit):
+    return explicit or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="Bulk PharmacyStock import/export")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import")
+    imp.add_argument("path", help="CSV or JSONL file ('-' for stdin)")
+    imp.add_argument("--pharmacy", help="pharmacy name for rows without one")
+    imp.add_argument("--location", help="location for newly created pharmacies")
+    imp.add_argument("--format", choices=["csv", "jsonl"])
+    imp.add_argument("--batch", type=int, default=5000)
+    exp = sub.add_parser("export")
+    exp.add_argument("path", help="output file ('-' for stdout)")
+    exp.add_argument("--format", choices=["csv", "jsonl"])
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        fmt = _format_for(args.path, args.format)
+        if args.command == "import":
+            stream = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+            counts = {"rejected": 0}
+            with stream:
+                stats = import_records(db, read_records(stream, fmt, args.pharmacy, args.location, counts), args.batch,
+                                       report=lambda msg: print(msg, file=sys.stderr))
+            stats["rejected"] = counts["rejected"]
+            print(json.dumps(stats))
+        else:
+            out = sys.stdout if args.path == "-" else open(args.path, "w", newline="", encoding="utf-8")
+            with out:
+                for chunk in export_chunks(db, fmt): out.write(chunk)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,104 +1,151 @@
 # main.py
-from fastapi import FastAPI, File, UploadFile, Form, Depends, HTTPException, Body
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, File, UploadFile, Form, Depends, HTTPException, Request, Header
+from fastapi.responses import HTMLResponse, StreamingResponse, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime
-from sqlalchemy.orm import Session, relationship
+from sqlalchemy import event, func, inspect, or_, and_, select
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.orm import Session, joinedload, selectinload, object_session
+from sqlalchemy.exc import IntegrityError
 from typing import List, Optional
 from pydantic import BaseModel
+import asyncio
 import datetime
 import os
 import json
-import requests
+import secrets
+import time
 import uuid
-from thefuzz import process 
-from dotenv import load_dotenv
-
-# 🚨 LOAD ENV VARS FIRST
-load_dotenv()
-
-# ✅ IMPORT LOCAL MODULES
-import ai_engine
-from database import engine, SessionLocal, Base, get_db
+from urllib.parse import quote
+
+# 🚨 database loads .env (once), so it is imported before anything that reads env vars
+import database
+from database import engine, SessionLocal, Base, get_db, get_async_db
+from models import (Doctor, Prescription, Pharmacy, PharmacyStock, OrderItem, CompletedOrder, MedicineAlias,
+                    IdempotencyKey, RateLimitBucket, DailySales, StockReservation)  # noqa: F401 (re-exported as main.X for scripts and benchmarks)
+
+# ✅ IMPORT LOCAL MODULES (ai_engine, inventory_io and the fuzzy matchers load on first use)
+import aliases
+import catalog
+from catalog import encode_cursor, decode_cursor
+import dashboard
+import extraction_cache
+import idempotency
+import medicine_index
+from medicine_index import stock_index
+import metrics
+import ocr_jobs
+import order_events
+import pages
+import ratelimit
+import reservations
+import routing
+import notifier
+from notifier import send_telegram_alert
 
 # ==========================================
 # ⚙️ CONFIGURATION
 # ==========================================
-TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin123") 
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # Prometheus scrape token (bearer); unset = admin password only
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "15"))
 
 # LIVE URLs (Update if needed)
 RENDER_BACKEND_URL = "https://ayurneeds-project.vercel.app"
 LIVE_WEBSITE_URL = "https://ayurneeds.com"
 
 # ==========================================
-# 🗄️ DATABASE MODELS
+# 🗄️ DATABASE MODELS (tables live in models.py)
 # ==========================================
-class Doctor(Base):
-    __tablename__ = "doctors"
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String)
-    uuid_code = Column(String, unique=True, index=True)
-    phone = Column(String, nullable=True)
-    clinic_address = Column(String, nullable=True)
-
-class Prescription(Base):
-    __tablename__ = "prescriptions"
-    id = Column(Integer, primary_key=True, index=True)
-    doctor_id = Column(Integer, ForeignKey("doctors.id"))
-    patient_phone = Column(String)
-    image_url = Column(String)
-    extracted_medicines = Column(Text)
-    
-    # Patient Order Fields
-    patient_name = Column(String, nullable=True)
-    address = Column(String, nullable=True) 
-    payment_mode = Column(String, nullable=True)
-    status = Column(String, default="Pending Approval")
-    total_amount = Column(Integer, default=0)
-    created_at = Column(DateTime, default=datetime.datetime.utcnow)
-
-    doctor = relationship("Doctor")
-
-class Pharmacy(Base):
-    __tablename__ = "pharmacies"
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String)
-    location = Column(String)
-
-class PharmacyStock(Base):
-    __tablename__ = "pharmacy_stock"
-    id = Column(Integer, primary_key=True, index=True)
-    pharmacy_id = Column(Integer, ForeignKey("pharmacies.id"))
-    medicine_name = Column(String)
-    qty = Column(Integer)
-    price = Column(Integer)
-    image_url = Column(String, default="default.jpg") 
-    
-    pharmacy = relationship("Pharmacy")
-
-class CompletedOrder(Base):
-    __tablename__ = "completed_orders"
-    id = Column(Integer, primary_key=True, index=True)
-    original_pres_id = Column(Integer)
-    customer_name = Column(String)
-    phone_number = Column(String)
-    address = Column(String)
-    medicines_json = Column(Text)
-    total_amount = Column(Integer)
-    transaction_id = Column(String)
-    order_date = Column(DateTime, default=datetime.datetime.utcnow)
-
-# Create Tables
-if engine:
+# Keep the in-memory medicine index and catalog snapshots in step with stock edits
+CATALOG_FIELDS = ("medicine_name", "price", "image_url", "pharmacy_id")
+
+def _mark_catalog_dirty(target, flag="catalog_dirty"):
+    session = object_session(target)
+    if session is not None: session.info[flag] = True
+
+def _queue_index_change(target, name):
+    # Applied to the shared index after commit, so a rollback leaves no phantom names
+    session = object_session(target)
+    if session is not None: session.info.setdefault("index_changes", []).append((target.id, name))
+
+@event.listens_for(PharmacyStock, "after_insert")
+def _index_new_stock_row(mapper, connection, target):
+    _queue_index_change(target, target.medicine_name)
+    _mark_catalog_dirty(target)
+
+@event.listens_for(PharmacyStock, "after_update")
+def _index_stock_row(mapper, connection, target):
+    attrs = inspect(target).attrs
+    if any(attrs[field].history.has_changes() for field in CATALOG_FIELDS):
+        _queue_index_change(target, target.medicine_name)
+        _mark_catalog_dirty(target)
+    elif attrs.qty.history.has_changes():
+        _mark_catalog_dirty(target, "routing_dirty")  # snapshots carry no qty; only routing does
+
+@event.listens_for(PharmacyStock, "after_delete")
+def _unindex_stock_row(mapper, connection, target):
+    _queue_index_change(target, None)
+    _mark_catalog_dirty(target)
+
+@event.listens_for(Pharmacy, "after_update")
+@event.listens_for(Pharmacy, "after_delete")
+def _pharmacy_changed(mapper, connection, target):
+    _mark_catalog_dirty(target)
+
+# The index and snapshots change only once the edit is committed and visible to other sessions;
+# stock holds/releases (reservations.py) only move qty and patch the routing table in place
+@event.listens_for(Session, "after_commit")
+def _publish_catalog_changes(session):
+    for stock_id, name in session.info.pop("index_changes", ()):
+        if name is None: medicine_index.index.remove(stock_id)
+        else: medicine_index.index.upsert(stock_id, name)
+    if session.info.pop("catalog_dirty", False):
+        catalog.invalidate()
+        routing.invalidate()
+    if session.info.pop("routing_dirty", False): routing.invalidate()
+    routing.adjust(session.info.pop("stock_deltas", None))
+    for alias, name in session.info.pop("learned_aliases", ()): aliases.dictionary.add(alias, name)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_catalog_changes(session):
+    session.info.pop("index_changes", None)
+    session.info.pop("catalog_dirty", None)
+    session.info.pop("routing_dirty", None)
+    session.info.pop("stock_deltas", None)
+    session.info.pop("learned_aliases", None)
+
+order_events.configure(engine)
+
+# Create Tables (and any indexes added to tables that already existed).
+# On serverless this would cost a round trip per table on every cold start, so
+# there it is off by default and run explicitly: `python migrate.py`.
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "0" if database.DB_PROFILE == "serverless" else "1") == "1"
+
+RETIRED_INDEXES = ("ix_pharmacy_stock_name_lower",)  # plain btree, replaced by ix_pharmacy_stock_name_prefix
+
+def create_schema():
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for name in RETIRED_INDEXES: conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                with engine.begin() as conn: conn.execute(CreateIndex(index, if_not_exists=True))
+            except Exception as e:
+                # e.g. duplicate completed_orders rows from before the unique index; clean up and restart
+                print(f"⚠️ Could not create index {index.name}: {e}")
+
+if engine and DB_AUTO_MIGRATE:
+    create_schema()
 
 # ==========================================
 # 🚀 FASTAPI APP SETUP
 # ==========================================
 app = FastAPI()
 
+app.add_middleware(ratelimit.RateLimitMiddleware)  # innermost: idempotent replays don't spend tokens
+app.add_middleware(idempotency.IdempotencyMiddleware)  # inside CORS, so replays get CORS headers too
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -106,6 +153,12 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)  # outermost: times CORS and errors too
+
+metrics.Gauge("ocr_jobs_pending", "OCR jobs queued or running", ocr_jobs.pending)
+metrics.Gauge("telegram_outbox_pending", "Alerts waiting in the Telegram outbox", lambda: notifier.dispatcher.pending())
+metrics.Gauge("db_pool_checked_out", "Connections currently checked out", lambda: database.pool_stats().get("checked_out", 0))
+metrics.Gauge("db_pool_wait_seconds_max", "Longest wait for a pooled connection", lambda: database.pool_stats()["wait_ms_max"] / 1000)
 
 # --- Input Models ---
 class DoctorCreate(BaseModel):
@@ -120,43 +173,126 @@ class AdminLoginRequest(BaseModel):
 class OrderConfirm(BaseModel):
     patient_name: str; address_line: str; pincode: str; landmark: str
     payment_mode: str; phone: Optional[str] = None; final_medicines: List[dict] 
+    route_by: Optional[str] = None  # "price" or "shipments" (default ROUTING_OBJECTIVE)
+
+class RouteRequest(BaseModel):
+    medicines: List[dict]; pincode: Optional[str] = None; route_by: Optional[str] = None
+
+class BatchPriceRequest(BaseModel):
+    ids: List[int]
+
+class AliasRequest(BaseModel):
+    alias: str; name: str
 
 class ContactForm(BaseModel): 
     name: str; phone: str; email: str; message: str
 
 # --- Helpers ---
-def send_telegram_alert(message):
-    if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID: return
-    try:
-        url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-        # 🛡️ FIX: Disable web preview so Telegram doesn't auto-click links
-        requests.post(url, data={
-            "chat_id": TELEGRAM_CHAT_ID, 
-            "text": message, 
-            "parse_mode": "Markdown",
-            "disable_web_page_preview": True 
-        })
-    except Exception as e: print(f"Telegram Error: {e}")
+def require_admin(x_admin_password: Optional[str] = Header(None)):
+    if x_admin_password != ADMIN_PASSWORD: raise HTTPException(401, "Invalid Password")
+
+def require_metrics_token(authorization: Optional[str] = Header(None), x_admin_password: Optional[str] = Header(None)):
+    if METRICS_TOKEN and secrets.compare_digest(authorization or "", f"Bearer {METRICS_TOKEN}"): return
+    require_admin(x_admin_password)
+
+def match_stock(names, db: Session, threshold):
+    """Fuzzy-match each name to a PharmacyStock row (or None) via the shared index."""
+    index = stock_index(db)
+    stock_ids = []
+    for name in names:
+        best_match, score = index.match(name or "", threshold)
+        stock_ids.append(index.stock_id(best_match) if best_match else None)
+
+    wanted = {sid for sid in stock_ids if sid is not None}
+    rows = {}
+    if wanted:
+        rows = {s.id: s for s in db.query(PharmacyStock).options(joinedload(PharmacyStock.pharmacy))
+                .filter(PharmacyStock.id.in_(wanted))}
+    return [rows.get(sid) for sid in stock_ids]
+
+def item_fields(med, position, index):
+    qty = med.get('qty', 1)
+    numeric = isinstance(qty, int) or (isinstance(qty, str) and qty.isdigit())
+    name = med.get('name')
+    return {"position": position, "medicine_name": name, "original_name": med.get('original_name'),
+            "qty": int(qty) if numeric else 1, "qty_label": None if numeric else str(qty),
+            "price": int(med.get('price') or 0), "stock_id": index.stock_id(name)}
+
+def item_dict(item):
+    med = {"name": item.medicine_name, "qty": item.qty_label or item.qty, "price": item.price}
+    if item.original_name: med["original_name"] = item.original_name
+    return med
+
+def set_medicines(pres, medicines, db: Session):
+    """Replace the prescription's order_items (and keep the legacy JSON copy in step)."""
+    index = stock_index(db)
+    pres.items = [OrderItem(**item_fields(med, position, index)) for position, med in enumerate(medicines)]
+    pres.extracted_medicines = json.dumps(medicines)
+
+def medicine_list(pres):
+    if pres.items: return [item_dict(item) for item in pres.items]
+    # Not backfilled yet (migrate_order_items.py): read the legacy JSON copy
+    try: medicines = json.loads(pres.extracted_medicines or "[]")
+    except ValueError: return []
+    return [med for med in medicines if isinstance(med, dict)] if isinstance(medicines, list) else []
 
 def check_real_stock(medicines, db: Session):
     report = []
     try:
-        all_stock = db.query(PharmacyStock).all()
-        stock_map = {item.medicine_name: item for item in all_stock}
-        stock_names = list(stock_map.keys())
-
-        for med in medicines:
-            med_name = med.get('name', '')
-            best_match, score = process.extractOne(med_name, stock_names) if stock_names else (None, 0)
-            
-            if score > 80:
-                stock = stock_map[best_match]
-                report.append(f"✅ {med_name} (Matched: {stock.medicine_name}): Found at {stock.pharmacy.name} (Qty: {stock.qty})")
+        routes = routing.table(db)
+        names = [med.get('name', '') for med in medicines]
+        chosen, _ = routes.route([(name, 1) for name in names])
+        for i, med_name in enumerate(names):
+            if i in chosen:
+                offer = chosen[i]; pharmacy = routes.pharmacies.get(offer.pharmacy_id, ("Unknown",))[0]
+                others = len(routes.by_pharmacy[medicine_index.normalize(offer.name)]) - 1
+                qty = offer.qty if offer.tracked else "untracked"
+                report.append(f"✅ {med_name} (Matched: {offer.name}): Found at {pharmacy} (Qty: {qty})"
+                              + (f" +{others} more pharmacies" if others else ""))
             else:
                 report.append(f"❌ {med_name}: Out of Stock / Unknown")
+        ships = {offer.pharmacy_id for offer in chosen.values()}
+        if len(ships) > 1: report.append(f"🚚 Needs {len(ships)} pharmacies to fill completely")
     except Exception as e: report.append(f"Stock Error: {str(e)}")
     return "\n".join(report)
 
+def build_bill(pres, raw_medicines, matches):
+    final_bill = []
+    grand_total = 0
+
+    for med, matched in zip(raw_medicines, matches):
+        written_name = med.get('name')
+        qty = 1
+        
+        if matched:
+            price = matched.price; final_name = matched.medicine_name; status = "Found"
+        else:
+            price = 0; final_name = written_name; status = "Not Found"
+
+        total = price * qty; grand_total += total
+        final_bill.append({"name": final_name, "original_name": written_name, "qty": qty, "price": price, "total": total, "status": status})
+
+    return {"doctor": pres.doctor.name if pres.doctor else "Store", "medicines": final_bill, "grand_total": grand_total, "status": pres.status}
+
+def price_prescriptions_batch(pres_ids, db: Session):
+    """Same bill as get_data for many prescriptions: one catalog load, each distinct name matched once."""
+    prescriptions = (db.query(Prescription).options(joinedload(Prescription.doctor), selectinload(Prescription.items))
+                     .filter(Prescription.id.in_(pres_ids)).all())
+    raw = {p.id: medicine_list(p) for p in prescriptions}
+
+    index = stock_index(db)
+    best = index.match_batch([med.get('name') or "" for meds in raw.values() for med in meds], threshold=60)
+    stock_for = {query: index.stock_id(name) for query, (name, score) in best.items() if name}
+    rows = {}
+    if stock_for:
+        rows = {s.id: s for s in db.query(PharmacyStock).filter(PharmacyStock.id.in_(set(stock_for.values())))}
+
+    bills = {}
+    for pres in prescriptions:
+        matches = [rows.get(stock_for.get(med.get('name') or "")) for med in raw[pres.id]]
+        bills[pres.id] = build_bill(pres, raw[pres.id], matches)
+    return {"bills": bills, "missing": [pid for pid in pres_ids if pid not in bills]}
+
 # ==========================================
 # 📡 API ENDPOINTS
 # ==========================================
@@ -180,8 +316,73 @@ def register_doctor(doctor: DoctorCreate, db: Session = Depends(get_db)):
     return {"status": "success", "unique_uuid": new_uuid}
 
 # 2. DOCTOR UPLOAD
+def notify_new_prescription(pres, doctor_name, final_list, db: Session):
+    med_names = ", ".join([m['name'] for m in final_list])
+    msg1 = f"🤖 *Prescription Received*\n📄 ID: {pres.id}\n👨‍⚕️ Dr. {doctor_name}\n💊 Medicines:\n{med_names}"
+
+    stock_report = check_real_stock(final_list, db)
+    # Link goes to Decision Page (Safe)
+    confirm_link = f"{RENDER_BACKEND_URL}/admin/decision-page/{pres.id}"
+    msg2 = f"🏪 *Pharmacy Stock Report*\n\n{stock_report}\n\n👇 *ACTION REQUIRED*\n[Click to Verify Stock]({confirm_link})"
+    # One message, one round trip (in sync mode it is sent inside the request)
+    send_telegram_alert(f"{msg1}\n\n{msg2}")
+
+def finish_ocr_job(pres_id, ai_results):
+    """Runs on an OCR worker: merge AI medicines with the manual ones and hand over to admin."""
+    db = SessionLocal()
+    try:
+        pres = (db.query(Prescription).options(joinedload(Prescription.doctor)).filter(Prescription.id == pres_id)
+                .with_for_update(of=Prescription).first())
+        if not pres or pres.status != "Processing": return  # already handed over (e.g. recovered as stuck)
+
+        manual = medicine_list(pres)
+        final_list = [{"name": m, "qty": "Standard"} for m in ai_results] + manual
+        set_medicines(pres, final_list, db)
+        pres.status = "Pending Approval" if final_list else "No Medicines Found"
+        db.commit()
+        order_events.publish(pres.id, pres.status)
+
+        doctor_name = pres.doctor.name if pres.doctor else "Unknown"
+        if final_list: notify_new_prescription(pres, doctor_name, final_list, db)
+        else: send_telegram_alert(f"⚠️ *No Medicines Found*\n📄 ID: {pres.id}\n👨‍⚕️ Dr. {doctor_name}\nAI could not read the uploaded image.")
+    finally:
+        db.close()
+
+# Jobs lost with their worker (restart, frozen lambda) would otherwise stay "Processing" forever
+OCR_STUCK_MINUTES = int(os.getenv("OCR_STUCK_MINUTES", "15"))
+_last_ocr_sweep = 0.0
+
+def recover_stuck_ocr(pres_id=None):
+    """Hand over "Processing" prescriptions older than OCR_STUCK_MINUTES that no local worker is running."""
+    global _last_ocr_sweep
+    if pres_id is None:
+        if time.monotonic() - _last_ocr_sweep < 60: return []
+        _last_ocr_sweep = time.monotonic()
+    db = SessionLocal()
+    try:
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(minutes=OCR_STUCK_MINUTES)
+        query = db.query(Prescription.id).filter(Prescription.status == "Processing", Prescription.created_at < cutoff)
+        if pres_id is not None: query = query.filter(Prescription.id == pres_id)
+        stuck = [pid for (pid,) in query.limit(100) if not ocr_jobs.active(pid)]
+    finally:
+        db.close()
+    for pid in stuck:
+        print(f"⚠️ OCR job {pid} stuck in Processing for over {OCR_STUCK_MINUTES} min, handing over without AI medicines")
+        finish_ocr_job(pid, [])
+    return stuck
+
+def read_upload(file: UploadFile, limit_bytes):
+    """Read the upload in 1 MB chunks, refusing it as soon as it passes the limit."""
+    chunks, size = [], 0
+    while chunk := file.file.read(1024 * 1024):
+        size += len(chunk)
+        if size > limit_bytes: raise HTTPException(413, f"Image too large (max {MAX_UPLOAD_MB} MB).")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+# Plain def: the DB work, stock matching, alerts and (serverless) inline OCR all block
 @app.post("/upload-prescription/{doctor_uuid}")
-async def upload_prescription(
+def upload_prescription(
     doctor_uuid: str, file: UploadFile = File(None), 
     manual_phone: str = Form(...), manual_medicines: str = Form("[]"), 
     db: Session = Depends(get_db)
@@ -190,83 +391,102 @@ async def upload_prescription(
     if not doctor: raise HTTPException(404, "Invalid Doctor Link")
     
     filename = file.filename if file else "manual_entry"
-    ai_results = []
-    
-    if file:
-        try:
-            contents = await file.read()
-            ai_results = ai_engine.analyze_prescription(contents)
-        except Exception as e: print(f"Upload Error: {e}")
 
     try: manual = [{"name": m, "qty": "Standard"} for m in json.loads(manual_medicines)]
     except: manual = []
 
-    ai_formatted = [{"name": m, "qty": "Standard"} for m in ai_results] if isinstance(ai_results, list) else []
-    final_list = ai_formatted + manual
-    
-    if not final_list: raise HTTPException(400, "No medicines found.")
+    if not file and not manual: raise HTTPException(400, "No medicines found.")
+    recover_stuck_ocr()  # at most once a minute per process
+    if file and ocr_jobs.saturated():
+        # Gemini is already behind; fail fast with a hint instead of queueing into a timeout
+        raise HTTPException(503, "Prescription reader is busy, please retry shortly.",
+                            headers={"Retry-After": str(ocr_jobs.retry_after())})
+
+    contents = read_upload(file, MAX_UPLOAD_MB * 1024 * 1024) if file else None
 
+    # Image uploads wait in "Processing" until the OCR worker fills in the AI medicines
     new_pres = Prescription(
         doctor_id=doctor.id, patient_phone=manual_phone.replace(" ", "").strip(),
-        image_url=filename, extracted_medicines=json.dumps(final_list), 
-        status="Pending Approval"
+        image_url=filename, status="Processing" if contents else "Pending Approval"
     )
+    set_medicines(new_pres, manual, db)
     db.add(new_pres); db.commit(); db.refresh(new_pres)
 
-    med_names = ", ".join([m['name'] for m in final_list])
-    msg1 = f"🤖 *Prescription Received*\n📄 ID: {new_pres.id}\n👨‍⚕️ Dr. {doctor.name}\n💊 Medicines:\n{med_names}"
-    send_telegram_alert(msg1)
-
-    stock_report = check_real_stock(final_list, db)
-    # Link goes to Decision Page (Safe)
-    confirm_link = f"{RENDER_BACKEND_URL}/admin/decision-page/{new_pres.id}"
-    msg2 = f"🏪 *Pharmacy Stock Report*\n\n{stock_report}\n\n👇 *ACTION REQUIRED*\n[Click to Verify Stock]({confirm_link})"
-    send_telegram_alert(msg2)
-    
-    return {"status": "success", "medicines": [m['name'] for m in final_list]}
+    if contents:
+        ocr_jobs.submit(new_pres.id, contents, finish_ocr_job)  # serverless: finished before this returns
+        return {"status": "processing", "job_id": new_pres.id, "medicines": [m['name'] for m in manual]}
+
+    notify_new_prescription(new_pres, doctor.name, manual, db)
+    return {"status": "success", "medicines": [m['name'] for m in manual]}
+
+# 2b. OCR JOB STATUS
+@app.get("/ocr-jobs/{job_id}")
+def ocr_job_status(job_id: int, db: Session = Depends(get_db)):
+    pres = db.query(Prescription).filter(Prescription.id == job_id).first()
+    if not pres: raise HTTPException(404, "Unknown Job")
+    if pres.status == "Processing" and recover_stuck_ocr(job_id): db.expire(pres)
+
+    # Jobs started by another worker process are only visible through the DB status
+    job = ocr_jobs.get(job_id) or {}
+    state = job.get("state") or ("running" if pres.status == "Processing" else "done")
+    medicines = [med.get('name') for med in medicine_list(pres)]
+    return {"job_id": job_id, "state": state, "status": pres.status, "medicines": medicines}
+
+# 2c. OCR CACHE STATS
+@app.get("/admin/ocr-cache", dependencies=[Depends(require_admin)])
+def ocr_cache_stats():
+    return extraction_cache.cache.stats()
+
+# 2d. AI MODEL HEALTH
+@app.get("/admin/ai-models", dependencies=[Depends(require_admin)])
+def ai_model_stats():
+    import ai_engine
+    return {"order": ai_engine.model_order(), "models": ai_engine.model_stats()}
+
+# 2e. PROMETHEUS METRICS
+@app.get("/metrics", dependencies=[Depends(require_metrics_token)])
+def prometheus_metrics():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# 2f. DB CONNECTION POOL
+@app.get("/admin/db-pool", dependencies=[Depends(require_admin)])
+def db_pool_stats():
+    return database.pool_stats()
+
+# 2g. STATIC ASSETS (admin page CSS; URLs carry a content hash, so cache for a year)
+@app.get("/static/{name}")
+def static_asset(name: str, request: Request):
+    found = pages.asset(name)
+    if not found: raise HTTPException(404, "Not found")
+    body, digest, media_type = found
+    headers = {"ETag": f'"{digest}"', "Cache-Control": pages.STATIC_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == headers["ETag"]: return Response(status_code=304, headers=headers)
+    return Response(body, media_type=media_type, headers=headers)
 
 # 🆕 INTERMEDIARY DECISION PAGE (Prevents Auto-Click)
 @app.get("/admin/decision-page/{pres_id}", response_class=HTMLResponse)
 def decision_page(pres_id: int, db: Session = Depends(get_db)):
     pres = db.query(Prescription).filter(Prescription.id == pres_id).first()
-    if not pres: return "Order not found"
-    
-    return f"""
-    <html>
-    <head><meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <style>body{{font-family:sans-serif;padding:20px;text-align:center;background:#f4f4f4;}} .card{{background:white;padding:30px;border-radius:15px;max-width:500px;margin:auto;}} .btn{{display:block;padding:15px;margin:10px 0;border-radius:8px;text-decoration:none;color:white;font-weight:bold;}} .approve{{background:#27ae60;}} .decline{{background:#c0392b;}}</style>
-    </head>
-    <body>
-        <div class="card">
-            <h2>🛡️ Admin Decision</h2>
-            <p><strong>Order ID:</strong> #{pres.id}</p>
-            <p><strong>Status:</strong> {pres.status}</p>
-            <hr>
-            <a href="{RENDER_BACKEND_URL}/admin/approve/{pres_id}" class="btn approve">✅ Approve & Notify Patient</a>
-        </div>
-    </body>
-    </html>
-    """
+    if not pres: return pages.message("Order not found", tone="fail")
+    return pages.render("decision.html", pres=pres, backend_url=RENDER_BACKEND_URL)
 
 # 3. ADMIN APPROVE (ACTION)
 @app.get("/admin/approve/{pres_id}", response_class=HTMLResponse)
 def approve_prescription(pres_id: int, db: Session = Depends(get_db)):
     pres = db.query(Prescription).filter(Prescription.id == pres_id).first()
-    if not pres: return "<h1>Error: Prescription Not Found</h1>"
+    if not pres: return pages.message("Error: Prescription Not Found", tone="fail")
     
     pres.status = "Approved"
     db.commit()
+    order_events.publish(pres.id, pres.status)
 
     patient_link = f"{LIVE_WEBSITE_URL}/patient_login.html?id={pres.id}"
-    phone = pres.patient_phone.replace(" ", "").replace("-", "")
+    phone = (pres.patient_phone or "").replace(" ", "").replace("-", "")
     if len(phone) == 10: phone = "91" + phone 
     
-    whatsapp_url = f"https://wa.me/{phone}?text=Hello {pres.patient_name or 'Customer'}, your prescription is ready! Click here: {patient_link}"
-
-    return f"""<html><body style="text-align:center; padding:50px;">
-    <h1 style="color:green">✅ Approved!</h1><p>Status updated.</p>
-    <a href="{whatsapp_url}" style="background:#25D366; color:white; padding:15px; text-decoration:none; border-radius:5px;">👉 Send on WhatsApp</a>
-    </body></html>"""
+    text = f"Hello {pres.patient_name or 'Customer'}, your prescription is ready! Click here: {patient_link}"
+    whatsapp_url = f"https://wa.me/{phone}?text={quote(text)}"
+    return pages.render("approved.html", pres_id=pres.id, whatsapp_url=whatsapp_url)
 
 # 4. PATIENT LOGIN
 @app.post("/verify-patient/{pres_id}")
@@ -275,52 +495,78 @@ def verify_patient(pres_id: int, login: LoginRequest, db: Session = Depends(get_
     if pres and pres.patient_phone == login.phone.strip(): return {"status": "success"}
     raise HTTPException(401, "Phone mismatch")
 
+# Sync, CPU-bound helpers (stock index, matching, routing) called from async handlers
+# run in the threadpool on a session of their own, never on the event loop.
+# Like the async sessions, it doesn't expire on commit: results outlive it.
+def in_session(fn, *args, **kwargs):
+    db = SessionLocal(expire_on_commit=False)
+    try: return fn(db, *args, **kwargs)
+    finally: db.close()
+
 # 5. GET DATA
 @app.get("/get-prescription/{pres_id}")
-def get_data(pres_id: int, db: Session = Depends(get_db)):
-    pres = db.query(Prescription).filter(Prescription.id == pres_id).first()
+async def get_data(pres_id: int, db=Depends(get_async_db)):
+    pres = await db.scalar(select(Prescription).options(joinedload(Prescription.doctor), selectinload(Prescription.items))
+                           .where(Prescription.id == pres_id))
     if not pres: raise HTTPException(404, "Not Found")
     
-    raw_medicines = json.loads(pres.extracted_medicines)
-    final_bill = []
-    grand_total = 0
-    
-    # Simple stock check logic
-    try:
-        all_stock = db.query(PharmacyStock).all()
-        stock_map = {item.medicine_name: item for item in all_stock}
-        stock_names = list(stock_map.keys())
-    except: stock_names = []
+    raw_medicines = medicine_list(pres)
 
-    for med in raw_medicines:
-        written_name = med.get('name')
-        qty = 1
-        best_match, score = process.extractOne(written_name, stock_names) if stock_names else (None, 0)
-        
-        if score > 60:
-            matched = stock_map[best_match]
-            price = matched.price; final_name = matched.medicine_name; status = "Found"
-        else:
-            price = 0; final_name = written_name; status = "Not Found"
+    # Simple stock check logic (fuzzy matching is CPU work: threadpool, own session)
+    names = [med.get('name') for med in raw_medicines]
+    try: matches = await run_in_threadpool(in_session, lambda sync_db: match_stock(names, sync_db, threshold=60))
+    except: matches = [None] * len(raw_medicines)
 
-        total = price * qty; grand_total += total
-        final_bill.append({"name": final_name, "original_name": written_name, "qty": qty, "price": price, "total": total, "status": status})
+    return build_bill(pres, raw_medicines, matches)
 
-    return {"doctor": pres.doctor.name if pres.doctor else "Store", "medicines": final_bill, "grand_total": grand_total, "status": pres.status}
+# 5b. BATCH PRICING (Admin review / nightly reconciliation)
+MAX_PRICE_BATCH = int(os.getenv("MAX_PRICE_BATCH", "200"))
+
+@app.post("/admin/price-prescriptions", dependencies=[Depends(require_admin)])
+def price_prescriptions(data: BatchPriceRequest, db: Session = Depends(get_db)):
+    ids = list(dict.fromkeys(data.ids))
+    if len(ids) > MAX_PRICE_BATCH: raise HTTPException(400, f"At most {MAX_PRICE_BATCH} prescriptions per request")
+    return price_prescriptions_batch(ids, db)
+
+def route_objective(route_by):
+    if route_by and route_by not in routing.OBJECTIVES: raise HTTPException(400, f"route_by must be one of {routing.OBJECTIVES}")
+    return route_by or routing.OBJECTIVE
+
+# Takes the ordered units out of stock until the payment is approved or declined
+def hold_stock(pres, db):
+    try:
+        reservations.hold(db, pres)
+    except reservations.OutOfStock as e:
+        db.rollback()
+        routing.invalidate()  # the table thought these were in stock
+        raise HTTPException(409, f"Not enough stock for: {', '.join(e.names)}")
+
+# 5c. PHARMACY ROUTING (which pharmacy/pharmacies ship an order)
+@app.post("/store/route")
+def route_order(data: RouteRequest, db: Session = Depends(get_db)):
+    return routing.plan(db, data.medicines, data.pincode, route_objective(data.route_by))
 
 # 6. REQUEST ORDER (Patient Dashboard)
+# Re-confirming replaces the held stock; once the payment is approved the holds are
+# final, and confirming again would take the stock a second time
+CONFIRMABLE_STATUSES = {"Approved", "Verifying Payment", "Payment Failed"}
+
 @app.post("/confirm-order/{pres_id}")
 def confirm_order(pres_id: int, order: OrderConfirm, db: Session = Depends(get_db)):
-    pres = db.query(Prescription).filter(Prescription.id == pres_id).first()
+    pres = db.query(Prescription).filter(Prescription.id == pres_id).with_for_update().first()
     if not pres: raise HTTPException(404, "Not Found")
+    if pres.status not in CONFIRMABLE_STATUSES: raise HTTPException(409, f"Order can't be confirmed while {pres.status}")
 
     pres.status = "Verifying Payment" # 👈 IMPORTANT: Resets status
     pres.patient_name = order.patient_name
     pres.address = f"{order.address_line}, {order.landmark}, Pin: {order.pincode}"
     pres.payment_mode = order.payment_mode 
-    pres.extracted_medicines = json.dumps(order.final_medicines)
+    set_medicines(pres, order.final_medicines, db)
     pres.total_amount = sum(item['price'] * item['qty'] for item in order.final_medicines)
+    routing.assign(db, pres.items, order.pincode, route_objective(order.route_by))
+    hold_stock(pres, db)
     db.commit()
+    order_events.publish(pres.id, pres.status)
 
     # Link to DECISION PAGE, not action
     decision_link = f"{RENDER_BACKEND_URL}/admin/payment-decision/{pres_id}"
@@ -335,38 +581,73 @@ def confirm_order(pres_id: int, order: OrderConfirm, db: Session = Depends(get_d
 @app.get("/admin/payment-decision/{pres_id}", response_class=HTMLResponse)
 def payment_decision_page(pres_id: int, db: Session = Depends(get_db)):
     pres = db.query(Prescription).filter(Prescription.id == pres_id).first()
-    
-    return f"""
-    <html>
-    <head><meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <style>body{{font-family:sans-serif;padding:20px;text-align:center;background:#f4f4f4;}} .card{{background:white;padding:30px;border-radius:15px;max-width:500px;margin:auto;}} .btn{{display:block;padding:15px;margin:10px 0;border-radius:8px;text-decoration:none;color:white;font-weight:bold;}} .approve{{background:#27ae60;}} .decline{{background:#c0392b;}}</style>
-    </head>
-    <body>
-        <div class="card">
-            <h2>💰 Payment Verification</h2>
-            <p><strong>Customer:</strong> {pres.patient_name}</p>
-            <p><strong>Amount:</strong> ₹{pres.total_amount}</p>
-            <p><strong>Txn ID:</strong> {pres.payment_mode}</p>
-            <hr>
-            <p>Please check your Bank App. If money received:</p>
-            <a href="{RENDER_BACKEND_URL}/admin/payment-action/{pres_id}/approve" class="btn approve">✅ Yes, Approve Order</a>
-            <a href="{RENDER_BACKEND_URL}/admin/payment-action/{pres_id}/decline" class="btn decline">❌ No, Decline</a>
-        </div>
-    </body>
-    </html>
-    """
+    if not pres: return pages.message("Order not found", tone="fail")
+    return pages.render("payment_decision.html", pres=pres, backend_url=RENDER_BACKEND_URL)
 
 # 7. DROPDOWN LIST
+def catalog_rows(db: Session):
+    # One joined query feeds both catalog snapshots (no per-row pharmacy lookups)
+    return (db.query(PharmacyStock.medicine_name, PharmacyStock.price, PharmacyStock.image_url, Pharmacy.name)
+            .outerjoin(Pharmacy, PharmacyStock.pharmacy_id == Pharmacy.id).order_by(PharmacyStock.id).all())
+
 @app.get("/doctor/medicine-list")
-def get_master_medicine_list(db: Session = Depends(get_db)):
-    results = db.query(PharmacyStock.medicine_name).distinct().all()
-    return [row.medicine_name for row in results]
+def get_master_medicine_list(request: Request, db: Session = Depends(get_db)):
+    snap = catalog.get("medicine-list", lambda: sorted({row.medicine_name for row in catalog_rows(db) if row.medicine_name}))
+    return catalog.respond(request, snap)
 
 # 8. STORE CATALOG
+def store_catalog(db: Session):
+    return [{"name": name, "price": price, "image": image, "pharmacy": pharmacy}
+            for name, price, image, pharmacy in catalog_rows(db) if price and price > 0]
+
 @app.get("/store/all-medicines")
-def get_store_inventory(db: Session = Depends(get_db)):
-    stocks = db.query(PharmacyStock).filter(PharmacyStock.price > 0).all()
-    return [{"name": i.medicine_name, "price": i.price, "image": i.image_url, "pharmacy": i.pharmacy.name} for i in stocks]
+async def get_store_inventory(request: Request):
+    return catalog.respond(request, await catalog.get_async("all-medicines", lambda: in_session(store_catalog)))
+
+# 8b. CATALOG SEARCH (paginated, filtered server-side)
+CATALOG_SORTS = {"name": ("medicine_name", False), "price_asc": ("price", False), "price_desc": ("price", True)}
+
+@app.get("/store/medicines")
+def search_store_medicines(
+    q: str = "", match: str = "prefix", min_price: Optional[int] = None, max_price: Optional[int] = None,
+    pharmacy_id: Optional[int] = None, sort: str = "name", limit: int = 24, cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    if sort not in CATALOG_SORTS: raise HTTPException(400, f"sort must be one of {', '.join(CATALOG_SORTS)}")
+    field, descending = CATALOG_SORTS[sort]
+    column = getattr(PharmacyStock, field)
+    limit = max(1, min(limit, 100))
+
+    query = (db.query(PharmacyStock.id, PharmacyStock.medicine_name, PharmacyStock.price, PharmacyStock.image_url,
+                      PharmacyStock.pharmacy_id, Pharmacy.name.label("pharmacy"))
+             .outerjoin(Pharmacy, PharmacyStock.pharmacy_id == Pharmacy.id)
+             .filter(PharmacyStock.price > 0, PharmacyStock.medicine_name.isnot(None)))
+
+    q = q.strip()
+    if q and match == "fuzzy":
+        query = query.filter(PharmacyStock.medicine_name.in_(stock_index(db).suggest(q, k=200)))
+    elif q:
+        pattern = q.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        query = query.filter(func.lower(PharmacyStock.medicine_name).like(pattern, escape="\\"))
+    if min_price is not None: query = query.filter(PharmacyStock.price >= min_price)
+    if max_price is not None: query = query.filter(PharmacyStock.price <= max_price)
+    if pharmacy_id is not None: query = query.filter(PharmacyStock.pharmacy_id == pharmacy_id)
+
+    if cursor:
+        value, last_id = decode_cursor(cursor, str if field == "medicine_name" else int)
+        beyond = column < value if descending else column > value
+        query = query.filter(or_(beyond, and_(column == value, PharmacyStock.id > last_id)))
+
+    rows = query.order_by(column.desc() if descending else column.asc(), PharmacyStock.id.asc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(getattr(rows[limit - 1], field), rows[limit - 1].id) if len(rows) > limit else None
+    items = [{"id": r.id, "name": r.medicine_name, "price": r.price, "image": r.image_url,
+              "pharmacy": r.pharmacy, "pharmacy_id": r.pharmacy_id} for r in rows[:limit]]
+    return {"items": items, "next_cursor": next_cursor}
+
+# 8c. DOCTOR TYPEAHEAD
+@app.get("/doctor/medicine-search")
+def medicine_typeahead(q: str, k: int = 10, db: Session = Depends(get_db)):
+    return stock_index(db).suggest(q, k=max(1, min(k, 50)))
 
 # 9. CONTACT FORM
 @app.post("/contact-us")
@@ -378,7 +659,7 @@ def submit_contact_form(form: ContactForm):
 @app.get("/admin/payment-action/{pres_id}/{action}", response_class=HTMLResponse)
 def admin_payment_action(pres_id: int, action: str, db: Session = Depends(get_db)):
     pres = db.query(Prescription).filter(Prescription.id == pres_id).first()
-    if not pres: return "Order not found"
+    if not pres: return pages.message("Order not found", tone="fail")
 
     if action == "approve":
         pres.status = "Ordered"
@@ -387,43 +668,104 @@ def admin_payment_action(pres_id: int, action: str, db: Session = Depends(get_db
             new_sale = CompletedOrder(
                 original_pres_id = pres.id, customer_name = pres.patient_name,
                 phone_number = pres.patient_phone, address = pres.address,
-                medicines_json = pres.extracted_medicines, total_amount = pres.total_amount,
+                medicines_json = json.dumps(medicine_list(pres)), total_amount = pres.total_amount,
                 transaction_id = pres.payment_mode
             )
-            db.add(new_sale)
-        message, color = "✅ Payment Approved & Saved!", "green"
+            try:
+                with db.begin_nested(): db.add(new_sale)
+            except IntegrityError:
+                pass  # a concurrent approve already recorded this sale
+        short = reservations.commit(db, pres)
+        # What was written -> what it was fuzzy-matched to: queued for review, not learned (aliases.py)
+        aliases.suggest(db, [(item.original_name, item.medicine_name) for item in pres.items if item.original_name and item.stock_id])
+        heading, tone = "✅ Payment Approved & Saved!", "ok"
+        notes = [f"⚠️ Short on stock: {', '.join(short)}"] if short else []
     else:
         pres.status = "Payment Failed"
-        message, color = "❌ Payment Declined.", "red"
+        reservations.release(db, pres.id)
+        heading, tone, notes = "❌ Payment Declined.", "fail", []
     
     db.commit()
-    return f"<html><body style='text-align:center; padding:50px;'><h1 style='color:{color}'>{message}</h1><p>You can close this window.</p></body></html>"
+    order_events.publish(pres.id, pres.status)
+    return pages.message(heading, *notes, "You can close this window.", tone=tone, cache=not notes)
 
 # 11. CHECK STATUS
 @app.get("/check-order-status/{pres_id}")
-def check_status(pres_id: int, db: Session = Depends(get_db)):
-    pres = db.query(Prescription).filter(Prescription.id == pres_id).first()
-    return {"status": pres.status if pres else "error"}
+async def check_status(pres_id: int, db=Depends(get_async_db)):
+    status = await db.scalar(select(Prescription.status).where(Prescription.id == pres_id))
+    return {"status": status or "error"}
 
-# 12. STORE CHECKOUT
-@app.post("/store/checkout")
-def store_checkout(order: OrderConfirm, db: Session = Depends(get_db)):
-    dummy_doc = db.query(Doctor).filter(Doctor.uuid_code == "store_admin").first()
-    if not dummy_doc: 
-        dummy_doc = Doctor(name="Online Store", uuid_code="store_admin", phone="000", clinic_address="Online")
-        db.add(dummy_doc); db.commit()
+# 11b. LIVE STATUS STREAM (Server-Sent Events, replaces polling the endpoint above)
+FINAL_STATUSES = {"Ordered", "Payment Failed", "error"}
+SSE_MAX_SECONDS = int(os.getenv("SSE_MAX_SECONDS", "300"))
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))  # also how often the DB is re-checked
+
+def read_status(pres_id):
+    db = SessionLocal()
+    try:
+        pres = db.query(Prescription).filter(Prescription.id == pres_id).first()
+        return pres.status if pres else "error"
+    finally:
+        db.close()
+
+@app.get("/order-status-stream/{pres_id}")
+async def order_status_stream(pres_id: int, request: Request):
+    broker = order_events.broker
+    queue = broker.subscribe(pres_id)  # before reading, so no change slips through
 
+    async def events():
+        try:
+            status = await run_in_threadpool(read_status, pres_id)
+            yield f"retry: 3000\ndata: {json.dumps({'status': status})}\n\n"
+            # Streams are capped so serverless invocations end; EventSource reconnects
+            deadline = time.monotonic() + SSE_MAX_SECONDS
+            while status not in FINAL_STATUSES and time.monotonic() < deadline:
+                if await request.is_disconnected(): break
+                try: status_now = (await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS))["status"]
+                except asyncio.TimeoutError:
+                    # Changes made by another worker/lambda never reach a MemoryBroker: check the DB too
+                    status_now = await run_in_threadpool(read_status, pres_id)
+                    if status_now == status:
+                        yield ": keep-alive\n\n"
+                        continue
+                status = status_now
+                yield f"data: {json.dumps({'status': status})}\n\n"
+        finally:
+            broker.unsubscribe(pres_id, queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# 12. STORE CHECKOUT
+def place_store_order(db: Session, order: OrderConfirm, doctor_id: int):
     full_address = f"{order.address_line}, {order.landmark}, Pin: {order.pincode}"
     bill_total = sum(item['price'] * item['qty'] for item in order.final_medicines)
 
     new_order = Prescription(
-        doctor_id=dummy_doc.id, patient_name=order.patient_name,
+        doctor_id=doctor_id, patient_name=order.patient_name,
         patient_phone=order.phone, address=full_address,
-        payment_mode=order.payment_mode, extracted_medicines=json.dumps(order.final_medicines),
+        payment_mode=order.payment_mode,
         total_amount=bill_total, status="Verifying Payment", # 👈 EXPLICIT STATUS
         image_url="STORE_PURCHASE", created_at=datetime.datetime.utcnow()
     )
-    db.add(new_order); db.commit(); db.refresh(new_order)
+    set_medicines(new_order, order.final_medicines, db)
+    db.add(new_order); db.flush()
+    routing.assign(db, new_order.items, order.pincode, route_objective(order.route_by))
+    hold_stock(new_order, db)
+    db.commit()
+    return new_order
+
+@app.post("/store/checkout")
+async def store_checkout(order: OrderConfirm, db=Depends(get_async_db)):
+    dummy_doc = await db.scalar(select(Doctor).where(Doctor.uuid_code == "store_admin"))
+    if not dummy_doc: 
+        dummy_doc = Doctor(name="Online Store", uuid_code="store_admin", phone="000", clinic_address="Online")
+        db.add(dummy_doc); await db.commit()
+
+    # Stock index, routing and reservations are sync, CPU-heavy code: threadpool, own session
+    new_order = await run_in_threadpool(in_session, place_store_order, order, dummy_doc.id)
+    bill_total = new_order.total_amount
+    await run_in_threadpool(order_events.publish, new_order.id, new_order.status)
 
     # Link to DECISION PAGE
     decision_link = f"{RENDER_BACKEND_URL}/admin/payment-decision/{new_order.id}"
@@ -431,5 +773,105 @@ def store_checkout(order: OrderConfirm, db: Session = Depends(get_db)):
     
     msg = (f"🛒 *NEW STORE ORDER*\n👤 {order.patient_name}\n💵 ₹{bill_total}\n🆔 {order.payment_mode}\n"
            f"👇 *Click to Verify:*\n[Open Admin Decision Page]({decision_link})")
-    send_telegram_alert(msg)
-    return {"status": "pending_verification", "order_id": new_order.id}
\ No newline at end of file
+    await run_in_threadpool(send_telegram_alert, msg)  # a blocking send under TELEGRAM_SYNC
+    return {"status": "pending_verification", "order_id": new_order.id}
+
+# 13. BULK INVENTORY (admin)
+@app.post("/admin/inventory/import", dependencies=[Depends(require_admin)])
+def import_inventory(
+    file: UploadFile = File(...), pharmacy: Optional[str] = Form(None), location: Optional[str] = Form(None),
+    batch_size: int = Form(5000), db: Session = Depends(get_db)
+):
+    import inventory_io
+    fmt = "jsonl" if (file.filename or "").endswith((".jsonl", ".ndjson")) else "csv"
+    counts = {"rejected": 0}
+    records = inventory_io.read_records(file.file, fmt, pharmacy, location, counts)
+    stats = inventory_io.import_records(db, records, batch_size=max(100, batch_size))
+    stats["rejected"] = counts["rejected"]
+    return stats
+
+@app.get("/admin/inventory/export", dependencies=[Depends(require_admin)])
+def export_inventory(format: str = "csv"):
+    import inventory_io
+    fmt = "jsonl" if format == "jsonl" else "csv"
+
+    def chunks():
+        # Own session: the stream outlives the request's dependencies
+        db = SessionLocal()
+        try: yield from inventory_io.export_chunks(db, fmt)
+        finally: db.close()
+
+    media_type = "application/x-ndjson" if fmt == "jsonl" else "text/csv"
+    return StreamingResponse(chunks(), media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="inventory.{fmt}"'})
+
+# 13b. MEDICINE ALIASES (admin; exact-match fast path in front of fuzzy matching)
+@app.get("/admin/medicine-aliases", dependencies=[Depends(require_admin)])
+def list_medicine_aliases(db: Session = Depends(get_db)):
+    stock_index(db)
+    stored = db.query(MedicineAlias).order_by(MedicineAlias.created_at.desc()).all()
+    row = lambda a: {"alias": a.alias, "name": a.name, "source": a.source}
+    # Suggestions come from approved orders; POST one back to confirm it
+    return {"curated_groups": aliases.dictionary.curated, "keys": len(aliases.dictionary),
+            "learned": [row(a) for a in stored if a.source != aliases.SUGGESTED],
+            "suggested": [row(a) for a in stored if a.source == aliases.SUGGESTED]}
+
+@app.post("/admin/medicine-aliases", dependencies=[Depends(require_admin)])
+def add_medicine_alias(data: AliasRequest, db: Session = Depends(get_db)):
+    index = stock_index(db)
+    if not index.stock_ids(data.name): raise HTTPException(404, f"No stock listed as {data.name}")
+    learned = aliases.learn(db, [(data.alias, data.name)], source="manual")
+    db.commit()
+    return {"learned": len(learned), "alias": aliases.key(data.alias), "name": data.name}
+
+@app.delete("/admin/medicine-aliases/{alias}", dependencies=[Depends(require_admin)])
+def delete_medicine_alias(alias: str, db: Session = Depends(get_db)):
+    deleted = db.query(MedicineAlias).filter(MedicineAlias.alias == aliases.key(alias)).delete()
+    db.commit()
+    aliases.dictionary.reset()
+    return {"deleted": deleted}
+
+# 14. ADMIN DASHBOARD (filters, keyset pages and aggregates all in SQL)
+@app.get("/admin/dashboard/prescriptions", dependencies=[Depends(require_admin)])
+def dashboard_prescriptions(
+    status: Optional[str] = None, start: Optional[datetime.date] = None, end: Optional[datetime.date] = None,
+    limit: int = 50, cursor: Optional[str] = None, db: Session = Depends(get_db)
+):
+    return dashboard.list_prescriptions(db, status, start, end, limit, cursor)
+
+@app.get("/admin/dashboard/orders", dependencies=[Depends(require_admin)])
+def dashboard_orders(
+    start: Optional[datetime.date] = None, end: Optional[datetime.date] = None,
+    limit: int = 50, cursor: Optional[str] = None, db: Session = Depends(get_db)
+):
+    return dashboard.list_orders(db, start, end, limit, cursor)
+
+@app.get("/admin/dashboard/summary", dependencies=[Depends(require_admin)])
+def dashboard_summary(start: Optional[datetime.date] = None, end: Optional[datetime.date] = None, top: int = 10,
+                      db: Session = Depends(get_db)):
+    return dashboard.summary(db, start, end, top)
+
+@app.post("/admin/dashboard/rollup", dependencies=[Depends(require_admin)])
+def dashboard_rollup(full: bool = False, db: Session = Depends(get_db)):
+    return dashboard.refresh_rollup(db, full)
+
+# 15. SALES REPORT (admin; streamed from completed_orders, see sales_report.py)
+@app.get("/admin/reports/sales", dependencies=[Depends(require_admin)])
+def sales_report_export(
+    start: Optional[datetime.date] = None, end: Optional[datetime.date] = None,
+    kind: str = "lines", format: str = "csv"
+):
+    import sales_report
+    if kind not in ("lines", "daily"): raise HTTPException(400, "kind must be lines or daily")
+    fmt = "jsonl" if format == "jsonl" else "csv"
+    fields = sales_report.DAILY_FIELDS if kind == "daily" else sales_report.LINE_FIELDS
+
+    def chunks():
+        # Own session: the stream outlives the request's dependencies
+        db = SessionLocal()
+        try: yield from sales_report.text_chunks(sales_report.rows(db, kind, start, end), fields, fmt)
+        finally: db.close()
+
+    name = f"sales-{kind}-{start or 'all'}-{end or 'now'}.{fmt}"
+    media_type = "application/x-ndjson" if fmt == "jsonl" else "text/csv"
+    return StreamingResponse(chunks(), media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{name}"'})
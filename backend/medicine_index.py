@@ -0,0 +1,227 @@
+# medicine_index.py
+# In-memory fuzzy index over PharmacyStock.medicine_name.
+#
+# Instead of running thefuzz over every stock name for every medicine, names are
+# split into padded character trigrams. A query only gets exact WRatio scoring
+# against the names that share the most trigrams with it (the "shortlist").
+# Before any of that, exact() tries the alias fast path (aliases.py).
+import bisect
+import os
+import threading
+import time
+from collections import defaultdict
+
+import aliases
+import metrics
+
+# How many candidates survive trigram pruning before exact scoring
+SHORTLIST_SIZE = int(os.getenv("MEDICINE_INDEX_SHORTLIST", "40"))
+# Past this many candidate names, common trigrams stop adding new ones
+CANDIDATE_POOL = int(os.getenv("MEDICINE_INDEX_POOL", "2000"))
+# Full reload interval (seconds). Keeps several workers roughly in sync; 0 = never.
+REFRESH_SECONDS = int(os.getenv("MEDICINE_INDEX_TTL", "300"))
+
+
+# thefuzz is imported on first use (keeps it off the cold-start path);
+# each stub swaps itself for the real function on its first call
+def _full_process(text):
+    global _full_process
+    from thefuzz import utils
+    _full_process = utils.full_process
+    return _full_process(text)
+
+
+def _wratio(query, choice):
+    global _wratio
+    from thefuzz import fuzz
+    _wratio = fuzz.WRatio
+    return _wratio(query, choice)
+
+
+def normalize(name):
+    # Same processor thefuzz.extractOne uses: lowercase, strip punctuation
+    return _full_process(name or "")
+
+
+def trigrams(text):
+    grams = set()
+    for token in text.split():
+        padded = f" {token} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+class MedicineIndex:
+    def __init__(self, shortlist=SHORTLIST_SIZE, refresh_seconds=REFRESH_SECONDS):
+        self.shortlist = shortlist
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.RLock()
+        self._loaded_at = None
+        self._names = {}                # stock_id -> medicine_name
+        self._ids = defaultdict(set)    # medicine_name -> {stock_id, ...}
+        self._grams = defaultdict(set)  # trigram -> {medicine_name, ...}
+        self._keys = defaultdict(set)   # aliases.key(name) -> {medicine_name, ...}
+        self._sorted = []               # sorted (normalized, medicine_name) for prefix lookups
+
+    # --- Building ---
+    def is_fresh(self):
+        if self._loaded_at is None: return False
+        return not self.refresh_seconds or time.monotonic() - self._loaded_at < self.refresh_seconds
+
+    def ensure(self, loader):
+        """Build the index once. `loader` returns (stock_id, medicine_name) rows."""
+        if self.is_fresh(): return self
+        with self._lock:
+            if not self.is_fresh(): self.load(loader())
+        return self
+
+    @metrics.FUZZY.time("load")
+    def load(self, rows):
+        with self._lock:
+            self._names.clear(); self._ids.clear(); self._grams.clear(); self._keys.clear(); self._sorted = []
+            for stock_id, name in rows:
+                self._add(stock_id, name, keep_sorted=False)
+            self._sorted.sort()
+            self._loaded_at = time.monotonic()
+
+    def reset(self):
+        # Forces a full rebuild on next use
+        with self._lock:
+            self._loaded_at = None
+
+    # --- Incremental updates (wired to PharmacyStock events in main.py) ---
+    def upsert(self, stock_id, name):
+        with self._lock:
+            if self._loaded_at is None: return  # next ensure() reads it from the DB anyway
+            if self._names.get(stock_id) == name: return
+            self._discard(stock_id)
+            self._add(stock_id, name)
+
+    def remove(self, stock_id):
+        with self._lock:
+            self._discard(stock_id)
+
+    def _add(self, stock_id, name, keep_sorted=True):
+        if not name: return
+        self._names[stock_id] = name
+        if not self._ids[name]:
+            norm = normalize(name)
+            for gram in trigrams(norm):
+                self._grams[gram].add(name)
+            self._keys[aliases.key(name)].add(name)
+            if keep_sorted: bisect.insort(self._sorted, (norm, name))
+            else: self._sorted.append((norm, name))
+        self._ids[name].add(stock_id)
+
+    def _discard(self, stock_id):
+        name = self._names.pop(stock_id, None)
+        if name is None: return
+        self._ids[name].discard(stock_id)
+        if self._ids[name]: return
+        del self._ids[name]
+        norm = normalize(name)
+        i = bisect.bisect_left(self._sorted, (norm, name))
+        if i < len(self._sorted) and self._sorted[i] == (norm, name): del self._sorted[i]
+        same_key = self._keys.get(aliases.key(name))
+        if same_key is not None:
+            same_key.discard(name)
+            if not same_key: del self._keys[aliases.key(name)]
+        for gram in trigrams(norm):
+            bucket = self._grams.get(gram)
+            if bucket is None: continue
+            bucket.discard(name)
+            if not bucket: del self._grams[gram]
+
+    # --- Lookups ---
+    def __len__(self):
+        return len(self._ids)
+
+    def names(self):
+        with self._lock:
+            return list(self._ids)
+
+    def stock_ids(self, name):
+        with self._lock:
+            return sorted(self._ids.get(name, ()))
+
+    def stock_id(self, name):
+        # Latest listing wins, like the old {medicine_name: row} dict did
+        ids = self.stock_ids(name)
+        return ids[-1] if ids else None
+
+    def candidates(self, query):
+        counts = defaultdict(int)
+        with self._lock:
+            # Rarest trigrams first. Once enough names are in play, common trigrams
+            # only re-score existing candidates instead of walking their huge postings.
+            postings = sorted((self._grams[g] for g in trigrams(normalize(query)) if g in self._grams), key=len)
+            for posting in postings:
+                if len(counts) < CANDIDATE_POOL:
+                    for name in posting: counts[name] += 1
+                else:
+                    for name in counts:
+                        if name in posting: counts[name] += 1
+        if len(counts) <= self.shortlist: return list(counts)
+        return sorted(counts, key=counts.get, reverse=True)[:self.shortlist]
+
+    def exact(self, query):
+        """Stock name with the same canonical key as `query`, or as one of its aliases; else None."""
+        query_key = aliases.key(query)
+        if not query_key: return None
+        with self._lock:
+            for candidate in (query_key, *aliases.dictionary.targets(query_key)):
+                names = self._keys.get(candidate)
+                if names: return min(names)
+        return None
+
+    @metrics.FUZZY.time("match")
+    def match(self, query, threshold=0):
+        """Best (medicine_name, score) whose score beats `threshold`, else (None, 0)."""
+        return self._match(query, threshold)
+
+    def _match(self, query, threshold):
+        exact = self.exact(query)
+        if exact: return exact, 100
+        best, best_score = None, 0
+        for name in self.candidates(query):
+            score = _wratio(query, name)
+            if score > best_score: best, best_score = name, score
+        if best is None or best_score <= threshold: return None, 0
+        return best, best_score
+
+    @metrics.FUZZY.time("suggest")
+    def suggest(self, query, k=10, min_score=60):
+        """Typeahead: names starting with the query, topped up with fuzzy matches."""
+        prefix = normalize(query)
+        if not prefix: return []
+        found = []
+        with self._lock:
+            i = bisect.bisect_left(self._sorted, (prefix,))
+            while i < len(self._sorted) and len(found) < k and self._sorted[i][0].startswith(prefix):
+                found.append(self._sorted[i][1]); i += 1
+        if len(found) < k and len(prefix) >= 3:
+            scored = sorted(((_wratio(query, name), name) for name in self.candidates(query) if name not in found), reverse=True)
+            found += [name for score, name in scored if score >= min_score][:k - len(found)]
+        return found
+
+    @metrics.FUZZY.time("match_batch")
+    def match_batch(self, queries, threshold=0):
+        """match() for many queries at once, each distinct query scored once.
+
+        Returns {query: (medicine_name, score)}, with (None, 0) for misses.
+        Same shortlist, threshold and tie-breaking as match(), so a batch bill
+        always agrees with the single-prescription one.
+        """
+        return {query: self._match(query, threshold) for query in dict.fromkeys(q or "" for q in queries)}
+
+
+# Shared by every endpoint in this process
+index = MedicineIndex()
+
+
+def stock_index(db):
+    """The shared index over PharmacyStock (and the alias dictionary), loaded on first use."""
+    from models import PharmacyStock  # keeps the index itself usable without a database
+    aliases.dictionary.ensure(lambda: aliases.learned(db))
+    return index.ensure(lambda: db.query(PharmacyStock.id, PharmacyStock.medicine_name).all())
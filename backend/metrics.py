@@ -0,0 +1,236 @@
+# metrics.py
+# Process-local performance metrics in Prometheus text format (served at /metrics,
+# to `Authorization: Bearer $METRICS_TOKEN` or the admin password).
+#
+#   http_request_duration_seconds   per route template + method + status (ASGI middleware)
+#   http_request_db_queries         SQL statements per request (SQLAlchemy cursor events)
+#   db_query_duration_seconds       every statement, in or out of a request
+#   fuzzy_match_seconds             medicine_index operations
+#   ai_model_request_seconds        Gemini calls per model and outcome
+#   telegram_send_seconds           outbound Telegram sendMessage calls
+#
+# No client library: a few histograms and a text renderer are all we need.
+# Slow-request sampler: with SLOW_REQUEST_MS set, a SLOW_PROFILE_RATE share of
+# requests runs under cProfile, and the profile of any that end up slower than
+# the threshold is written to SLOW_PROFILE_DIR (open with snakeviz/pstats).
+import contextvars
+import cProfile
+import os
+import pstats
+import random
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))  # 0 = sampler off
+SLOW_PROFILE_RATE = float(os.getenv("SLOW_PROFILE_RATE", "0.1"))
+SLOW_PROFILE_DIR = os.getenv("SLOW_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "ayurneeds-profiles"))
+SLOW_PROFILE_KEEP = int(os.getenv("SLOW_PROFILE_KEEP", "50"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+FAST_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    return ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.label_names, self.buckets = name, help, tuple(labels), tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, *label_values):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None: series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets): series[i] += 1
+            series[-2] += value; series[-1] += 1
+
+    @contextmanager
+    def time(self, *label_values):
+        started = time.perf_counter()
+        try: yield
+        finally: self.observe(time.perf_counter() - started, *label_values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock: series = {k: list(v) for k, v in self._series.items()}
+        for values, counts in sorted(series.items()):
+            base = _labels(self.label_names, values)
+            sep = "," if base else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {counts[-1]}')
+            braces = f"{{{base}}}" if base else ""
+            lines.append(f"{self.name}_sum{braces} {counts[-2]:.6f}")
+            lines.append(f"{self.name}_count{braces} {counts[-1]}")
+        return lines
+
+
+class Gauge:
+    """Read at scrape time from a callback returning {label tuple: value} or a number."""
+
+    def __init__(self, name, help, read, labels=()):
+        self.name, self.help, self.read, self.label_names = name, help, read, tuple(labels)
+        REGISTRY.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        try: values = self.read()
+        except Exception: return lines
+        if not isinstance(values, dict): values = {(): values}
+        for label_values, value in sorted(values.items()):
+            base = _labels(self.label_names, label_values)
+            lines.append(f"{self.name}{{{base}}} {value}" if base else f"{self.name} {value}")
+        return lines
+
+
+REGISTRY = []
+
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "Request latency by route template", ("method", "route", "status"))
+HTTP_DB_QUERIES = Histogram("http_request_db_queries", "SQL statements executed per request", ("route",), COUNT_BUCKETS)
+HTTP_DB_SECONDS = Histogram("http_request_db_seconds", "Time spent in SQL per request", ("route",))
+DB_QUERY = Histogram("db_query_duration_seconds", "Duration of individual SQL statements", (), FAST_BUCKETS)
+FUZZY = Histogram("fuzzy_match_seconds", "Fuzzy medicine matching", ("op",), FAST_BUCKETS)
+AI_MODEL = Histogram("ai_model_request_seconds", "Gemini calls by model and outcome", ("model", "outcome"))
+TELEGRAM = Histogram("telegram_send_seconds", "Outbound Telegram sendMessage calls", ("outcome",))
+
+
+def render():
+    lines = []
+    for metric in REGISTRY: lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+# ==========================================
+# 🗄️ SQL timing (SQLAlchemy cursor events)
+# ==========================================
+_request = contextvars.ContextVar("metrics_request", default=None)  # [queries, seconds] for the current request
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("metrics_started")
+    if not started: return
+    elapsed = time.perf_counter() - started.pop()
+    DB_QUERY.observe(elapsed)
+    current = _request.get()
+    if current is not None:
+        current[0] += 1; current[1] += elapsed
+
+
+def instrument_sqlalchemy():
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    # On the Engine class, so the async engine's sync_engine is covered as well
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ==========================================
+# 🔬 Slow-request sampler
+# ==========================================
+_profiler = contextvars.ContextVar("metrics_profiler", default=None)
+_profile_lock = threading.Lock()
+_loop_profiling = False  # one profiler per thread: concurrent requests aren't sampled while one is
+
+
+def _profile_in_worker_threads():
+    # cProfile only sees its own thread; sync endpoints run in Starlette's threadpool,
+    # so the threadpool entry point profiles those calls into the request's profile too
+    import fastapi.routing
+    original = fastapi.routing.run_in_threadpool
+    if getattr(original, "profiles_requests", False): return
+
+    async def run_in_threadpool(func, *args, **kwargs):
+        collected = _profiler.get()
+        if collected is None: return await original(func, *args, **kwargs)
+
+        def profiled(*a, **kw):
+            worker = cProfile.Profile()
+            try: return worker.runcall(func, *a, **kw)
+            finally: collected.append(worker)
+        return await original(profiled, *args, **kwargs)
+
+    run_in_threadpool.profiles_requests = True
+    fastapi.routing.run_in_threadpool = run_in_threadpool
+
+
+def _dump_profile(route, elapsed, profiles):
+    os.makedirs(SLOW_PROFILE_DIR, exist_ok=True)
+    stats = pstats.Stats(profiles[0])
+    for extra in profiles[1:]: stats.add(extra)
+    safe = route.strip("/").replace("/", "_").replace("{", "").replace("}", "") or "root"
+    path = os.path.join(SLOW_PROFILE_DIR, f"{int(time.time() * 1000)}-{safe}-{elapsed * 1000:.0f}ms.prof")
+    stats.dump_stats(path)
+    with _profile_lock:
+        dumps = sorted(os.listdir(SLOW_PROFILE_DIR))
+        for old in dumps[:-SLOW_PROFILE_KEEP]:
+            try: os.remove(os.path.join(SLOW_PROFILE_DIR, old))
+            except OSError: pass
+    print(f"🐢 Slow request {route} took {elapsed * 1000:.0f} ms, profile saved to {path}")
+
+
+# ==========================================
+# 📈 ASGI middleware
+# ==========================================
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+        instrument_sqlalchemy()
+        if SLOW_REQUEST_MS > 0: _profile_in_worker_threads()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http": return await self.app(scope, receive, send)
+
+        response = {"status": 500, "stream": False}
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["stream"] = any(k == b"content-type" and v.startswith(b"text/event-stream") for k, v in message.get("headers", ()))
+            await send(message)
+
+        db_stats = [0, 0.0]
+        db_token = _request.set(db_stats)
+        global _loop_profiling
+        profiles = None
+        if SLOW_REQUEST_MS > 0 and not _loop_profiling and random.random() < SLOW_PROFILE_RATE:
+            # The loop-thread profile also catches other requests' coroutines interleaved with this one
+            _loop_profiling = True
+            profiles = []
+            profile_token = _profiler.set(profiles)
+            loop_profile = cProfile.Profile(); loop_profile.enable()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request.reset(db_token)
+            if profiles is not None:
+                loop_profile.disable(); _profiler.reset(profile_token)
+                _loop_profiling = False
+            route = getattr(scope.get("route"), "path", None) or "unmatched"  # templates only: bounded label set
+            if not response["stream"]:  # SSE streams stay open for minutes by design
+                HTTP_LATENCY.observe(elapsed, scope["method"], route, response["status"])
+            HTTP_DB_QUERIES.observe(db_stats[0], route)
+            HTTP_DB_SECONDS.observe(db_stats[1], route)
+            if profiles is not None and elapsed * 1000 >= SLOW_REQUEST_MS:
+                try: _dump_profile(route, elapsed, [loop_profile] + profiles)
+                except Exception as e: print(f"⚠️ Could not save slow-request profile: {e}")
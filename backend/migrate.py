@@ -0,0 +1,16 @@
+# migrate.py
+# Explicit schema step for deployments that start with DB_AUTO_MIGRATE=0
+# (the default for the serverless profile). Run once per deploy:
+#   DATABASE_URL=postgresql://... python migrate.py
+# Creates missing tables and indexes; existing data is left alone. Data
+# backfills stay separate scripts (e.g. migrate_order_items.py).
+import os
+
+os.environ["DB_AUTO_MIGRATE"] = "0"  # main would otherwise run it during import too
+
+import main
+
+if __name__ == "__main__":
+    if main.engine is None: raise SystemExit("❌ No database engine")
+    main.create_schema()
+    print(f"✅ Schema up to date ({len(main.Base.metadata.sorted_tables)} tables)")
@@ -0,0 +1,56 @@
+# migrate_order_items.py
+# Backfills order_items from the legacy Prescription.extracted_medicines JSON.
+#   python migrate_order_items.py [--batch 500] [--dry-run]
+# Walks prescriptions by id in fixed-size batches, so memory stays flat however
+# big the table is. Prescriptions that already have items are skipped, which
+# makes the script safe to re-run or resume.
+import argparse
+import json
+import time
+
+from sqlalchemy import insert, exists
+
+from main import SessionLocal, Prescription, OrderItem, item_fields, stock_index
+
+
+def pending_batch(db, after_id, size):
+    has_items = exists().where(OrderItem.prescription_id == Prescription.id)
+    return (db.query(Prescription.id, Prescription.extracted_medicines, Prescription.created_at)
+            .filter(Prescription.id > after_id, ~has_items)
+            .order_by(Prescription.id).limit(size).all())
+
+
+def backfill(batch_size=500, dry_run=False):
+    db = SessionLocal()
+    index = stock_index(db)
+    last_id, done, items, skipped = 0, 0, 0, 0
+    started = time.perf_counter()
+    try:
+        while True:
+            batch = pending_batch(db, last_id, batch_size)
+            if not batch: break
+            rows = []
+            for pres_id, raw, created_at in batch:
+                try: medicines = json.loads(raw or "[]")
+                except ValueError:
+                    skipped += 1
+                    continue
+                for position, med in enumerate(m for m in medicines if isinstance(m, dict)):
+                    rows.append({**item_fields(med, position, index), "prescription_id": pres_id, "created_at": created_at})
+            if rows and not dry_run:
+                db.execute(insert(OrderItem), rows)  # executemany, one round trip per batch
+                db.commit()
+            last_id = batch[-1][0]
+            done += len(batch); items += len(rows)
+            print(f"📦 {done} prescriptions, {items} items ({done / (time.perf_counter() - started):.0f} prescriptions/s)")
+    finally:
+        db.close()
+    print(f"✅ Backfill finished: {done} prescriptions, {items} items, {skipped} unreadable{' (dry run)' if dry_run else ''}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    backfill(args.batch, args.dry_run)
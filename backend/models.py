@@ -1,55 +1,153 @@
 # backend/models.py
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+# Every table, in one place. Helper modules (routing, reservations, inventory_io,
+# ...) import their models from here rather than from main.
+from sqlalchemy import Column, Integer, Float, String, Text, LargeBinary, ForeignKey, DateTime, Index, func
 from sqlalchemy.orm import relationship
 from database import Base
-import uuid
 import datetime
 
-# 1. Doctor Table
+# ==========================================
+# 🗄️ DATABASE MODELS
+# ==========================================
 class Doctor(Base):
     __tablename__ = "doctors"
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String)
+    uuid_code = Column(String, unique=True, index=True)
+    phone = Column(String, nullable=True)
+    clinic_address = Column(String, nullable=True)
 
+class Prescription(Base):
+    __tablename__ = "prescriptions"
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True)
-    phone = Column(String, unique=True, index=True)
-    clinic_address = Column(String)
+    doctor_id = Column(Integer, ForeignKey("doctors.id"))
+    patient_phone = Column(String)
+    image_url = Column(String)
+    extracted_medicines = Column(Text)
     
-    # Auto-generate a unique link code (e.g., 550e8400-e29b...)
-    uuid_code = Column(String, unique=True, default=lambda: str(uuid.uuid4()))
+    # Patient Order Fields
+    patient_name = Column(String, nullable=True)
+    address = Column(String, nullable=True) 
+    payment_mode = Column(String, nullable=True)
+    status = Column(String, default="Pending Approval")
+    total_amount = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    doctor = relationship("Doctor")
+    items = relationship("OrderItem", order_by="OrderItem.position", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        Index("ix_prescriptions_status_created", status, created_at),  # admin dashboard filters
+    )
 
-# 2. Pharmacy Table
 class Pharmacy(Base):
     __tablename__ = "pharmacies"
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String)
+    location = Column(String)
 
+class PharmacyStock(Base):
+    __tablename__ = "pharmacy_stock"
     id = Column(Integer, primary_key=True, index=True)
-    store_name = Column(String, index=True)
-    phone = Column(String)
+    pharmacy_id = Column(Integer, ForeignKey("pharmacies.id"), index=True)
+    medicine_name = Column(String)
+    qty = Column(Integer)
+    price = Column(Integer)
+    image_url = Column(String, default="default.jpg") 
     
-    # We store the inventory list as a simple Text/String (JSON format)
-    # Example: '{"Ashwagandha": 10, "Triphala": 5}'
-    inventory_data = Column(String, default="{}")
+    pharmacy = relationship("Pharmacy")
 
-# 3. Prescription Table (For Patient App & Order History)
-class Prescription(Base):
-    __tablename__ = "prescriptions"
+    # Keyset pagination walks (sort column, id). Prefix search is lower(name) LIKE 'x%':
+    # on Postgres with a non-C collation only a text_pattern_ops index can serve that
+    __table_args__ = (
+        Index("ix_pharmacy_stock_name_id", medicine_name, id),
+        Index("ix_pharmacy_stock_price_id", price, id),
+        Index("ix_pharmacy_stock_name_prefix", func.lower(medicine_name).label("name_lower"),
+              postgresql_ops={"name_lower": "text_pattern_ops"}),
+    )
 
+class OrderItem(Base):
+    # One row per medicine line; replaces parsing Prescription.extracted_medicines
+    __tablename__ = "order_items"
     id = Column(Integer, primary_key=True, index=True)
-    
-    # Link to the Doctor who uploaded it
-    doctor_id = Column(Integer, ForeignKey("doctors.id"))
-    
-    # The patient's phone number (used for Login)
-    patient_phone = Column(String, index=True)
-    
-    # Name of the image file stored in 'uploads' folder
-    image_url = Column(String)
-    
-    # List of medicines found by AI (stored as JSON string)
-    # Example: '["Ashwagandha", "Brahmi"]'
-    extracted_medicines = Column(String) 
-    
-    # Order Status (Pending, Ready to Order, Completed)
-    status = Column(String, default="Pending")
-    
-    # Timestamp
-    created_at = Column(DateTime, default=datetime.datetime.utcnow)
\ No newline at end of file
+    prescription_id = Column(Integer, ForeignKey("prescriptions.id", ondelete="CASCADE"), nullable=False, index=True)
+    stock_id = Column(Integer, ForeignKey("pharmacy_stock.id", ondelete="SET NULL"), nullable=True, index=True)
+    position = Column(Integer, default=0)
+    medicine_name = Column(String)
+    original_name = Column(String, nullable=True)
+    qty = Column(Integer, default=1)
+    qty_label = Column(String, nullable=True)  # free-text qty from the doctor/AI, e.g. "Standard"
+    price = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_order_items_name_created", medicine_name, created_at),
+        Index("ix_order_items_created", created_at),
+    )
+
+class CompletedOrder(Base):
+    __tablename__ = "completed_orders"
+    id = Column(Integer, primary_key=True, index=True)
+    original_pres_id = Column(Integer)  # unique: one sale per prescription, even under double-approve
+    customer_name = Column(String)
+    phone_number = Column(String)
+    address = Column(String)
+    medicines_json = Column(Text)
+    total_amount = Column(Integer)
+    transaction_id = Column(String)
+    order_date = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index("uq_completed_orders_original_pres_id", original_pres_id, unique=True),
+        Index("ix_completed_orders_order_date", order_date),
+    )
+
+class MedicineAlias(Base):
+    # Written name -> stock name pairs: admin-confirmed, or suggested by approved orders (see aliases.py)
+    __tablename__ = "medicine_aliases"
+    alias = Column(String, primary_key=True)  # aliases.key() of the written name
+    name = Column(String, nullable=False)
+    source = Column(String, default="admin")
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class IdempotencyKey(Base):
+    # Claimed keys and stored responses for Idempotency-Key retries (see idempotency.py)
+    __tablename__ = "idempotency_keys"
+    key = Column(String(64), primary_key=True)  # sha256 of path + client key
+    fingerprint = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=True)  # NULL while the first request is still running
+    content_type = Column(String, nullable=True)
+    body = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class RateLimitBucket(Base):
+    # Token buckets when RATE_LIMIT_BACKEND=database (see ratelimit.py)
+    __tablename__ = "rate_limit_buckets"
+    key = Column(String, primary_key=True)
+    tokens = Column(Float, nullable=False)
+    updated = Column(Float, nullable=False)  # unix time
+
+class DailySales(Base):
+    # Materialized per-day totals of completed_orders, refreshed incrementally (see dashboard.py)
+    __tablename__ = "daily_sales"
+    day = Column(String, primary_key=True)  # YYYY-MM-DD (UTC)
+    orders = Column(Integer, default=0)
+    revenue = Column(Integer, default=0)
+    refreshed_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class StockReservation(Base):
+    # Units taken out of PharmacyStock while a payment is being verified (see reservations.py)
+    __tablename__ = "stock_reservations"
+    id = Column(Integer, primary_key=True, index=True)
+    prescription_id = Column(Integer, ForeignKey("prescriptions.id", ondelete="CASCADE"), nullable=False, index=True)
+    stock_id = Column(Integer, ForeignKey("pharmacy_stock.id", ondelete="CASCADE"), nullable=False)
+    qty = Column(Integer, nullable=False)
+    status = Column(String, default="held")  # held -> committed | released
+    expires_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_stock_reservations_status_expires", status, expires_at),
+        Index("ix_stock_reservations_stock_status", stock_id, status),  # held units per SKU (inventory import)
+    )
@@ -0,0 +1,157 @@
+# notifier.py
+# Telegram outbox: handlers enqueue alerts and return immediately; one
+# background thread delivers them over a pooled session.
+#
+# - Retries with exponential backoff (and honours Telegram's retry_after on 429)
+# - Per-chat pacing: Telegram allows roughly one message per second per chat
+# - Messages sharing a `group` key that arrive within COALESCE_WINDOW are sent
+#   as a single message (background mode only)
+#
+# On the serverless profile (or TELEGRAM_SYNC=1) there is no background thread:
+# an instance can be frozen or recycled as soon as the response is out, taking
+# any queued alert with it, so each alert is delivered before enqueue() returns.
+# Request threads never sleep there: no per-chat pacing, and a few immediate
+# retries instead of backoff. Callers send one combined message per request.
+import os
+import queue
+import threading
+import time
+
+import database
+import metrics
+
+TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org")
+
+MAX_ATTEMPTS = int(os.getenv("TELEGRAM_MAX_ATTEMPTS", "5"))
+PER_CHAT_INTERVAL = float(os.getenv("TELEGRAM_CHAT_INTERVAL", "1.05"))
+COALESCE_WINDOW = float(os.getenv("TELEGRAM_COALESCE_WINDOW", "1.0"))
+SYNC = os.getenv("TELEGRAM_SYNC", "1" if database.DB_PROFILE == "serverless" else "0") == "1"
+SYNC_ATTEMPTS = int(os.getenv("TELEGRAM_SYNC_ATTEMPTS", "3"))
+MAX_MESSAGE_CHARS = 4096
+
+
+class Alert:
+    def __init__(self, text, chat_id, group=None, parse_mode="Markdown"):
+        self.text, self.chat_id, self.group, self.parse_mode = text, chat_id, group, parse_mode
+        self.attempts = 0
+        self.ready_at = time.monotonic() + (COALESCE_WINDOW if group else 0)
+
+
+class Dispatcher:
+    def __init__(self, token=None, api_base=TELEGRAM_API_BASE, sync=SYNC):
+        self.token, self.api_base, self.sync = token, api_base, sync
+        self._queue = queue.Queue()
+        self._session = None  # created on first delivery, keeps requests off the import path
+        self._last_sent = {}  # chat_id -> monotonic time of last delivery
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.sent = self.failed = 0
+
+    def enqueue(self, text, chat_id, group=None, parse_mode="Markdown"):
+        if not self.token or not chat_id: return
+        alert = Alert(text, chat_id, group, parse_mode)
+        if self.sync: return self._send_now(alert)
+        self._ensure_worker()
+        self._queue.put(alert)
+
+    def _send_now(self, alert):
+        while not self._deliver(alert, max_attempts=SYNC_ATTEMPTS, pace=False): pass
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _ensure_worker(self):
+        if self._thread and self._thread.is_alive(): return
+        with self._start_lock:
+            if self._thread and self._thread.is_alive(): return
+            self._thread = threading.Thread(target=self._run, name="telegram-outbox", daemon=True)
+            self._thread.start()
+
+    # --- Worker ---
+    def _run(self):
+        waiting = []  # alerts held for coalescing or backoff
+        while True:
+            timeout = max(0.0, min(a.ready_at for a in waiting) - time.monotonic()) if waiting else None
+            try:
+                waiting.append(self._queue.get(timeout=timeout))
+                while True: waiting.append(self._queue.get_nowait())  # drain whatever else arrived
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            due = [a for a in waiting if a.ready_at <= now]
+            waiting = [a for a in waiting if a.ready_at > now]
+            for alert in self._coalesce(due, waiting):
+                if not self._deliver(alert): waiting.append(alert)
+
+    def _coalesce(self, due, waiting):
+        merged, by_group = [], {}
+        for alert in due:
+            key = (alert.chat_id, alert.group)
+            if alert.group and key in by_group and len(by_group[key].text) + len(alert.text) < MAX_MESSAGE_CHARS:
+                by_group[key].text += "\n\n" + alert.text
+                continue
+            if alert.group: by_group[key] = alert
+            merged.append(alert)
+        # A grouped alert still waiting for its window joins its due sibling instead
+        for alert in list(waiting):
+            head = by_group.get((alert.chat_id, alert.group))
+            if alert.group and head and alert.attempts == 0 and len(head.text) + len(alert.text) < MAX_MESSAGE_CHARS:
+                head.text += "\n\n" + alert.text
+                waiting.remove(alert)
+        return merged
+
+    def _deliver(self, alert, max_attempts=MAX_ATTEMPTS, pace=True):
+        """True when finished with the alert (sent or given up), False to retry later."""
+        gap = PER_CHAT_INTERVAL - (time.monotonic() - self._last_sent.get(alert.chat_id, 0))
+        if pace and gap > 0: time.sleep(gap)
+
+        alert.attempts += 1
+        retry_after = None
+        if self._session is None:
+            with self._start_lock:  # sync mode: request threads share one session
+                if self._session is None:
+                    import requests
+                    self._session = requests.Session()
+        started = time.perf_counter()
+        try:
+            # 🛡️ Disable web preview so Telegram doesn't auto-click links
+            response = self._session.post(f"{self.api_base}/bot{self.token}/sendMessage", data={
+                "chat_id": alert.chat_id,
+                "text": alert.text,
+                "parse_mode": alert.parse_mode,
+                "disable_web_page_preview": True
+            }, timeout=(5, 15))
+            metrics.TELEGRAM.observe(time.perf_counter() - started, "ok" if response.ok else str(response.status_code))
+            self._last_sent[alert.chat_id] = time.monotonic()
+            if response.ok:
+                self.sent += 1
+                return True
+            if response.status_code == 429:
+                try: retry_after = response.json().get("parameters", {}).get("retry_after")
+                except ValueError: pass
+            elif response.status_code < 500:
+                # Bad request (e.g. broken Markdown) won't fix itself
+                print(f"Telegram Error {response.status_code}: {response.text}")
+                self.failed += 1
+                return True
+        except Exception as e:
+            metrics.TELEGRAM.observe(time.perf_counter() - started, "exception")
+            print(f"Telegram Error: {e}")
+
+        if alert.attempts >= max_attempts:
+            print(f"Telegram: dropping alert after {alert.attempts} attempts")
+            self.failed += 1
+            return True
+        alert.ready_at = time.monotonic() + (retry_after or min(60, 2 ** alert.attempts))
+        return False
+
+
+dispatcher = Dispatcher(TELEGRAM_BOT_TOKEN)
+
+
+def send_telegram_alert(message, group=None, chat_id=None):
+    """Queue an admin alert (delivered before returning in sync mode, see above)."""
+    dispatcher.enqueue(message, chat_id or TELEGRAM_CHAT_ID, group=group)
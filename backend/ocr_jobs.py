@@ -0,0 +1,96 @@
+# ocr_jobs.py
+# Background queue for prescription OCR.
+#
+# analyze_prescription() blocks on Gemini for up to tens of seconds, so uploads
+# hand the image to a bounded thread pool and return straight away. The job id
+# is the Prescription id, which lets any worker answer status lookups from the DB.
+# A job lost with its process (restart, frozen lambda) leaves its Prescription in
+# "Processing"; main.recover_stuck_ocr() hands those over after OCR_STUCK_MINUTES.
+# Past OCR_MAX_PENDING queued/running jobs, uploads are turned away (saturated())
+# instead of piling up behind Gemini until they time out.
+#
+# On the serverless profile (or OCR_INLINE=1) there is no pool: an instance can be
+# frozen as soon as the response is out, stalling the job until it is recovered
+# without its AI medicines, so submit() runs the job before returning.
+import math
+import os
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "4"))
+OCR_MAX_PENDING = int(os.getenv("OCR_MAX_PENDING", str(OCR_WORKERS * 8)))
+OCR_INLINE = os.getenv("OCR_INLINE", "1" if database.DB_PROFILE == "serverless" else "0") == "1"
+
+_pool = ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix="ocr")
+_lock = threading.Lock()
+_jobs = {}  # job_id -> {"state", "submitted", "started", "finished", "error"}
+MAX_TRACKED_JOBS = 1000
+_durations = deque(maxlen=50)  # seconds per recent job, for Retry-After estimates
+
+
+def submit(job_id, image_bytes, on_done):
+    """Queue OCR for `image_bytes`; `on_done(job_id, medicines)` runs on the worker (inline: the caller)."""
+    with _lock:
+        if len(_jobs) >= MAX_TRACKED_JOBS:
+            # Forget the oldest finished jobs, the DB still has their outcome
+            for old_id in [j for j, info in _jobs.items() if info["state"] in ("done", "failed")][:MAX_TRACKED_JOBS // 2]:
+                del _jobs[old_id]
+        _jobs[job_id] = {"state": "queued", "submitted": time.time(), "finished": None, "error": None}
+    if OCR_INLINE: _run(job_id, image_bytes, on_done)
+    else: _pool.submit(_run, job_id, image_bytes, on_done)
+    return job_id
+
+
+def _run(job_id, image_bytes, on_done):
+    _update(job_id, state="running", started=time.time())
+    error = None
+    try:
+        import ai_engine  # first OCR job pays for requests/Pillow, not every cold start
+        medicines = ai_engine.analyze_prescription(image_bytes)
+    except Exception as e: medicines, error = [], str(e)
+    try:
+        # Always report back, so the Prescription never stays stuck in "Processing"
+        on_done(job_id, medicines if isinstance(medicines, list) else [])
+    except Exception as e:
+        traceback.print_exc()
+        error = error or str(e)
+    finished = time.time()
+    _update(job_id, state="failed" if error else "done", finished=finished, error=error)
+    started = (get(job_id) or {}).get("started")
+    if started: _durations.append(finished - started)
+
+
+def _update(job_id, **fields):
+    with _lock:
+        if job_id in _jobs: _jobs[job_id].update(fields)
+
+
+def get(job_id):
+    with _lock:
+        info = _jobs.get(job_id)
+        return dict(info) if info else None
+
+
+def active(job_id):
+    """True while this process has the job queued or running."""
+    return (get(job_id) or {}).get("state") in ("queued", "running")
+
+
+def pending():
+    with _lock:
+        return sum(1 for info in _jobs.values() if info["state"] in ("queued", "running"))
+
+
+def saturated():
+    return pending() >= OCR_MAX_PENDING
+
+
+def retry_after():
+    """Seconds until the backlog has roughly drained (recent job time x queue depth / workers)."""
+    average = sum(_durations) / len(_durations) if _durations else 10
+    return max(1, math.ceil(average * pending() / OCR_WORKERS))
@@ -0,0 +1,125 @@
+# order_events.py
+# Pub/sub for prescription status changes, feeding the SSE stream in main.py.
+#
+# Handlers call publish(pres_id, status) after committing. Subscribers are
+# asyncio queues owned by open /order-status-stream connections.
+#   ORDER_EVENTS_BROKER=memory   (default) single process
+#   ORDER_EVENTS_BROKER=postgres  LISTEN/NOTIFY, so every worker sees every change
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+CHANNEL = "order_status"
+
+
+class MemoryBroker:
+    """In-process fan-out. Safe to publish from threadpool handlers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)  # pres_id -> {(loop, queue)}
+
+    def subscribe(self, pres_id):
+        queue = asyncio.Queue(maxsize=16)
+        with self._lock:
+            self._subscribers[pres_id].add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, pres_id, queue):
+        with self._lock:
+            subs = self._subscribers.get(pres_id, set())
+            subs.difference_update({s for s in subs if s[1] is queue})
+            if not subs: self._subscribers.pop(pres_id, None)
+
+    def publish(self, pres_id, status):
+        self.deliver(pres_id, status)
+
+    def deliver(self, pres_id, status):
+        event = {"pres_id": pres_id, "status": status}
+        with self._lock:
+            targets = list(self._subscribers.get(pres_id, ()))
+        for loop, queue in targets:
+            loop.call_soon_threadsafe(_offer, queue, event)
+
+
+def _offer(queue, event):
+    # A slow client only ever needs the latest status
+    if queue.full():
+        try: queue.get_nowait()
+        except asyncio.QueueEmpty: pass
+    queue.put_nowait(event)
+
+
+class PostgresBroker(MemoryBroker):
+    """Publishes with pg_notify; one LISTEN thread per process fans out locally."""
+
+    def __init__(self, engine):
+        super().__init__()
+        self.engine = engine
+        self._listener = None
+
+    def subscribe(self, pres_id):
+        self._ensure_listener()
+        return super().subscribe(pres_id)
+
+    def publish(self, pres_id, status):
+        from sqlalchemy import text
+        payload = json.dumps({"pres_id": pres_id, "status": status})
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": payload})
+        except Exception as e:
+            print(f"⚠️ Order event NOTIFY failed, delivering locally: {e}")
+            self.deliver(pres_id, status)
+
+    def _ensure_listener(self):
+        if self._listener and self._listener.is_alive(): return
+        with self._lock:
+            if self._listener and self._listener.is_alive(): return
+            self._listener = threading.Thread(target=self._listen, name="order-events-listen", daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        import select
+        while True:
+            raw = None
+            try:
+                raw = self.engine.raw_connection()
+                conn = raw.driver_connection
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {CHANNEL}")
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []): continue
+                    conn.poll()
+                    while conn.notifies:
+                        note = conn.notifies.pop(0)
+                        event = json.loads(note.payload)
+                        self.deliver(event["pres_id"], event["status"])
+            except Exception as e:
+                print(f"⚠️ Order event listener reconnecting: {e}")
+                if raw is not None:
+                    try: raw.close()
+                    except Exception: pass
+                time.sleep(5)
+
+
+def make_broker(engine=None):
+    kind = os.getenv("ORDER_EVENTS_BROKER", "memory")
+    if kind == "postgres" and engine is not None and engine.dialect.name == "postgresql":
+        return PostgresBroker(engine)
+    return MemoryBroker()
+
+
+broker = MemoryBroker()
+
+
+def configure(engine):
+    global broker
+    broker = make_broker(engine)
+
+
+def publish(pres_id, status):
+    broker.publish(pres_id, status)
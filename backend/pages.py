@@ -0,0 +1,90 @@
+# pages.py
+# Server-rendered admin pages (the ones opened from Telegram links).
+#
+#   templates/   Jinja2, autoescaped, compiled once per process; the bytecode
+#                cache on disk lets new workers skip the compile step too
+#   static/      shared CSS, served with a content-hash URL and a one-year
+#                immutable Cache-Control, so pages no longer inline it
+#
+# Result pages whose text is fully determined by their arguments (message()) are
+# kept in a small LRU (render(..., cache_key=...)) and skip templating entirely.
+# Pages built from Prescription rows are always rendered: their fields change.
+import hashlib
+import mimetypes
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_DIR = os.path.join(HERE, "templates")
+STATIC_DIR = os.path.join(HERE, "static")
+BYTECODE_DIR = os.getenv("TEMPLATE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ayurneeds-jinja"))
+FRAGMENT_CACHE_SIZE = int(os.getenv("PAGE_CACHE_SIZE", "500"))
+STATIC_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_env = None
+_env_lock = threading.Lock()
+_fragments = OrderedDict()
+_fragments_lock = threading.Lock()
+_assets = {}
+
+
+def environment():
+    # Built on first render: jinja2 stays off the cold-start import path
+    global _env
+    if _env is None:
+        with _env_lock:
+            if _env is None:
+                from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+                try:
+                    os.makedirs(BYTECODE_DIR, exist_ok=True)
+                    bytecode_cache = FileSystemBytecodeCache(BYTECODE_DIR)
+                except OSError:
+                    bytecode_cache = None  # read-only filesystem: compile in memory only
+                env = Environment(loader=FileSystemLoader(TEMPLATE_DIR), autoescape=True, bytecode_cache=bytecode_cache,
+                                  auto_reload=os.getenv("TEMPLATE_RELOAD", "0") == "1", trim_blocks=True, lstrip_blocks=True)
+                env.globals["asset_url"] = asset_url
+                _env = env
+    return _env
+
+
+def render(name, cache_key=None, **context):
+    """Render templates/<name>; with a cache_key the HTML is reused (only for pages that can't change)."""
+    if cache_key is not None:
+        key = (name, cache_key)
+        with _fragments_lock:
+            html = _fragments.get(key)
+            if html is not None:
+                _fragments.move_to_end(key)
+                return html
+    html = environment().get_template(name).render(**context)
+    if cache_key is not None:
+        with _fragments_lock:
+            _fragments[key] = html
+            while len(_fragments) > FRAGMENT_CACHE_SIZE: _fragments.popitem(last=False)
+    return html
+
+
+def message(heading, *lines, tone="ok", cache=True):
+    return render("message.html", cache_key=(heading, tone) + lines if cache else None, heading=heading, lines=lines, tone=tone)
+
+
+# ==========================================
+# 🎨 Static assets
+# ==========================================
+def asset(name):
+    """(body, etag, media type) for static/<name>, read once; None if it doesn't exist."""
+    if name not in _assets:
+        path = os.path.join(STATIC_DIR, os.path.basename(name))
+        if not os.path.isfile(path): return None
+        with open(path, "rb") as f: body = f.read()
+        digest = hashlib.sha1(body).hexdigest()[:12]
+        _assets[name] = (body, digest, mimetypes.guess_type(path)[0] or "application/octet-stream")
+    return _assets[name]
+
+
+def asset_url(name):
+    # The hash in the query string changes with the file, so the year-long cache is safe
+    found = asset(name)
+    return f"/static/{name}?v={found[1]}" if found else f"/static/{name}"
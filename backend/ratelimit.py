@@ -0,0 +1,227 @@
+# ratelimit.py
+# Token-bucket rate limits for the endpoints that cost us Gemini quota or
+# Telegram messages (prescription upload, store checkout, contact form).
+#
+# Each rule limits one key per request (doctor UUID from the path, phone from
+# the JSON body, or client IP) to N requests per period, with bursts up to N.
+# Over the limit a request gets 429 with Retry-After before any handler runs.
+# Phone rules read the JSON body; one past RATE_LIMIT_MAX_BODY_KB gets a 413.
+#
+# Buckets live in a store:
+#   memory     (default) per process: fine for one server, approximate when
+#              serverless instances come and go
+#   database   rate_limit_buckets table, shared by every worker and lambda
+#   mod:attr   any object with take(key, rate, burst) -> (allowed, retry_after)
+#              e.g. a Redis-backed store; or call set_store() at startup
+#
+# When several rules match and a later one rejects the request, the tokens the
+# earlier ones took are handed back (give_back(key, burst), if the store has it).
+import importlib
+import json
+import math
+import os
+import re
+import threading
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+import buffered_body
+import database
+from models import RateLimitBucket
+
+ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+# Behind Vercel's proxy every request comes from the proxy; the client is in X-Forwarded-For
+TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "1" if database.DB_PROFILE == "serverless" else "0") == "1"
+MAX_BUCKETS = int(os.getenv("RATE_LIMIT_MAX_BUCKETS", "100000"))
+MAX_BODY_BYTES = int(os.getenv("RATE_LIMIT_MAX_BODY_KB", "64")) * 1024  # checkout/contact JSON read for the phone key
+
+PERIODS = {"s": 1, "sec": 1, "second": 1, "min": 60, "minute": 60, "h": 3600, "hour": 3600, "day": 86400}
+
+
+def parse_limit(text):
+    """"30/hour" -> (tokens per second, burst)."""
+    count, _, period = text.partition("/")
+    count = int(count)
+    return count / PERIODS[period.strip() or "min"], count
+
+
+class Rule:
+    __slots__ = ("name", "path", "key", "rate", "burst")
+
+    def __init__(self, name, path, key, limit):
+        self.name, self.path, self.key = name, re.compile(path), key
+        self.rate, self.burst = parse_limit(limit)
+
+
+RULES = [
+    Rule("upload:doctor", r"^/upload-prescription/(?P<doctor>[^/]+)$", "doctor", os.getenv("RATE_LIMIT_UPLOAD_DOCTOR", "30/hour")),
+    Rule("upload:ip", r"^/upload-prescription/", "ip", os.getenv("RATE_LIMIT_UPLOAD_IP", "60/hour")),
+    Rule("checkout:phone", r"^/store/checkout$", "phone", os.getenv("RATE_LIMIT_CHECKOUT_PHONE", "10/hour")),
+    Rule("checkout:ip", r"^/store/checkout$", "ip", os.getenv("RATE_LIMIT_CHECKOUT_IP", "30/hour")),
+    Rule("contact:phone", r"^/contact-us$", "phone", os.getenv("RATE_LIMIT_CONTACT_PHONE", "5/hour")),
+    Rule("contact:ip", r"^/contact-us$", "ip", os.getenv("RATE_LIMIT_CONTACT_IP", "10/hour")),
+]
+
+
+# ==========================================
+# 🪣 Stores
+# ==========================================
+class MemoryStore:
+    def __init__(self, max_buckets=MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._buckets = {}  # key -> [tokens, updated, rate, burst]
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_buckets: self._prune(now)
+                bucket = self._buckets[key] = [burst, now, rate, burst]
+            tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if tokens >= 1:
+                bucket[0] = tokens - 1
+                return True, 0
+            bucket[0] = tokens
+            return False, (1 - tokens) / rate
+
+    def give_back(self, key, burst):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None: bucket[0] = min(burst, bucket[0] + 1)
+
+    def _prune(self, now):
+        # A bucket that has refilled completely (at its own rule's rate) is the same as no bucket
+        full = [k for k, (tokens, updated, rate, burst) in self._buckets.items() if tokens + (now - updated) * rate >= burst]
+        for k in full: del self._buckets[k]
+        if len(self._buckets) >= self.max_buckets:
+            # Still full of active clients: forget the least recently seen tenth
+            stale = sorted(self._buckets, key=lambda k: self._buckets[k][1])[:max(1, self.max_buckets // 10)]
+            for k in stale: del self._buckets[k]
+
+
+class DatabaseStore:
+    """Buckets in rate_limit_buckets, so limits hold across workers and serverless instances."""
+
+    def take(self, key, rate, burst, now=None):
+        from sqlalchemy.exc import IntegrityError
+        now = time.time() if now is None else now
+        db = database.SessionLocal()
+        try:
+            for _ in range(2):
+                row = db.query(RateLimitBucket).filter(RateLimitBucket.key == key).with_for_update().first()
+                tokens = burst if row is None else min(burst, row.tokens + (now - row.updated) * rate)
+                allowed = tokens >= 1
+                if allowed: tokens -= 1
+                if row is None: db.add(RateLimitBucket(key=key, tokens=tokens, updated=now))
+                else: row.tokens, row.updated = tokens, now
+                try:
+                    db.commit()
+                    return allowed, 0 if allowed else (1 - tokens) / rate
+                except IntegrityError:
+                    db.rollback()  # another worker created the bucket first; read it again
+            return True, 0
+        finally:
+            db.close()
+
+    def give_back(self, key, burst):
+        db = database.SessionLocal()
+        try:
+            row = db.query(RateLimitBucket).filter(RateLimitBucket.key == key).with_for_update().first()
+            if row is not None:
+                row.tokens = min(burst, row.tokens + 1)
+                db.commit()
+        finally:
+            db.close()
+
+
+def _load_store(name):
+    if name == "memory": return MemoryStore()
+    if name == "database": return DatabaseStore()
+    module, _, attr = name.partition(":")
+    store = getattr(importlib.import_module(module), attr)
+    return store() if isinstance(store, type) else store
+
+
+store = _load_store(BACKEND)
+
+
+def set_store(new_store):
+    global store
+    store = new_store
+
+
+# ==========================================
+# 🚦 ASGI middleware
+# ==========================================
+def client_ip(scope, headers):
+    if TRUST_PROXY:
+        forwarded = headers.get(b"x-forwarded-for") or headers.get(b"x-real-ip")
+        if forwarded: return forwarded.decode().split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def phone_of(body):
+    try: phone = json.loads(body or b"{}").get("phone")
+    except (ValueError, AttributeError): return None
+    digits = re.sub(r"\D", "", str(phone or ""))
+    return digits[-10:] or None  # "+91 98765-43210" and "9876543210" are the same patient
+
+
+async def _respond(send, status, detail, headers=()):
+    body = json.dumps({"detail": detail}).encode()
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *headers]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _reject(send, retry_after):
+    seconds = max(1, math.ceil(retry_after))
+    await _respond(send, 429, f"Too many requests. Please try again in {seconds} seconds.",
+                   [(b"retry-after", str(seconds).encode())])
+
+
+class RateLimitMiddleware:
+    def __init__(self, app, rules=RULES):
+        self.app, self.rules = app, rules
+
+    async def __call__(self, scope, receive, send):
+        if not ENABLED or scope["type"] != "http" or scope["method"] != "POST":
+            return await self.app(scope, receive, send)
+        matched = [(rule, m) for rule in self.rules if (m := rule.path.match(scope["path"]))]
+        if not matched: return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        body = None
+        if any(rule.key == "phone" for rule, _ in matched):
+            # JSON bodies of these endpoints are small; read once and hand the same bytes on
+            try: body = await buffered_body.read(headers, receive, MAX_BODY_BYTES)
+            except buffered_body.TooLarge: return await _respond(send, 413, "Request body too large")
+            if body is None: return
+
+        keys = []
+        for rule, m in matched:
+            if rule.key == "doctor": value = m.group("doctor")
+            elif rule.key == "phone": value = phone_of(body)
+            else: value = client_ip(scope, headers)
+            if value: keys.append((rule, f"{rule.name}:{value}"))
+
+        local = isinstance(store, MemoryStore)
+        for taken, (rule, key) in enumerate(keys):
+            if local: allowed, retry_after = store.take(key, rule.rate, rule.burst)
+            else: allowed, retry_after = await run_in_threadpool(store.take, key, rule.rate, rule.burst)
+            if not allowed:
+                # The request never runs, so the rules before this one shouldn't be charged for it
+                give_back = getattr(store, "give_back", None)
+                for earlier, earlier_key in keys[:taken] if give_back else ():
+                    if local: give_back(earlier_key, earlier.burst)
+                    else: await run_in_threadpool(give_back, earlier_key, earlier.burst)
+                return await _reject(send, retry_after)
+
+        if body is None: return await self.app(scope, receive, send)
+        await self.app(scope, buffered_body.replay(body, receive), send)
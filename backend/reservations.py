@@ -0,0 +1,163 @@
+# reservations.py
+# Stock holds for orders awaiting payment verification.
+#
+#   hold()    at confirm-order / store checkout: takes stock with a single
+#             conditional UPDATE per line (qty = qty - n WHERE qty >= n), so two
+#             checkouts can never both get the last unit
+#   commit()  when the admin approves the payment: holds become final
+#   release() on decline, re-checkout, or expiry: stock goes back
+#
+# Stock rows with no qty (legacy rows from before stock was tracked) are not
+# held at all. Expired holds are swept by a background thread, and also inside
+# hold() at most once per SWEEP_SECONDS, for serverless deployments where
+# threads don't survive.
+import datetime
+import os
+import threading
+import time
+
+from sqlalchemy import select, update
+
+from database import SessionLocal
+from models import PharmacyStock, StockReservation
+
+HOLD_MINUTES = int(os.getenv("RESERVATION_HOLD_MINUTES", "30"))
+SWEEP_SECONDS = int(os.getenv("RESERVATION_SWEEP_SECONDS", "60"))
+
+
+class OutOfStock(Exception):
+    def __init__(self, names):
+        super().__init__(f"Out of stock: {', '.join(names)}")
+        self.names = names
+
+
+def _moved(db, stock_id, delta):
+    # Applied to the routing table once the caller commits (main._publish_catalog_changes)
+    deltas = db.info.setdefault("stock_deltas", {})
+    deltas[stock_id] = deltas.get(stock_id, 0) + delta
+
+
+def _take(db, stock_id, qty):
+    result = db.execute(update(PharmacyStock)
+                        .where(PharmacyStock.id == stock_id, PharmacyStock.qty >= qty)
+                        .values(qty=PharmacyStock.qty - qty)
+                        .execution_options(synchronize_session=False))
+    if result.rowcount == 1:
+        _moved(db, stock_id, -qty)
+        return True
+    untracked = db.scalar(select(PharmacyStock.id).where(PharmacyStock.id == stock_id, PharmacyStock.qty.is_(None)))
+    return None if untracked else False
+
+
+def _give_back(db, reservation_id, stock_id, qty):
+    # Flip the status first: only the caller that wins the flip returns the units
+    flipped = db.execute(update(StockReservation)
+                         .where(StockReservation.id == reservation_id, StockReservation.status == "held")
+                         .values(status="released")
+                         .execution_options(synchronize_session=False))
+    if flipped.rowcount != 1: return False
+    db.execute(update(PharmacyStock).where(PharmacyStock.id == stock_id)
+               .values(qty=PharmacyStock.qty + qty).execution_options(synchronize_session=False))
+    _moved(db, stock_id, qty)
+    return True
+
+
+def hold(db, pres, strict=True):
+    """Reserve every stock-linked line of `pres`. Caller commits.
+
+    strict=True raises OutOfStock on the first shortage report; the caller
+    rolls back, which also undoes the lines already taken. strict=False skips
+    short lines and returns their names.
+    """
+    _ensure_sweeper()
+    _sweep_if_due(db)
+    release(db, pres.id)  # a re-submitted order replaces its previous holds
+    expires = datetime.datetime.utcnow() + datetime.timedelta(minutes=HOLD_MINUTES)
+    short = []
+    for item in pres.items:
+        if not item.stock_id or not item.qty or item.qty <= 0: continue
+        taken = _take(db, item.stock_id, item.qty)
+        if taken is None: continue  # qty not tracked for this row
+        if taken:
+            db.add(StockReservation(prescription_id=pres.id, stock_id=item.stock_id, qty=item.qty, expires_at=expires))
+        else:
+            short.append(item.medicine_name)
+    if short and strict: raise OutOfStock(short)
+    return short
+
+
+def release(db, pres_id):
+    held = (db.query(StockReservation.id, StockReservation.stock_id, StockReservation.qty)
+            .filter(StockReservation.prescription_id == pres_id, StockReservation.status == "held").all())
+    return sum(_give_back(db, r.id, r.stock_id, r.qty) for r in held)
+
+
+def commit(db, pres):
+    """Finalize holds for an approved order. Returns names that could not be covered.
+
+    If the holds already expired, the stock is taken again (best effort): the
+    payment is real, so the order goes through and the admin sees the shortage.
+    """
+    committed = db.execute(update(StockReservation)
+                           .where(StockReservation.prescription_id == pres.id, StockReservation.status == "held")
+                           .values(status="committed")
+                           .execution_options(synchronize_session=False)).rowcount
+    if committed: return []
+    already = db.query(StockReservation.id).filter(StockReservation.prescription_id == pres.id,
+                                                         StockReservation.status == "committed").first()
+    if already: return []
+    short = hold(db, pres, strict=False)
+    db.execute(update(StockReservation)
+               .where(StockReservation.prescription_id == pres.id, StockReservation.status == "held")
+               .values(status="committed").execution_options(synchronize_session=False))
+    return short
+
+
+def release_expired(db, limit=500, commit=True):
+    expired = (db.query(StockReservation.id, StockReservation.stock_id, StockReservation.qty)
+               .filter(StockReservation.status == "held",
+                       StockReservation.expires_at < datetime.datetime.utcnow())
+               .limit(limit).all())
+    released = sum(_give_back(db, r.id, r.stock_id, r.qty) for r in expired)
+    if commit: db.commit()
+    return released
+
+
+_last_sweep = 0.0
+
+
+def _sweep_if_due(db):
+    # Part of the caller's transaction: committing here would commit a half-placed order,
+    # and a second session would wait on the caller's write lock under SQLite
+    global _last_sweep
+    if time.monotonic() - _last_sweep < SWEEP_SECONDS: return
+    _last_sweep = time.monotonic()
+    release_expired(db, commit=False)
+
+
+# --- Background sweeper ---
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+
+def _sweep_forever():
+    while True:
+        time.sleep(SWEEP_SECONDS)
+        db = SessionLocal()
+        try:
+            released = release_expired(db)
+            if released: print(f"♻️ Released {released} expired stock holds")
+        except Exception as e:
+            db.rollback()
+            print(f"⚠️ Reservation sweep failed: {e}")
+        finally:
+            db.close()
+
+
+def _ensure_sweeper():
+    global _sweeper
+    if _sweeper and _sweeper.is_alive(): return
+    with _sweeper_lock:
+        if _sweeper and _sweeper.is_alive(): return
+        _sweeper = threading.Thread(target=_sweep_forever, name="reservation-sweeper", daemon=True)
+        _sweeper.start()
@@ -0,0 +1,223 @@
+# routing.py
+# Picks which pharmacy (or pharmacies) fulfil an order.
+#
+# Every PharmacyStock row is kept as an offer, grouped by normalized medicine
+# name and sorted by price, plus a per-name {pharmacy_id: offer} map. The table
+# has its own version, bumped by invalidate() when names, prices, pharmacies or
+# whole quantities change (edits, imports); it is rebuilt then, or every
+# ROUTING_TTL seconds. Holds and releases only move qty, and adjust() applies
+# those deltas to the cached offers after commit, so checkouts don't force a
+# rebuild. Routing an order is a few dict lookups per line:
+#   objective="price"      cheapest in-stock offer per line, nearest on ties
+#   objective="shipments"  fewest pharmacies (greedy set cover), cheapest on ties
+# Distance is coarse: how many leading digits of the 6-digit pincodes match.
+# Rows with no qty (legacy, stock not tracked) are offers with UNTRACKED units,
+# as reservations.py treats them; adjust() leaves them alone.
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+import medicine_index
+from models import Pharmacy, PharmacyStock
+
+ROUTING_TTL = int(os.getenv("ROUTING_TTL", "60"))
+OBJECTIVE = os.getenv("ROUTING_OBJECTIVE", "shipments")
+OBJECTIVES = ("price", "shipments")
+PINCODE = re.compile(r"\b(\d{6})\b")
+FAR = 4
+UNTRACKED = 10 ** 9  # qty stand-in for rows whose stock isn't tracked
+
+
+def pincode_of(text):
+    found = PINCODE.search(text or "")
+    return found.group(1) if found else None
+
+
+def distance(a, b):
+    """0 = same pincode, 1 = same district (3 digits), 2 = same region, 3 = same zone, 4 = unknown/far."""
+    if not a or not b: return FAR
+    if a == b: return 0
+    for steps, digits in enumerate((3, 2, 1), 1):
+        if a[:digits] == b[:digits]: return steps
+    return FAR
+
+
+class Offer:
+    __slots__ = ("stock_id", "pharmacy_id", "name", "qty", "price")
+
+    def __init__(self, stock_id, pharmacy_id, name, qty, price):
+        self.stock_id, self.pharmacy_id, self.name, self.qty, self.price = stock_id, pharmacy_id, name, qty, price or 0
+
+    @property
+    def tracked(self):
+        return self.qty != UNTRACKED
+
+
+class RoutingTable:
+    def __init__(self, stock_rows, pharmacy_rows):
+        self.pharmacies = {pid: (name, location, pincode_of(location)) for pid, name, location in pharmacy_rows}
+        self.offers = {}      # normalized name -> [Offer] by price
+        self.by_pharmacy = {}  # normalized name -> {pharmacy_id: cheapest Offer}
+        self.by_stock = {}     # stock_id -> Offer, for adjust()
+        for stock_id, pharmacy_id, name, qty, price in stock_rows:
+            if not name or (qty is not None and qty <= 0): continue
+            offer = self.by_stock[stock_id] = Offer(stock_id, pharmacy_id, name, UNTRACKED if qty is None else qty, price)
+            self.offers.setdefault(medicine_index.normalize(name), []).append(offer)
+        for key, offers in self.offers.items():
+            offers.sort(key=lambda o: (o.price, o.stock_id))
+            per = self.by_pharmacy[key] = {}
+            for offer in offers: per.setdefault(offer.pharmacy_id, offer)
+        self.version = _version
+        self.built_at = time.monotonic()
+
+    def is_fresh(self):
+        return self.version == _version and time.monotonic() - self.built_at < ROUTING_TTL
+
+    def adjust(self, deltas):
+        """Apply committed {stock_id: qty change}. False if a row isn't in the table (rebuild instead)."""
+        for stock_id, delta in deltas.items():
+            offer = self.by_stock.get(stock_id)
+            if offer is None:
+                if delta > 0: return False  # back in stock after the build: not an offer yet
+                continue
+            if not offer.tracked: continue
+            offer.qty = max(offer.qty + delta, 0)
+        return True
+
+    def resolve(self, name):
+        key = medicine_index.normalize(name)
+        if key in self.offers: return key
+        # Free-text names (doctor/AI input) go through the fuzzy index once
+        matched, _ = medicine_index.index.match(name or "", threshold=80)
+        key = medicine_index.normalize(matched) if matched else None
+        return key if key in self.offers else None
+
+    def _offer(self, key, pharmacy_id, qty, units):
+        offer = self.by_pharmacy[key].get(pharmacy_id)
+        if offer is None or units(offer) >= qty: return offer
+        return next((o for o in self.offers[key] if o.pharmacy_id == pharmacy_id and units(o) >= qty), None)
+
+    def _pincode(self, pharmacy_id):
+        return self.pharmacies.get(pharmacy_id, (None, None, None))[2]
+
+    def route(self, lines, pincode=None, objective=OBJECTIVE):
+        """lines: [(name, qty)]. Returns {index: Offer} plus the indexes nobody can fill."""
+        dist = {}
+        def near(pid):
+            if pid not in dist: dist[pid] = distance(pincode, self._pincode(pid))
+            return dist[pid]
+
+        # adjust() moves qty from commit threads: read each offer's units once per call
+        seen = {}
+        def units(offer):
+            if offer.stock_id not in seen: seen[offer.stock_id] = offer.qty
+            return seen[offer.stock_id]
+
+        wanted, missing = {}, []
+        for i, (name, qty) in enumerate(lines):
+            key = self.resolve(name)
+            if key is None or not any(units(o) >= qty for o in self.offers[key]): missing.append(i)
+            else: wanted[i] = (key, qty)
+
+        chosen = {}
+        if objective == "price":
+            for i, (key, qty) in wanted.items():
+                offers = self.offers[key]
+                best = next(o for o in offers if units(o) >= qty)
+                ties = [o for o in offers if o.price == best.price and units(o) >= qty]
+                used = {c.pharmacy_id for c in chosen.values()}
+                chosen[i] = min(ties, key=lambda o: (o.pharmacy_id not in used, near(o.pharmacy_id), o.stock_id))
+            return chosen, missing
+
+        # Fewest shipments: greedy set cover, counting coverage with Counter (C speed),
+        # then checking quantities only for the pharmacies that tie for most lines
+        remaining = dict(wanted)
+        while remaining:
+            counts = Counter()
+            for key, qty in remaining.values():
+                counts.update(pid for pid in self.by_pharmacy[key] if self._offer(key, pid, qty, units))
+            top = max(counts.values())
+            best, best_rank = {}, None
+            for pid, count in counts.items():
+                if count < top: continue
+                covered = {i: offer for i, (key, qty) in remaining.items() if (offer := self._offer(key, pid, qty, units))}
+                rank = (-len(covered), near(pid), sum(o.price * remaining[i][1] for i, o in covered.items()))
+                if covered and (best_rank is None or rank < best_rank): best, best_rank = covered, rank
+            if not best:  # nobody in the top tier has enough units: settle the first line on its own
+                i, (key, qty) = next(iter(remaining.items()))
+                best = {i: next(o for o in self.offers[key] if units(o) >= qty)}
+            chosen.update(best)
+            for i in best: del remaining[i]
+        return chosen, missing
+
+
+_table = None
+_lock = threading.Lock()
+_version = 0
+_version_lock = threading.Lock()  # not _lock: a commit mustn't wait for a rebuild
+
+
+def invalidate():
+    """Rebuild on the next order (stock names, prices, pharmacies or absolute quantities changed)."""
+    global _version
+    with _version_lock: _version += 1
+
+
+def adjust(deltas):
+    """Committed qty changes from holds and releases, applied to the cached table in place.
+
+    A delta that lands while a rebuild is reading stock may be missed by the new
+    table; that drift lasts at most ROUTING_TTL, and the hold's conditional
+    UPDATE still has the final say.
+    """
+    current = _table
+    if current is not None and deltas and not current.adjust(deltas): invalidate()
+
+
+def table(db):
+    global _table
+    medicine_index.stock_index(db)  # resolve() falls back to fuzzy matching on it
+    current = _table
+    if current is not None and current.is_fresh(): return current
+    with _lock:
+        if _table is None or not _table.is_fresh():
+            version = _version
+            stock = db.query(PharmacyStock.id, PharmacyStock.pharmacy_id, PharmacyStock.medicine_name,
+                             PharmacyStock.qty, PharmacyStock.price).all()
+            pharmacies = db.query(Pharmacy.id, Pharmacy.name, Pharmacy.location).all()
+            built = RoutingTable(stock, pharmacies)
+            built.version = version  # a change during the build makes it stale straight away
+            _table = built
+    return _table
+
+
+def plan(db, medicines, pincode=None, objective=OBJECTIVE):
+    """Shipments for an order's medicine dicts ({"name", "qty"}), grouped by pharmacy."""
+    routes = table(db)
+    lines = [(med.get("name") or "", _qty(med.get("qty"))) for med in medicines]
+    chosen, missing = routes.route(lines, pincode, objective)
+    shipments = {}
+    for i, offer in sorted(chosen.items()):
+        name, location, pin = routes.pharmacies.get(offer.pharmacy_id, ("Unknown", "", None))
+        ship = shipments.setdefault(offer.pharmacy_id, {"pharmacy_id": offer.pharmacy_id, "pharmacy": name, "location": location,
+                                                        "distance": distance(pincode, pin), "items": [], "subtotal": 0})
+        qty = lines[i][1]
+        ship["items"].append({"name": lines[i][0], "medicine_name": offer.name, "stock_id": offer.stock_id, "qty": qty, "price": offer.price})
+        ship["subtotal"] += offer.price * qty
+    return {"objective": objective, "shipments": list(shipments.values()),
+            "total": sum(s["subtotal"] for s in shipments.values()),
+            "missing": [lines[i][0] for i in missing]}
+
+
+def assign(db, items, pincode=None, objective=OBJECTIVE):
+    """Point each OrderItem at the routed pharmacy's stock row (prices stay as ordered)."""
+    chosen, missing = table(db).route([(item.medicine_name or "", _qty(item.qty)) for item in items], pincode, objective)
+    for i, offer in chosen.items(): items[i].stock_id = offer.stock_id
+    return [items[i].medicine_name for i in missing]
+
+
+def _qty(qty):
+    if isinstance(qty, int): return max(qty, 1)
+    return int(qty) if isinstance(qty, str) and qty.isdigit() and int(qty) > 0 else 1
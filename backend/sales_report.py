@@ -0,0 +1,160 @@
+# sales_report.py
+# Streaming export of the sales ledger (completed_orders) for accounting, used by
+# /admin/reports/sales and as a CLI:
+#   python sales_report.py lines sales.csv --start 2026-01-01 --end 2026-01-31 [--format jsonl|parquet]
+#   python sales_report.py daily daily.csv --start 2026-01-01 --end 2026-01-31
+#
+# Orders are read in order_date order through a server-side cursor (yield_per)
+# and each medicines_json blob is decoded as its row arrives, one output line
+# per medicine. Daily totals per medicine come from the same single pass: rows
+# arrive sorted by day, so a day's totals are emitted as soon as the next day
+# starts and only one day is ever held in memory.
+import argparse
+import csv
+import datetime
+import io
+import json
+import sys
+
+import dashboard
+from database import SessionLocal
+from models import CompletedOrder
+
+LINE_FIELDS = ["order_id", "order_date", "prescription_id", "customer_name", "phone", "transaction_id",
+               "medicine", "qty", "price", "line_total", "order_total"]
+DAILY_FIELDS = ["day", "medicine", "qty", "revenue", "orders"]
+CHUNK_SIZE = 5000
+
+
+def _qty(value):
+    # The ledger keeps free-text quantities ("Standard") as written; those count as 1
+    try: return max(int(value), 0)
+    except (TypeError, ValueError): return 1
+
+
+def _price(value):
+    # Legacy blobs may hold prices as text ("120.50") or junk; unreadable ones count as 0
+    try: return int(round(float(value or 0)))
+    except (TypeError, ValueError, OverflowError): return 0
+
+
+def order_lines(db, start=None, end=None, chunk_size=CHUNK_SIZE):
+    """One dict per medicine sold, oldest order first, without materializing the range."""
+    C = CompletedOrder
+    query = (db.query(C.id, C.order_date, C.original_pres_id, C.customer_name, C.phone_number, C.transaction_id,
+                      C.total_amount, C.medicines_json)
+             .filter(*dashboard.date_range(C.order_date, start, end))
+             .order_by(C.order_date, C.id)
+             .execution_options(yield_per=chunk_size))  # server-side cursor where supported
+    for order_id, order_date, pres_id, customer, phone, txn, total, medicines_json in query:
+        try: medicines = json.loads(medicines_json or "[]")
+        except ValueError: medicines = []
+        for med in medicines if isinstance(medicines, list) else []:
+            if not isinstance(med, dict): continue  # same filter as main.medicine_list
+            qty, price = _qty(med.get("qty", 1)), _price(med.get("price"))
+            yield {"order_id": order_id, "order_date": order_date.isoformat() if order_date else None,
+                   "prescription_id": pres_id, "customer_name": customer, "phone": phone, "transaction_id": txn,
+                   "medicine": med.get("name"), "qty": qty, "price": price, "line_total": qty * price, "order_total": total}
+
+
+def daily_totals(lines):
+    """Per-day, per-medicine qty/revenue/orders from date-ordered lines, in one pass."""
+    day, totals = None, {}
+    for line in lines:
+        line_day = (line["order_date"] or "")[:10]
+        if line_day != day:
+            yield from _flush(day, totals)
+            day, totals = line_day, {}
+        entry = totals.get(line["medicine"])
+        if entry is None: entry = totals[line["medicine"]] = [0, 0, set()]
+        entry[0] += line["qty"]; entry[1] += line["line_total"]; entry[2].add(line["order_id"])
+    yield from _flush(day, totals)
+
+
+def _flush(day, totals):
+    for medicine in sorted(totals, key=lambda m: (m is None, m or "")):
+        qty, revenue, orders = totals[medicine]
+        yield {"day": day, "medicine": medicine, "qty": qty, "revenue": revenue, "orders": len(orders)}
+
+
+def rows(db, kind="lines", start=None, end=None, chunk_size=CHUNK_SIZE):
+    lines = order_lines(db, start, end, chunk_size)
+    return daily_totals(lines) if kind == "daily" else lines
+
+
+def text_chunks(records, fields, fmt="csv", chunk_size=CHUNK_SIZE):
+    """Yields CSV/JSONL text every `chunk_size` records."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    if fmt == "csv": writer.writeheader()
+    for count, record in enumerate(records, 1):
+        if fmt == "jsonl": buffer.write(json.dumps(record) + "\n")
+        else: writer.writerow(record)
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0); buffer.truncate()
+    if buffer.tell(): yield buffer.getvalue()
+
+
+def write_parquet(records, fields, path, chunk_size=CHUNK_SIZE):
+    """Columnar output, one row group per chunk (needs pyarrow: pip install pyarrow)."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("Parquet output needs pyarrow: pip install pyarrow")
+    writer, columns, written = None, {f: [] for f in fields}, 0
+
+    def flush():
+        nonlocal writer
+        table = pa.table(columns)
+        if writer is None: writer = pq.ParquetWriter(path, table.schema)
+        writer.write_table(table)
+        for values in columns.values(): values.clear()
+
+    for record in records:
+        for f in fields: columns[f].append(record[f])
+        written += 1
+        if written % chunk_size == 0: flush()
+    if written % chunk_size or writer is None: flush()
+    writer.close()
+    return written
+
+
+# ==========================================
+# 🖥️ CLI
+# ==========================================
+def _format_for(path, explicit):
+    if explicit: return explicit
+    if path.endswith(".parquet"): return "parquet"
+    return "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="Sales ledger export and daily totals")
+    parser.add_argument("kind", choices=["lines", "daily"], help="one row per medicine sold, or per day and medicine")
+    parser.add_argument("path", help="output file ('-' for stdout)")
+    parser.add_argument("--start", type=datetime.date.fromisoformat, help="first day (inclusive)")
+    parser.add_argument("--end", type=datetime.date.fromisoformat, help="last day (inclusive)")
+    parser.add_argument("--format", choices=["csv", "jsonl", "parquet"])
+    parser.add_argument("--chunk", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    fmt = _format_for(args.path, args.format)
+    fields = DAILY_FIELDS if args.kind == "daily" else LINE_FIELDS
+    db = SessionLocal()
+    try:
+        records = rows(db, args.kind, args.start, args.end, args.chunk)
+        if fmt == "parquet":
+            if args.path == "-": raise SystemExit("Parquet needs a file path")
+            print(f"{write_parquet(records, fields, args.path, args.chunk)} rows", file=sys.stderr)
+            return
+        out = sys.stdout if args.path == "-" else open(args.path, "w", newline="", encoding="utf-8")
+        with out:
+            for chunk in text_chunks(records, fields, fmt, args.chunk): out.write(chunk)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,29 +1,10 @@
-import requests
-
-# ✅ I cleaned the formatting here.
-# NOTE: This token was visible in your error. After testing, you should generate a new one for security.
-BOT_TOKEN = "8593706542:AAG_EsJxPZiqLQddiMgAlhSinxtaJO-hswI"
-
-# 🔴 PLEASE PASTE YOUR CHAT ID HERE (Keep the quotes!)
-CHAT_ID = "6293824721" 
+# telegram_bot.py
+# Helpers kept for older scripts. Delivery goes through the shared outbox in
+# notifier.py (TELEGRAM_BOT_TOKEN / TELEGRAM_CHAT_ID from the environment).
+from notifier import send_telegram_alert
 
 def send_message(text):
-    # This URL string must be clean (no brackets, no spaces)
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-    
-    payload = {
-        "chat_id": CHAT_ID, 
-        "text": text, 
-        "parse_mode": "Markdown"
-    }
-    
-    try:
-        response = requests.post(url, json=payload)
-        # Check if Telegram actually accepted it
-        if not response.ok:
-            print(f"Telegram Error Response: {response.text}")
-    except Exception as e:
-        print(f"Connection Error: {e}")
+    send_telegram_alert(text)
 
 def send_stock_alert(doctor_name, medicine_found, store_name, stock_count):
     msg = (
@@ -32,4 +13,4 @@ def send_stock_alert(doctor_name, medicine_found, store_name, stock_count):
         f"🏥 *Store:* {store_name}\n"
         f"📦 *Qty:* {stock_count}\n"
     )
-    send_message(msg)
\ No newline at end of file
+    send_message(msg)
@@ -0,0 +1,24 @@
+# tests/conftest.py
+# Run from backend/:  python -m pytest tests
+# Every test module shares one throwaway SQLite database; main creates the schema on import.
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="ayurneeds-test-"), "test.db"))
+os.environ.setdefault("DB_PROFILE", "server")
+os.environ["TELEGRAM_BOT_TOKEN"] = ""  # alerts are dropped, never sent
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+
+
+@pytest.fixture
+def db():
+    import main  # imported here so tests that don't need the app skip fastapi/sqlalchemy
+    session = main.SessionLocal()
+    try: yield session
+    finally: session.close()
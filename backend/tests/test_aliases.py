@@ -0,0 +1,33 @@
+# tests/test_aliases.py
+import aliases
+from medicine_index import MedicineIndex
+
+
+def test_key_unifies_spelling_and_spacing():
+    assert aliases.key("PAN-40MG Tabs") == aliases.key("Tab. Pan 40 mg") == "pan 40 mg tab"
+    assert aliases.key("dolo650") == aliases.key("Dolo 650") == "dolo 650"
+    assert aliases.key("Benadryl 100 ml Syp") == aliases.key("Syr. Benadryl 100ml") == "benadryl 100 ml syrup"
+
+
+def test_key_keeps_dosage_form():
+    keys = {aliases.key("Inj Pan 40"), aliases.key("Pan 40 tab"), aliases.key("Pan 40 syrup"), aliases.key("Pan 40 cap")}
+    assert len(keys) == 4
+
+
+def test_key_keeps_unit():
+    assert aliases.key("Pan 40 mg") != aliases.key("Pan 40 ml")
+    assert aliases.key("Pan 40 mg tab") != aliases.key("Pan 40 ml syrup")
+
+
+def test_key_is_idempotent():
+    for name in ("Inj Pan 40", "Tab Dolo 650 mg", "Rx Crocin 500 Tablets"):
+        assert aliases.key(aliases.key(name)) == aliases.key(name)
+
+
+def test_exact_match_does_not_cross_dosage_forms():
+    index = MedicineIndex(refresh_seconds=0)
+    index.load([(1, "Pan 40 mg Tab"), (2, "Pan 40 Injection")])
+    assert index.exact("PAN-40MG tablets") == "Pan 40 mg Tab"
+    assert index.exact("Inj. Pan 40") == "Pan 40 Injection"
+    assert index.exact("Pan 40 ml syrup") is None
+    assert index.exact("Pan 40") is None
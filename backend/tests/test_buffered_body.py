@@ -0,0 +1,42 @@
+# tests/test_buffered_body.py
+import asyncio
+
+import pytest
+
+import buffered_body
+
+
+def channel(*chunks, disconnect=False):
+    messages = [{"type": "http.request", "body": c, "more_body": i < len(chunks) - 1} for i, c in enumerate(chunks)]
+    if disconnect: messages = messages[:1] + [{"type": "http.disconnect"}]
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+    return receive
+
+
+def test_read_then_replay():
+    async def run():
+        receive = channel(b"ab", b"cd")
+        body = await buffered_body.read({}, receive, limit=10)
+        replayed = buffered_body.replay(body, receive)
+        return body, await replayed(), await replayed()
+    body, first, after = asyncio.run(run())
+    assert body == b"abcd"
+    assert first == {"type": "http.request", "body": b"abcd", "more_body": False}
+    assert after == {"type": "http.disconnect"}
+
+
+def test_refuses_declared_length_before_reading():
+    async def receive():
+        raise AssertionError("body read despite Content-Length")
+    with pytest.raises(buffered_body.TooLarge):
+        asyncio.run(buffered_body.read({b"content-length": b"11"}, receive, limit=10))
+
+
+def test_stops_buffering_past_the_limit():
+    with pytest.raises(buffered_body.TooLarge):
+        asyncio.run(buffered_body.read({}, channel(b"123456", b"789012", b"never read"), limit=10))
+
+
+def test_disconnect_returns_none():
+    assert asyncio.run(buffered_body.read({}, channel(b"ab", b"cd", disconnect=True), limit=10)) is None
@@ -0,0 +1,49 @@
+# tests/test_confirm_order.py
+import pytest
+from fastapi import HTTPException
+
+import main
+from main import Doctor, Pharmacy, PharmacyStock, Prescription
+
+
+def order(medicines):
+    return main.OrderConfirm(patient_name="Asha", address_line="12 MG Road", pincode="560001", landmark="Temple",
+                             payment_mode="TXN123", final_medicines=medicines)
+
+
+def test_confirm_after_payment_approved_is_refused(db):
+    pharmacy = Pharmacy(name="Confirm Pharma", location="Bengaluru 560001")
+    doctor = Doctor(name="Rao", uuid_code="confirm-test", phone="1", clinic_address="x")
+    db.add_all([pharmacy, doctor]); db.flush()
+    stock = PharmacyStock(pharmacy_id=pharmacy.id, medicine_name="Confirmol 500", qty=5, price=20)
+    pres = Prescription(doctor_id=doctor.id, patient_phone="9876543210", status="Approved")
+    db.add_all([stock, pres]); db.commit()
+    medicines = [{"name": "Confirmol 500", "qty": 2, "price": 20}]
+
+    assert main.confirm_order(pres.id, order(medicines), db) == {"status": "pending_verification"}
+    main.admin_payment_action(pres.id, "approve", db)
+    db.refresh(stock)
+    assert stock.qty == 3
+
+    with pytest.raises(HTTPException) as refused:
+        main.confirm_order(pres.id, order(medicines), db)
+    assert refused.value.status_code == 409
+    db.rollback()
+    db.refresh(stock); db.refresh(pres)
+    assert stock.qty == 3  # not taken a second time
+    assert pres.status == "Ordered"
+
+
+def test_confirm_again_while_verifying_replaces_the_hold(db):
+    pharmacy = Pharmacy(name="Reconfirm Pharma", location="Bengaluru 560001")
+    doctor = Doctor(name="Iyer", uuid_code="reconfirm-test", phone="2", clinic_address="y")
+    db.add_all([pharmacy, doctor]); db.flush()
+    stock = PharmacyStock(pharmacy_id=pharmacy.id, medicine_name="Reconfirmol 250", qty=5, price=10)
+    pres = Prescription(doctor_id=doctor.id, patient_phone="9876543211", status="Approved")
+    db.add_all([stock, pres]); db.commit()
+    medicines = [{"name": "Reconfirmol 250", "qty": 2, "price": 10}]
+
+    main.confirm_order(pres.id, order(medicines), db)
+    main.confirm_order(pres.id, order(medicines), db)
+    db.refresh(stock)
+    assert stock.qty == 3
@@ -0,0 +1,23 @@
+# tests/test_dashboard.py
+import datetime
+
+import dashboard
+from models import CompletedOrder, OrderItem, Prescription
+
+
+def test_top_medicines_count_each_order_once(db):
+    day = datetime.datetime(2026, 3, 14, 10, 0)
+    pres = Prescription(patient_phone="9000000001", status="Ordered", created_at=day)
+    # Split across pharmacies, the same medicine can take several lines of one order
+    pres.items = [OrderItem(position=0, medicine_name="Dashmol 650", qty=2, price=30),
+                  OrderItem(position=1, medicine_name="Dashmol 650", qty=1, price=30),
+                  OrderItem(position=2, medicine_name="Dashzine 10", qty=1, price=15)]
+    db.add(pres); db.flush()
+    db.add(CompletedOrder(original_pres_id=pres.id, customer_name="Meera", total_amount=105, order_date=day))
+    db.commit()
+
+    summary = dashboard.summary(db, day.date(), day.date(), top=100)
+    top = {m["name"]: m for m in summary["top_medicines"]}
+    assert top["Dashmol 650"] == {"name": "Dashmol 650", "units": 3, "revenue": 90, "orders": 1}
+    assert top["Dashzine 10"]["orders"] == 1
+    assert summary["orders"] == 1